@@ -7,9 +7,11 @@ from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.card import MDCard
 from kivy.uix.image import AsyncImage
 from kivy.properties import StringProperty, BooleanProperty
+from kivy.clock import Clock
 from datetime import datetime
 from config.alerts_log import get_recent_alerts, get_alerts_by_level, clear_alerts as clear_all_alerts
 import os
+from image_derivatives import request_derivative
 
 class AlertImageViewerDialog(MDBoxLayout):
     """Dialog pre zobrazenie obrázka z upozornenia"""
@@ -26,7 +28,8 @@ class AlertImageViewerDialog(MDBoxLayout):
         self.size_hint_y = None
         self.height = "400dp"
         
-        self.image_source = image_path
+        self.image_path = image_path
+        self.image_source = self._medium_source()
         self.additional_info = additional_info
         
         if timestamp:
@@ -38,10 +41,21 @@ class AlertImageViewerDialog(MDBoxLayout):
         else:
             self.timestamp_text = "Neznámy čas"
     
+    def _medium_source(self):
+        # Zmenšenina, ktorá ešte nie je v cache, sa vytvorí na pozadí - dovtedy sa zobrazí originál
+        return request_derivative(self.image_path, "medium",
+                                  lambda path: Clock.schedule_once(lambda dt: self._on_derivative(path)))
+
+    def _on_derivative(self, path):
+        if not self.is_fullscreen:
+            self.image_source = path
+
     def toggle_fullscreen(self):
         """Prepínanie medzi normálnym a celoobrazovkovým zobrazením"""
         self.is_fullscreen = not self.is_fullscreen
         
+        self.image_source = self.image_path if self.is_fullscreen else self._medium_source()
+        
         if self.is_fullscreen:
             self.height = "600dp"
             self.padding = "0dp"
@@ -13,11 +13,12 @@ import subprocess
 import os
 import time
 import socket
-from web_app import app as flask_app
+from web_app import serve as serve_web_app
 from config.system_state import load_state, save_state, is_locked_out, set_lockout, update_state, reset_system_state
 from config.settings import load_settings
 from mqtt_client import mqtt_client
 import notification_service as ns
+from structured_logging import setup_logging
 # Importovanie MQTT discovery služby
 from mqtt_discovery import MQTTDiscoveryService
 import logging
@@ -29,11 +30,8 @@ broker_config = {
     'port': 1883,
 }
 
-# Konfigurácia logovania
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(asctime)s] %(levelname)s [%(name)s]: %(message)s"
-)
+# Konfigurácia logovania (sekcia "logging" v settings.json)
+setup_logging()
 
 # Cesty k možným inštaláciám mosquitto
 MOSQUITTO_PATHS = [
@@ -112,9 +110,9 @@ class SecurityApp(MDApp):
 
 def run_flask():
     try:
-        # Použitie threaded=True parametra, aby Flask mohol správne obsluhovať viacero požiadaviek
-        # a zmena debug=False, aby sa zabránilo problémom s opätovným spúšťaním vlákna
-        flask_app.run(host='0.0.0.0', port=5000, threaded=True, debug=False)
+        # Režim servera (development/production) sa berie zo sekcie web_server v settings.json
+        # alebo z premennej prostredia SECURITY_WEB_MODE
+        serve_web_app()
     except Exception as e:
         logging.error(f"Chyba pri spúšťaní Flask aplikácie: {e}")
 
@@ -1,40 +1,277 @@
 # alerts_log.py - Práca s logom upozornení
+#
+# Upozornenia sa ukladajú do žurnálu, do ktorého sa iba pridáva. Žurnál je
+# rozdelený na segmenty (jeden JSON záznam na riadok) v adresári data/alerts.
+# Najnovšie záznamy sa držia aj v pamäti, takže dotazy typu "posledných N"
+# alebo "od času T" sa väčšinou vybavia bez čítania disku a inak sa súbory
+# čítajú odzadu, bez parsovania celej histórie.
 import os
-import json
 import time
+import glob
+import threading
+from collections import deque
 from datetime import datetime
 import logging
+from config import json_codec
+from config.metrics import timer
 
-# Cesta k súboru s logom upozornení
+# Cesta k pôvodnému súboru s logom upozornení (JSON pole) - používa sa iba pri migrácii
 ALERTS_LOG_FILE = os.path.join(os.path.dirname(__file__), '../../data/alerts.log')
+# Adresár so segmentmi žurnálu upozornení
+ALERTS_JOURNAL_DIR = os.path.join(os.path.dirname(__file__), '../../data/alerts')
+
+SEGMENT_PREFIX = "alerts-"
+SEGMENT_SUFFIX = ".jsonl"
+
+# Počet najnovších záznamov držaných v pamäti
+TAIL_SIZE = 200
+
+# Predvolené nastavenia uchovávania záznamov (sekcia "alerts_log" v settings.json)
+DEFAULT_RETENTION = {
+    "max_records": 10000,       # 0 = bez obmedzenia počtu
+    "max_age_days": 0,          # 0 = bez obmedzenia veku
+    "max_bytes": 10 * 1024 * 1024,  # 0 = bez obmedzenia veľkosti
+    "segment_max_bytes": 256 * 1024
+}
+
+_lock = threading.RLock()
+_initialized = False
+_segments = []          # [{'path', 'index', 'count', 'bytes', 'first_time', 'last_time'}] od najstaršieho
+_tail = deque(maxlen=TAIL_SIZE)
+_journal_file = None
+_retention = None
+_alert_listeners = []
+# Počítadlo zmien žurnálu (napr. pre ETag webového API)
+_version = 0
+
+def _segment_path(index):
+    return os.path.join(ALERTS_JOURNAL_DIR, f"{SEGMENT_PREFIX}{index:06d}{SEGMENT_SUFFIX}")
+
+def _segment_index(path):
+    name = os.path.basename(path)
+    try:
+        return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+    except ValueError:
+        return None
+
+def _parse_line(line):
+    """Dekóduje jeden riadok žurnálu, poškodené riadky vráti ako None."""
+    try:
+        alert = json_codec.loads(line)
+        return alert if isinstance(alert, dict) else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def _read_lines_reversed(path, size=None, block_size=8192):
+    """Generuje riadky súboru od konca po začiatok.
+
+    Args:
+        path (str): Cesta k súboru
+        size (int, optional): Čítať iba prvých size bajtov (snímka veľkosti súboru)
+    """
+    with open(path, 'rb') as f:
+        if size is None:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+        position = size
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size) + remainder
+            lines = block.split(b"\n")
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                if line.strip():
+                    yield line
+        if remainder.strip():
+            yield remainder
+
+def _read_first_line(path):
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                return line
+    return None
+
+def _load_segment_info(path):
+    """Zistí metadáta segmentu - počet záznamov sa počíta bez parsovania JSON."""
+    count = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(65536)
+            if not block:
+                break
+            count += block.count(b"\n")
+    info = {
+        'path': path,
+        'index': _segment_index(path),
+        'count': count,
+        'bytes': os.path.getsize(path),
+        'first_time': None,
+        'last_time': None
+    }
+    first = _read_first_line(path)
+    if first:
+        alert = _parse_line(first)
+        info['first_time'] = alert.get('unix_time') if alert else None
+    for line in _read_lines_reversed(path):
+        alert = _parse_line(line)
+        if alert:
+            info['last_time'] = alert.get('unix_time')
+            break
+    return info
+
+def _load_retention():
+    """Načíta nastavenia uchovávania záznamov zo settings.json."""
+    retention = dict(DEFAULT_RETENTION)
+    try:
+        from config.settings import load_settings
+        configured = load_settings().get('alerts_log', {})
+        for key in DEFAULT_RETENTION:
+            if key in configured:
+                retention[key] = configured[key]
+    except Exception as e:
+        logging.warning(f"Nepodarilo sa načítať nastavenia logu upozornení, použijú sa predvolené: {e}")
+    return retention
+
+def configure_retention(**kwargs):
+    """Zmení nastavenia uchovávania (max_records, max_age_days, max_bytes, segment_max_bytes)."""
+    with _lock:
+        _ensure_journal()
+        for key, value in kwargs.items():
+            if key not in DEFAULT_RETENTION:
+                raise ValueError(f"Neznáme nastavenie uchovávania: {key}")
+            _retention[key] = value
+        _apply_retention()
+
+def _migrate_legacy_log():
+    """Prevedie pôvodný súbor alerts.log (JSON pole) do žurnálu."""
+    if not os.path.exists(ALERTS_LOG_FILE):
+        return
+    try:
+        with open(ALERTS_LOG_FILE, 'rb') as f:
+            legacy_alerts = json_codec.load(f)
+    except ValueError:
+        legacy_alerts = []
+    if not isinstance(legacy_alerts, list):
+        logging.warning(f"Pôvodný log upozornení má neočakávaný formát, migrácia preskočená: {ALERTS_LOG_FILE}")
+        return
+
+    if legacy_alerts:
+        # V pôvodnom súbore boli najnovšie záznamy na začiatku
+        path = _segment_path(1)
+        with open(path, 'wb') as f:
+            for alert in reversed(legacy_alerts):
+                if isinstance(alert, dict):
+                    f.write(json_codec.dumpb(alert) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    os.replace(ALERTS_LOG_FILE, ALERTS_LOG_FILE + ".migrated")
+    logging.info(f"Log upozornení migrovaný do žurnálu ({len(legacy_alerts)} záznamov)")
+
+def _ensure_journal():
+    """Pri prvom použití pripraví žurnál - migrácia, načítanie segmentov a pamäťového indexu."""
+    global _initialized, _retention
+    if _initialized:
+        return
+    os.makedirs(ALERTS_JOURNAL_DIR, exist_ok=True)
+    _retention = _load_retention()
+
+    existing = glob.glob(os.path.join(ALERTS_JOURNAL_DIR, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+    if not existing:
+        _migrate_legacy_log()
+        existing = glob.glob(os.path.join(ALERTS_JOURNAL_DIR, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+    _segments.clear()
+    for path in existing:
+        if _segment_index(path) is None:
+            continue
+        _segments.append(_load_segment_info(path))
+    _segments.sort(key=lambda s: s['index'])
+
+    _tail.clear()
+    newest_first = []
+    for alert in _iter_disk_backwards(list(_segments), skip=0):
+        newest_first.append(alert)
+        if len(newest_first) >= TAIL_SIZE:
+            break
+    _tail.extend(reversed(newest_first))
+
+    _initialized = True
+    _apply_retention()
+
+def _open_segment_for_append():
+    """Vráti otvorený súbor aktuálneho segmentu, pri prekročení veľkosti vytvorí nový."""
+    global _journal_file
+    current = _segments[-1] if _segments else None
+    if current is None or current['bytes'] >= _retention['segment_max_bytes']:
+        if _journal_file is not None:
+            _journal_file.close()
+            _journal_file = None
+        index = (current['index'] + 1) if current else 1
+        current = {
+            'path': _segment_path(index),
+            'index': index,
+            'count': 0,
+            'bytes': 0,
+            'first_time': None,
+            'last_time': None
+        }
+        _segments.append(current)
+        _apply_retention()
+    if _journal_file is None or _journal_file.name != current['path']:
+        if _journal_file is not None:
+            _journal_file.close()
+        _journal_file = open(current['path'], 'ab')
+    return current
+
+def _apply_retention():
+    """Odstráni najstaršie segmenty podľa počtu, veku a veľkosti. Aktuálny segment sa nikdy nemaže."""
+    max_records = _retention.get('max_records') or 0
+    max_bytes = _retention.get('max_bytes') or 0
+    max_age_days = _retention.get('max_age_days') or 0
+    oldest_allowed = time.time() - max_age_days * 86400 if max_age_days else None
+
+    removed = False
+    while len(_segments) > 1:
+        oldest = _segments[0]
+        total_count = sum(s['count'] for s in _segments)
+        total_bytes = sum(s['bytes'] for s in _segments)
+        too_many = max_records and total_count - oldest['count'] >= max_records
+        too_big = max_bytes and total_bytes > max_bytes
+        too_old = oldest_allowed and oldest['last_time'] is not None and oldest['last_time'] < oldest_allowed
+        if not (too_many or too_big or too_old):
+            break
+        try:
+            os.remove(oldest['path'])
+        except FileNotFoundError:
+            pass
+        _segments.pop(0)
+        removed = True
+        _bump_version()
+
+    if removed:
+        # Záznamy v pamäti zo zmazaných segmentov sa už nesmú vracať
+        remaining = sum(s['count'] for s in _segments)
+        while len(_tail) > remaining:
+            _tail.popleft()
 
 def ensure_log_file_exists():
-    """Zabezpečí, že súbor s logom upozornení existuje."""
+    """Zabezpečí, že žurnál upozornení existuje."""
     try:
-        os.makedirs(os.path.dirname(ALERTS_LOG_FILE), exist_ok=True)
-        
-        if not os.path.exists(ALERTS_LOG_FILE):
-            with open(ALERTS_LOG_FILE, 'w', encoding='utf-8') as f:
-                json.dump([], f, ensure_ascii=False, indent=2)
-            return True
+        with _lock:
+            _ensure_journal()
         return True
     except Exception as e:
-        logging.error(f"Chyba pri vytváraní súboru logu upozornení: {e}")
+        logging.error(f"Chyba pri vytváraní žurnálu upozornení: {e}")
         return False
 
 def add_alert_log(message, level="info", image_path=None):
-    """Pridá nový záznam do logu upozornení."""
+    """Pridá nový záznam na koniec žurnálu upozornení."""
     try:
-        ensure_log_file_exists()
-        
-        # Načítanie súčasného logu
-        try:
-            with open(ALERTS_LOG_FILE, 'r', encoding='utf-8') as f:
-                alerts = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            # Ak je súbor prázdny alebo neexistuje, začneme s prázdnym zoznamom
-            alerts = []
-        
         # Vytvorenie nového záznamu
         new_alert = {
             "timestamp": datetime.now().isoformat(),
@@ -42,66 +279,131 @@ def add_alert_log(message, level="info", image_path=None):
             "message": message,
             "level": level,
         }
-        
+
         # Ak je k dispozícii cesta k obrázku, pridáme ju
         if image_path and os.path.exists(image_path):
             new_alert["image_path"] = image_path
-        
-        # Pridanie na začiatok zoznamu (najnovšie záznamy budú na začiatku)
-        alerts.insert(0, new_alert)
-        
-        # Obmedzenie počtu záznamov (uchováme max. 1000 záznamov)
-        max_records = 1000
-        if len(alerts) > max_records:
-            alerts = alerts[:max_records]
-        
-        # Zápis aktualizovaného logu
-        with open(ALERTS_LOG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(alerts, f, ensure_ascii=False, indent=2)
-        
+
+        line = json_codec.dumpb(new_alert) + b"\n"
+
+        with timer("alert_write_seconds"), _lock:
+            _ensure_journal()
+            segment = _open_segment_for_append()
+            _journal_file.write(line)
+            _journal_file.flush()
+
+            segment['count'] += 1
+            segment['bytes'] += len(line)
+            if segment['first_time'] is None:
+                segment['first_time'] = new_alert['unix_time']
+            segment['last_time'] = new_alert['unix_time']
+            _tail.append(new_alert)
+            _bump_version()
+
+        for callback in list(_alert_listeners):
+            try:
+                callback(dict(new_alert))
+            except Exception as e:
+                logging.error(f"Chyba v poslucháčovi nových upozornení: {e}")
+
         return True
     except Exception as e:
         logging.error(f"Chyba pri pridávaní záznamu do logu upozornení: {e}")
         return False
 
+def _bump_version():
+    global _version
+    _version += 1
+
+def get_alerts_version():
+    """Vráti počítadlo zmien žurnálu upozornení."""
+    return _version
+
+def register_alert_listener(callback):
+    """Zaregistruje funkciu callback(alert) volanú po pridaní každého upozornenia."""
+    if callback not in _alert_listeners:
+        _alert_listeners.append(callback)
+
+def _iter_disk_backwards(segments, skip=0, sizes=None):
+    """Generuje záznamy zo segmentov od najnovšieho, prvých skip záznamov preskočí."""
+    for segment in reversed(segments):
+        size = sizes.get(segment['path']) if sizes else None
+        try:
+            for line in _read_lines_reversed(segment['path'], size=size):
+                alert = _parse_line(line)
+                if alert is None:
+                    continue
+                if skip > 0:
+                    skip -= 1
+                    continue
+                yield alert
+        except FileNotFoundError:
+            # Segment medzitým odstránilo uchovávanie záznamov
+            return
+
+def _iter_alerts_backwards():
+    """Generuje upozornenia od najnovšieho - najprv z pamäte, potom z disku."""
+    with _lock:
+        _ensure_journal()
+        tail = list(_tail)
+        segments = [dict(s) for s in _segments]
+        total = sum(s['count'] for s in segments)
+        sizes = {s['path']: s['bytes'] for s in segments}
+
+    for alert in reversed(tail):
+        yield alert
+
+    if total > len(tail):
+        yield from _iter_disk_backwards(segments, skip=len(tail), sizes=sizes)
+
 def get_recent_alerts(count=10, level=None, since=None):
     """Získa najnovšie upozornenia z logu.
-    
+
     Args:
-        count (int): Maximálny počet upozornení na vrátenie
+        count (int): Maximálny počet upozornení na vrátenie (None = všetky)
         level (str, optional): Filter podľa úrovne závažnosti
         since (int, optional): Unix timestamp; vráti iba upozornenia novšie ako tento čas
-        
+
     Returns:
-        list: Zoznam upozornení
+        list: Zoznam upozornení (najnovšie na začiatku)
     """
     try:
-        ensure_log_file_exists()
-        
-        try:
-            with open(ALERTS_LOG_FILE, 'r', encoding='utf-8') as f:
-                alerts = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return []
-        
-        # Aplikovanie filtrov
-        if level:
-            alerts = [alert for alert in alerts if alert.get('level') == level]
-            
-        if since:
-            alerts = [alert for alert in alerts if alert.get('unix_time', 0) > since]
-        
-        # Obmedzenie počtu záznamov
-        return alerts[:count]
+        alerts = []
+        if count is not None and count <= 0:
+            return alerts
+
+        for alert in _iter_alerts_backwards():
+            # Záznamy sú usporiadané podľa času, staršie už nemôžu vyhovovať
+            if since and alert.get('unix_time', 0) <= since:
+                break
+            if level and alert.get('level') != level:
+                continue
+            alerts.append(dict(alert))
+            if count is not None and len(alerts) >= count:
+                break
+
+        return alerts
     except Exception as e:
         logging.error(f"Chyba pri získavaní upozornení: {e}")
         return []
 
 def clear_alerts():
     """Vymaže všetky upozornenia z logu."""
+    global _journal_file
     try:
-        with open(ALERTS_LOG_FILE, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+        with _lock:
+            _ensure_journal()
+            if _journal_file is not None:
+                _journal_file.close()
+                _journal_file = None
+            for segment in _segments:
+                try:
+                    os.remove(segment['path'])
+                except FileNotFoundError:
+                    pass
+            _segments.clear()
+            _tail.clear()
+            _bump_version()
         return True
     except Exception as e:
         logging.error(f"Chyba pri čistení logu upozornení: {e}")
@@ -109,18 +411,4 @@ def clear_alerts():
 
 def get_alerts_by_level(level, count=None):
     """Získa upozornenia podľa úrovne závažnosti."""
-    try:
-        ensure_log_file_exists()
-        
-        with open(ALERTS_LOG_FILE, 'r', encoding='utf-8') as f:
-            alerts = json.load(f)
-        
-        filtered_alerts = [alert for alert in alerts if alert.get('level') == level]
-        
-        if count:
-            filtered_alerts = filtered_alerts[:count]
-            
-        return filtered_alerts
-    except Exception as e:
-        logging.error(f"Chyba pri získavaní upozornení podľa úrovne: {e}")
-        return []
+    return get_recent_alerts(count=count, level=level)
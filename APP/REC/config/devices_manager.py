@@ -1,86 +1,225 @@
 # devices_manager.py - Správa zariadení
-import json
 import os
+import atexit
+import logging
+import threading
+import time
 from datetime import datetime
+from config.storage import atomic_write_json
+from config import json_codec
+from config.metrics import timer
 
 # Opravená cesta k súboru - pridané os.path.join a os.path.dirname
 DEVICES_FILE = os.path.join(os.path.dirname(__file__), '../../data/devices.json')
 DEVICE_STATUS_FILE = os.path.join(os.path.dirname(__file__), '../../data/device_status.json')
 
+# Predvolený interval (v sekundách) pre odložený zápis stavu zariadení na disk
+DEFAULT_STATUS_FLUSH_INTERVAL = 2.0
+
+# Stav zariadení držaný v pamäti - zdieľaný celým procesom
+_status_lock = threading.RLock()
+_flush_lock = threading.Lock()
+_status_cache = None
+_status_dirty = threading.Event()
+_flush_interval = None
+_flush_thread = None
+_flush_count = 0
+# Počítadlá zmien zoznamu zariadení a ich stavu (napr. pre ETag webového API)
+_devices_version = 0
+_status_version = 0
+
 def load_devices():
-    with open(DEVICES_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(DEVICES_FILE, 'rb') as f:
+        return json_codec.load(f)
 
 def save_devices(devices):
+    global _devices_version
     with open(DEVICES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(devices, f, ensure_ascii=False, indent=2)
+        json_codec.dump(devices, f, pretty=True)
+    _devices_version += 1
 
-def load_device_status():
-    """Načíta stav zariadení zo súboru."""
+def get_devices_version():
+    """Vráti (verzia zoznamu zariadení, verzia stavu zariadení)."""
+    return _devices_version, _status_version
+
+def _read_status_file():
+    """Načíta stav zariadení priamo zo súboru."""
     try:
-        with open(DEVICE_STATUS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Ak súbor neexistuje alebo je poškodený, vytvorí nový
+        with open(DEVICE_STATUS_FILE, 'rb') as f:
+            data = json_codec.load(f)
+            return data if isinstance(data, dict) else {}
+    except (FileNotFoundError, ValueError):
+        # Ak súbor neexistuje alebo je poškodený, začneme s prázdnym stavom
         return {}
 
+def _get_cache():
+    """Vráti stav zariadení v pamäti, pri prvom použití ho načíta zo súboru.
+
+    Musí sa volať so zamknutým _status_lock.
+    """
+    global _status_cache
+    if _status_cache is None:
+        _status_cache = _read_status_file()
+    return _status_cache
+
+def _copy_status(status_data):
+    """Vytvorí kópiu stavu, aby volajúci nemohol meniť dáta v pamäti."""
+    return {
+        device_id: dict(device_info) if isinstance(device_info, dict) else device_info
+        for device_id, device_info in status_data.items()
+    }
+
+def get_status_flush_interval():
+    """Vráti interval odloženého zápisu stavu zariadení (v sekundách)."""
+    global _flush_interval
+    if _flush_interval is None:
+        try:
+            from config.settings import load_settings
+            storage = load_settings().get('storage', {})
+            _flush_interval = float(storage.get('device_status_flush_interval', DEFAULT_STATUS_FLUSH_INTERVAL))
+        except Exception:
+            _flush_interval = DEFAULT_STATUS_FLUSH_INTERVAL
+    return _flush_interval
+
+def set_status_flush_interval(seconds):
+    """Nastaví interval odloženého zápisu stavu zariadení (v sekundách)."""
+    global _flush_interval
+    _flush_interval = max(0.0, float(seconds))
+
+def _ensure_flush_thread():
+    """Spustí vlákno pre odložený zápis, ak ešte nebeží."""
+    global _flush_thread
+    if _flush_thread is not None and _flush_thread.is_alive():
+        return
+    _flush_thread = threading.Thread(target=_flush_loop, daemon=True, name="DeviceStatusFlushThread")
+    _flush_thread.start()
+
+def _flush_loop():
+    """Zlučuje zmeny stavu a zapisuje ich na disk najviac raz za interval."""
+    while True:
+        _status_dirty.wait()
+        # Počkáme na ďalšie zmeny, aby sa dávka aktualizácií zapísala naraz
+        time.sleep(get_status_flush_interval())
+        try:
+            flush_device_status()
+        except Exception as e:
+            logging.error(f"Chyba pri zápise stavu zariadení: {e}")
+            time.sleep(1)
+
+def flush_device_status():
+    """Okamžite zapíše neuložené zmeny stavu zariadení na disk.
+
+    Returns:
+        bool: True ak sa zapisovalo, False ak neboli žiadne zmeny
+    """
+    global _flush_count
+    with _flush_lock:
+        with _status_lock:
+            if not _status_dirty.is_set():
+                return False
+            _status_dirty.clear()
+            snapshot = _copy_status(_get_cache())
+        try:
+            atomic_write_json(DEVICE_STATUS_FILE, snapshot)
+        except Exception:
+            # Zápis zlyhal - zmeny ostávajú neuložené pre ďalší pokus
+            _status_dirty.set()
+            raise
+        _flush_count += 1
+        return True
+
+def get_status_flush_count():
+    """Vráti počet vykonaných zápisov stavu zariadení na disk."""
+    return _flush_count
+
+def load_device_status():
+    """Vráti kópiu aktuálneho stavu zariadení z pamäte."""
+    with _status_lock:
+        return _copy_status(_get_cache())
+
+def get_device_status(device_id):
+    """Vráti kópiu stavu jedného zariadenia alebo None."""
+    with _status_lock:
+        device_info = _get_cache().get(device_id)
+        return dict(device_info) if isinstance(device_info, dict) else device_info
+
 def save_device_status(status_data):
-    """Uloží stav zariadení do súboru."""
-    # Uistí sa, že adresár existuje
-    os.makedirs(os.path.dirname(DEVICE_STATUS_FILE), exist_ok=True)
-    
-    with open(DEVICE_STATUS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(status_data, f, ensure_ascii=False, indent=2)
+    """Nahradí stav zariadení a okamžite ho uloží do súboru."""
+    global _status_cache
+    global _status_version
+    with _status_lock:
+        _status_cache = _copy_status(status_data)
+        _status_version += 1
+        _status_dirty.set()
+    flush_device_status()
+
+def _mark_dirty():
+    """Označí stav ako zmenený a naplánuje jeho zápis. Volá sa so zamknutým _status_lock."""
+    global _status_version
+    _status_version += 1
+    _status_dirty.set()
+    _ensure_flush_thread()
 
 def update_device_status(device_status_update):
     """
-    Aktualizuje stav zariadenia a ukladá ho do súboru
+    Aktualizuje stav zariadenia v pamäti a naplánuje jeho zápis do súboru
     
     Args:
         device_status_update (dict): Slovník so stavmi zariadení na aktualizáciu
                                     vo formáte {device_id: {sensor_type: status}}
     """
-    status_data = load_device_status()
-    
-    # Aktualizácia už existujúcich zariadení
-    for device_id, device_info in device_status_update.items():
-        if device_id not in status_data:
-            status_data[device_id] = {}
+    with timer("device_status_update_seconds"), _status_lock:
+        status_data = _get_cache()
         
-        # Aktualizácia stavu a času poslednej aktualizácie
-        if isinstance(device_info, dict):
-            # Aktualizácia všetkých hodnôt zo slovníka
-            for key, value in device_info.items():
-                status_data[device_id][key] = value
-        else:
-            # Ak je device_info priamo hodnota (string), považujeme ju za stav
-            status_data[device_id]['status'] = device_info
+        # Aktualizácia už existujúcich zariadení
+        for device_id, device_info in device_status_update.items():
+            if not isinstance(status_data.get(device_id), dict):
+                status_data[device_id] = {}
+            
+            # Aktualizácia stavu a času poslednej aktualizácie
+            if isinstance(device_info, dict):
+                # Aktualizácia všetkých hodnôt zo slovníka
+                for key, value in device_info.items():
+                    status_data[device_id][key] = value
+            else:
+                # Ak je device_info priamo hodnota (string), považujeme ju za stav
+                status_data[device_id]['status'] = device_info
+            
+            status_data[device_id]['last_update'] = datetime.now().isoformat()
         
-        status_data[device_id]['last_update'] = datetime.now().isoformat()
-    
-    save_device_status(status_data)
-    return status_data
+        _mark_dirty()
+        return _copy_status(status_data)
 
 # Zachovanie kompatibility so starým formátom
 def update_device_status_old(device_id, status, data=None):
     """
-    Aktualizuje stav zariadenia a ukladá ho do súboru (pôvodný formát)
+    Aktualizuje stav zariadenia v pamäti a naplánuje jeho zápis (pôvodný formát)
     
     Args:
         device_id (str): ID zariadenia
         status (str): Stav zariadenia (online/offline/alert)
         data (dict, optional): Doplnkové dáta zo senzora
     """
-    status_data = load_device_status()
-    
-    if device_id not in status_data:
-        status_data[device_id] = {}
-    
-    status_data[device_id]['status'] = status
-    status_data[device_id]['last_update'] = datetime.now().isoformat()
-    
-    if data:
-        status_data[device_id]['data'] = data
-    
-    save_device_status(status_data)
-    return status_data
+    with _status_lock:
+        status_data = _get_cache()
+        
+        if not isinstance(status_data.get(device_id), dict):
+            status_data[device_id] = {}
+        
+        status_data[device_id]['status'] = status
+        status_data[device_id]['last_update'] = datetime.now().isoformat()
+        
+        if data:
+            status_data[device_id]['data'] = data
+        
+        _mark_dirty()
+        return _copy_status(status_data)
+
+def _flush_on_exit():
+    """Pri ukončení procesu zapíše všetky neuložené zmeny."""
+    try:
+        flush_device_status()
+    except Exception as e:
+        logging.error(f"Chyba pri zápise stavu zariadení pri ukončení: {e}")
+
+atexit.register(_flush_on_exit)
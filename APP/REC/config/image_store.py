@@ -0,0 +1,521 @@
+# image_store.py - Ukladanie obrázkov prijatých z kamier
+import os
+import re
+import shutil
+import threading
+import time
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from config.storage import atomic_write_json
+from config import json_codec
+from config.metrics import observe, inc
+
+# Adresár s obrázkami
+IMAGES_DIR = os.path.join(os.path.dirname(__file__), '../../data/images')
+# Snímky jednej udalosti (burst) sú spolu v adresári events/{device_id}_{event_id}
+EVENTS_DIR_NAME = 'events'
+MANIFEST_FILE = 'manifest.json'
+# Udalosť bez spúšťacej snímky (burst ešte beží alebo sa spúšťacia snímka
+# stratila) sa zmaže až po tomto čase od poslednej zmeny (sekundy)
+ORPHAN_EVENT_GRACE = 3600
+# event_id prichádza v metadátach z MQTT a je súčasťou cesty k adresáru udalosti
+EVENT_ID_PATTERN = re.compile(r"[0-9A-Za-z_-]{1,64}")
+
+_events_lock = threading.Lock()
+
+# Obrázky sú rozdelené do podadresárov {YYYY-mm-dd}/{device_id}/, staršie
+# obrázky priamo v IMAGES_DIR sa naďalej čítajú.
+SHARD_DATE_FORMAT = '%Y-%m-%d'
+
+# Katalóg obrázkov v pamäti: device_id -> časy, cesty a veľkosti zoradené podľa času.
+# Pri prvom dotaze sa raz načíta z disku, potom ho aktualizuje ukladanie a mazanie obrázkov.
+_catalog = {}
+_catalog_lock = threading.Lock()
+_catalog_loaded = False
+# Spúšťacia snímka v galérii -> adresár jej udalosti (maže sa spolu s ňou)
+_event_links = {}
+# Počítadlo zmien katalógu (napr. pre ETag webového API)
+_catalog_version = 0
+
+class _DeviceImages:
+    __slots__ = ("times", "paths", "sizes", "by_path", "bytes", "event_bytes")
+
+    def __init__(self):
+        self.times = []
+        self.paths = []
+        self.sizes = []
+        self.by_path = {}      # cesta -> čas, na vyhľadanie obrázka bez prechádzania zoznamu
+        self.bytes = 0
+        self.event_bytes = 0   # snímky udalostí mimo galérie
+
+    def add(self, timestamp, path, size=0):
+        """Pridá obrázok, cestu, ktorá už v katalógu je, druhýkrát nepridá."""
+        if path in self.by_path:
+            return False
+        index = bisect_right(self.times, timestamp)
+        self.times.insert(index, timestamp)
+        self.paths.insert(index, path)
+        self.sizes.insert(index, size)
+        self.by_path[path] = timestamp
+        self.bytes += size
+        return True
+
+    def find(self, path):
+        """Vráti index obrázka podľa cesty alebo -1."""
+        timestamp = self.by_path.get(path)
+        if timestamp is None:
+            return -1
+        index = bisect_left(self.times, timestamp)
+        while index < len(self.times) and self.times[index] == timestamp:
+            if self.paths[index] == path:
+                return index
+            index += 1
+        return -1
+
+    def remove_at(self, index):
+        self.bytes -= self.sizes[index]
+        del self.by_path[self.paths[index]]
+        del self.times[index]
+        del self.paths[index]
+        del self.sizes[index]
+
+def allocate_image_path(device_id, timestamp=None):
+    """Vráti cestu pre nový obrázok: {YYYY-mm-dd}/{device_id}/{device_id}_{YYYYmmdd_HHMMSS}.jpg."""
+    moment = datetime.fromtimestamp(timestamp) if timestamp else datetime.now()
+    shard = os.path.join(IMAGES_DIR, moment.strftime(SHARD_DATE_FORMAT), device_id)
+    os.makedirs(shard, exist_ok=True)
+    base = f"{device_id}_{moment.strftime('%Y%m%d_%H%M%S')}"
+    path = os.path.join(shard, f"{base}.jpg")
+    # Viac obrázkov v tej istej sekunde dostane príponu -1, -2, ...
+    suffix = 0
+    while os.path.exists(path):
+        suffix += 1
+        path = os.path.join(shard, f"{base}-{suffix}.jpg")
+    return path
+
+def _is_shard_name(name):
+    try:
+        datetime.strptime(name, SHARD_DATE_FORMAT)
+        return True
+    except ValueError:
+        return False
+
+def parse_device_id(filename):
+    """Zistí device_id z názvu {device_id}_{YYYYmmdd_HHMMSS}.jpg (device_id môže obsahovať '_')."""
+    parts = os.path.splitext(filename)[0].rsplit('_', 2)
+    if len(parts) == 3 and parts[1].isdigit() and parts[2].split('-')[0].isdigit():
+        return parts[0]
+    return filename.split('_')[0]
+
+def _ensure_catalog():
+    """Načíta katalóg z IMAGES_DIR (iba raz). Volá sa so zámkom _catalog_lock."""
+    global _catalog_loaded
+    if _catalog_loaded:
+        return
+    _catalog_loaded = True
+    if not os.path.isdir(IMAGES_DIR):
+        return
+    directories = [IMAGES_DIR]
+    with os.scandir(IMAGES_DIR) as entries:
+        for entry in entries:
+            if entry.is_dir() and _is_shard_name(entry.name):
+                with os.scandir(entry.path) as device_dirs:
+                    directories.extend(d.path for d in device_dirs if d.is_dir())
+    for directory in directories:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.jpg') or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                _catalog.setdefault(parse_device_id(entry.name), _DeviceImages()).add(
+                    stat.st_mtime, entry.path, stat.st_size)
+    _load_event_links()
+
+def _load_event_links():
+    """Priradí adresáre udalostí k ich spúšťacím snímkam.
+
+    Udalosti bez spúšťacej snímky sa iba započítajú do obsadeného miesta,
+    zmaže ich až remove_orphaned_events po uplynutí ORPHAN_EVENT_GRACE.
+    """
+    events_dir = _events_dir()
+    if not os.path.isdir(events_dir):
+        return
+    for name in os.listdir(events_dir):
+        event_dir = os.path.join(events_dir, name)
+        manifest = _read_manifest(os.path.join(event_dir, MANIFEST_FILE)) or {}
+        image_path = manifest.get("image_path")
+        if image_path and os.path.exists(image_path):
+            _event_links[image_path] = event_dir
+        device_id = manifest.get("device_id") or name.rsplit('_', 1)[0]
+        _catalog.setdefault(device_id, _DeviceImages()).event_bytes += _dir_size(event_dir)
+
+def _last_modified(path):
+    """Čas poslednej zmeny adresára alebo súboru v ňom."""
+    latest = 0
+    try:
+        latest = os.path.getmtime(path)
+        with os.scandir(path) as entries:
+            for entry in entries:
+                latest = max(latest, entry.stat().st_mtime)
+    except OSError:
+        pass
+    return latest
+
+def remove_orphaned_events(max_age=ORPHAN_EVENT_GRACE):
+    """Zmaže udalosti bez spúšťacej snímky nezmenené dlhšie ako max_age sekúnd.
+
+    Vráti počet uvoľnených bajtov. Volá ho uchovávanie obrázkov.
+    """
+    events_dir = _events_dir()
+    if not os.path.isdir(events_dir):
+        return 0
+    with _catalog_lock:
+        _ensure_catalog()
+        linked = set(_event_links.values())
+    cutoff = time.time() - max_age
+    freed = 0
+    for name in os.listdir(events_dir):
+        event_dir = os.path.join(events_dir, name)
+        if event_dir in linked or not os.path.isdir(event_dir):
+            continue
+        with _events_lock:
+            manifest = _read_manifest(os.path.join(event_dir, MANIFEST_FILE)) or {}
+            image_path = manifest.get("image_path")
+            if (image_path and os.path.exists(image_path)) or _last_modified(event_dir) > cutoff:
+                continue
+            size = _dir_size(event_dir)
+            shutil.rmtree(event_dir, ignore_errors=True)
+        freed += size
+        device_id = manifest.get("device_id") or name.rsplit('_', 1)[0]
+        with _catalog_lock:
+            images = _catalog.get(device_id)
+            if images is not None:
+                images.event_bytes = max(0, images.event_bytes - size)
+        logging.info(f"Zmazaná neúplná udalosť bez spúšťacej snímky: {event_dir}")
+    return freed
+
+def _dir_size(path):
+    """Veľkosť súborov v adresári udalosti.
+
+    Spúšťacia snímka je pevný odkaz na obrázok galérie, ktorý sa už počíta
+    v images.bytes - súbory s viacerými odkazmi sa preto nepočítajú.
+    """
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    if stat.st_nlink <= 1:
+                        total += stat.st_size
+    except OSError:
+        pass
+    return total
+
+def _index_image(device_id, image_path, event_dir=None):
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return
+    global _catalog_version
+    with _catalog_lock:
+        _catalog_version += 1
+        if event_dir:
+            _event_links[image_path] = event_dir
+        if not _catalog_loaded:
+            # Katalóg sa načíta celý pri prvom dotaze, nový súbor v ňom už bude
+            return
+        # Opätovné uloženie alebo indexovanie toho istého súboru nepridá druhý záznam
+        _catalog.setdefault(device_id, _DeviceImages()).add(stat.st_mtime, image_path, stat.st_size)
+
+def _index_event_frame(device_id, size):
+    with _catalog_lock:
+        if _catalog_loaded:
+            _catalog.setdefault(device_id, _DeviceImages()).event_bytes += size
+
+def reload_catalog():
+    """Zahodí katalóg, pri ďalšom dotaze sa znova načíta z disku."""
+    global _catalog_loaded, _catalog_version
+    with _catalog_lock:
+        _catalog.clear()
+        _event_links.clear()
+        _catalog_loaded = False
+        _catalog_version += 1
+
+def forget_image(image_path):
+    """Odstráni obrázok z katalógu (napr. po zmazaní súboru)."""
+    global _catalog_version
+    device_id = parse_device_id(os.path.basename(image_path))
+    with _catalog_lock:
+        images = _catalog.get(device_id)
+        if images is None:
+            return
+        index = images.find(image_path)
+        if index >= 0:
+            images.remove_at(index)
+            _catalog_version += 1
+
+def delete_image(image_path):
+    """Zmaže obrázok galérie aj s adresárom jeho udalosti a vráti počet uvoľnených bajtov."""
+    global _catalog_version
+    device_id = parse_device_id(os.path.basename(image_path))
+    freed = 0
+    with _catalog_lock:
+        _catalog_version += 1
+        images = _catalog.get(device_id)
+        index = images.find(image_path) if images is not None else -1
+        if index >= 0:
+            freed += images.sizes[index]
+            images.remove_at(index)
+        event_dir = _event_links.pop(image_path, None)
+    # Veľkosť udalosti sa zistí pred zmazaním obrázka, kým je spúšťacia snímka ešte odkazom
+    event_bytes = _dir_size(event_dir) if event_dir else 0
+    try:
+        os.remove(image_path)
+    except FileNotFoundError:
+        pass
+    if event_dir:
+        shutil.rmtree(event_dir, ignore_errors=True)
+        freed += event_bytes
+        with _catalog_lock:
+            if images is not None:
+                images.event_bytes = max(0, images.event_bytes - event_bytes)
+    _remove_empty_shard(os.path.dirname(image_path))
+    return freed
+
+def _remove_empty_shard(directory):
+    """Zmaže prázdny adresár zariadenia a prázdny adresár dňa."""
+    if os.path.normpath(directory) == os.path.normpath(IMAGES_DIR):
+        return
+    for path in (directory, os.path.dirname(directory)):
+        if os.path.normpath(path) == os.path.normpath(IMAGES_DIR):
+            return
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+
+def get_catalog_version():
+    """Vráti počítadlo zmien katalógu obrázkov."""
+    return _catalog_version
+
+def get_storage_usage():
+    """Vráti {device_id: {'count', 'bytes', 'oldest'}} pre všetky zariadenia v katalógu."""
+    with _catalog_lock:
+        _ensure_catalog()
+        return {
+            device_id: {
+                'count': len(images.times),
+                'bytes': images.bytes + images.event_bytes,
+                'oldest': images.times[0] if images.times else None
+            }
+            for device_id, images in _catalog.items()
+        }
+
+def get_oldest_images(device_id, limit=100):
+    """Vráti [(timestamp, path)] najstarších obrázkov zariadenia."""
+    with _catalog_lock:
+        _ensure_catalog()
+        images = _catalog.get(device_id)
+        if images is None:
+            return []
+        return list(zip(images.times[:limit], images.paths[:limit]))
+
+def _latest_entry(device_id):
+    """Vráti (timestamp, path) najnovšieho existujúceho obrázka zariadenia. Volá sa so zámkom."""
+    global _catalog_version
+    images = _catalog.get(device_id)
+    while images and images.times:
+        path = images.paths[-1]
+        if os.path.exists(path):
+            return images.times[-1], path
+        # Súbor zmazaný mimo katalógu
+        images.remove_at(len(images.times) - 1)
+        _catalog_version += 1
+    return None
+
+def get_latest_image(device_id=None):
+    """Vráti cestu k najnovšiemu obrázku zariadenia (bez device_id najnovší zo všetkých) alebo None."""
+    with _catalog_lock:
+        _ensure_catalog()
+        if device_id is not None:
+            entry = _latest_entry(device_id)
+        else:
+            entries = [e for e in (_latest_entry(d) for d in list(_catalog)) if e]
+            entry = max(entries) if entries else None
+    return entry[1] if entry else None
+
+def _event_id_of(device_id, event_dir):
+    """Vráti event_id z názvu adresára udalosti {device_id}_{event_id}."""
+    name = os.path.basename(event_dir)
+    if name.startswith(f"{device_id}_"):
+        return name[len(device_id) + 1:]
+    return name.rsplit('_', 1)[-1]
+
+def get_latest_images():
+    """Vráti najnovší obrázok pre každé zariadenie: {device_id: {path, timestamp, filename, event_id}}.
+
+    event_id je None, ak obrázok nie je spúšťacou snímkou udalosti.
+    """
+    result = {}
+    with _catalog_lock:
+        _ensure_catalog()
+        for device_id in list(_catalog):
+            entry = _latest_entry(device_id)
+            if entry:
+                event_dir = _event_links.get(entry[1])
+                result[device_id] = {
+                    'path': entry[1],
+                    'timestamp': entry[0],
+                    'filename': os.path.basename(entry[1]),
+                    'event_id': _event_id_of(device_id, event_dir) if event_dir else None
+                }
+    return result
+
+def get_images_between(device_id, start=None, end=None):
+    """Vráti [(timestamp, path)] obrázkov zariadenia so start <= timestamp <= end, od najstaršieho."""
+    with _catalog_lock:
+        _ensure_catalog()
+        images = _catalog.get(device_id)
+        if images is None:
+            return []
+        lo = bisect_left(images.times, start) if start is not None else 0
+        hi = bisect_right(images.times, end) if end is not None else len(images.times)
+        return list(zip(images.times[lo:hi], images.paths[lo:hi]))
+
+def _events_dir():
+    return os.path.join(IMAGES_DIR, EVENTS_DIR_NAME)
+
+def is_valid_event_id(event_id):
+    return event_id is not None and EVENT_ID_PATTERN.fullmatch(str(event_id)) is not None
+
+def _event_dir(device_id, event_id):
+    if not is_valid_event_id(event_id):
+        raise ValueError(f"Neplatné event_id: {event_id!r}")
+    return os.path.join(_events_dir(), f"{device_id}_{event_id}")
+
+def _write_image(path, image_data):
+    started = time.perf_counter()
+    with open(path, 'wb') as f:
+        f.write(image_data)
+    observe("image_write_seconds", time.perf_counter() - started)
+    inc("image_write_bytes_total", len(image_data))
+
+def is_primary_frame(metadata):
+    """Samostatný obrázok alebo spúšťacia snímka udalosti (ostatné snímky burstu nie)."""
+    metadata = metadata or {}
+    return not metadata.get("event_id") or metadata.get("phase") == "trigger"
+
+def _store(device_id, metadata, write):
+    """Uloží obrázok funkciou write(path) a vráti cestu k nemu.
+
+    Samostatné obrázky a spúšťacia snímka udalosti sa ukladajú do IMAGES_DIR,
+    ostatné snímky udalosti iba do adresára udalosti.
+    """
+    event_id = (metadata or {}).get("event_id")
+    if not event_id:
+        image_path = allocate_image_path(device_id)
+        write(image_path)
+        _index_image(device_id, image_path)
+        return image_path
+
+    event_dir = _event_dir(device_id, event_id)
+    os.makedirs(event_dir, exist_ok=True)
+    index = int(metadata.get("frame_index", 0))
+    frame_path = os.path.join(event_dir, f"frame_{index:03d}.jpg")
+    write(frame_path)
+
+    image_path = frame_path
+    if is_primary_frame(metadata):
+        # Spúšťacia snímka je aj medzi bežnými obrázkami (galéria, e-mail)
+        image_path = allocate_image_path(device_id)
+        try:
+            os.link(frame_path, image_path)
+        except OSError:
+            shutil.copyfile(frame_path, image_path)
+        _index_image(device_id, image_path, event_dir)
+    else:
+        _index_event_frame(device_id, os.path.getsize(frame_path))
+
+    _add_to_manifest(event_dir, device_id, metadata, frame_path,
+                     image_path if image_path != frame_path else None)
+    return image_path
+
+def save_image(device_id, image_data, metadata=None):
+    """Zapíše obrázok na disk a vráti cestu k nemu.
+
+    image_data môže byť bytes alebo memoryview - zapisuje sa priamo bez kopírovania.
+    """
+    try:
+        return _store(device_id, metadata, lambda path: _write_image(path, image_data))
+    except Exception as e:
+        logging.error(f"Chyba pri ukladaní obrázka od {device_id}: {e}")
+        raise
+
+def store_image_file(device_id, source_path, metadata=None):
+    """Presunie hotový súbor (napr. zložený z častí) medzi obrázky, vráti cestu k nemu."""
+    return _store(device_id, metadata, lambda path: os.replace(source_path, path))
+
+def _add_to_manifest(event_dir, device_id, metadata, frame_path, image_path=None):
+    manifest_path = os.path.join(event_dir, MANIFEST_FILE)
+    with _events_lock:
+        manifest = _read_manifest(manifest_path) or {
+            "event_id": metadata["event_id"],
+            "device_id": device_id,
+            "trigger_time": metadata.get("trigger_time"),
+            "frame_count": metadata.get("frame_count"),
+            "created": datetime.now().isoformat(),
+            "frames": []
+        }
+        frames = [f for f in manifest["frames"] if f["index"] != int(metadata.get("frame_index", 0))]
+        frames.append({
+            "index": int(metadata.get("frame_index", 0)),
+            "phase": metadata.get("phase"),
+            "timestamp": metadata.get("timestamp"),
+            "offset": metadata.get("offset"),
+            "path": frame_path
+        })
+        frames.sort(key=lambda f: f["index"])
+        manifest["frames"] = frames
+        if image_path:
+            manifest["image_path"] = image_path
+        atomic_write_json(manifest_path, manifest, fsync=False)
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'rb') as f:
+            return json_codec.load(f)
+    except (OSError, ValueError):
+        return None
+
+def get_event(device_id, event_id):
+    """Vráti manifest udalosti so zoznamom snímok alebo None."""
+    if not is_valid_event_id(event_id):
+        return None
+    return _read_manifest(os.path.join(_event_dir(device_id, event_id), MANIFEST_FILE))
+
+def list_events(device_id=None, limit=20):
+    """Vráti manifesty posledných udalostí (od najnovšej)."""
+    events_dir = _events_dir()
+    if not os.path.isdir(events_dir):
+        return []
+    entries = []
+    for name in os.listdir(events_dir):
+        if device_id and not name.startswith(f"{device_id}_"):
+            continue
+        manifest_path = os.path.join(events_dir, name, MANIFEST_FILE)
+        try:
+            entries.append((os.path.getmtime(manifest_path), manifest_path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+    events = []
+    for _, manifest_path in entries[:limit]:
+        manifest = _read_manifest(manifest_path)
+        if manifest is not None:
+            events.append(manifest)
+    return events
@@ -0,0 +1,80 @@
+# json_codec.py - Spoločné kódovanie a dekódovanie JSON
+#
+# Pri importe sa vyberie najrýchlejší dostupný backend: orjson, ak je
+# nainštalovaný, inak štandardný modul json. Premenná prostredia
+# JSON_CODEC=json vynúti štandardný modul (napr. pri porovnávaní).
+# Výstup je predvolene kompaktný a v UTF-8 (bez \uXXXX escapovania),
+# odsadenie o 2 medzery iba pri pretty=True - pre súbory, ktoré upravuje
+# človek (settings.json, devices.json, mqtt_config.json).
+import io
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson.JSONDecodeError je podtrieda json.JSONDecodeError
+JSONDecodeError = json.JSONDecodeError
+
+def _json_dumpb(obj, pretty=False, default=None):
+    if pretty:
+        text = json.dumps(obj, ensure_ascii=False, indent=2, default=default)
+    else:
+        text = json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=default)
+    return text.encode("utf-8")
+
+def _json_loads(data):
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+    _ORJSON_PRETTY = _ORJSON_OPTIONS | orjson.OPT_INDENT_2
+
+    def _orjson_dumpb(obj, pretty=False, default=None):
+        try:
+            return orjson.dumps(obj, default=default, option=_ORJSON_PRETTY if pretty else _ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Čísla mimo 64 bitov a pod. zvládne štandardný modul
+            return _json_dumpb(obj, pretty, default)
+
+    _orjson_loads = orjson.loads
+
+# Dostupné backendy: názov -> (dumpb, loads)
+BACKENDS = {"json": (_json_dumpb, _json_loads)}
+if orjson is not None:
+    BACKENDS["orjson"] = (_orjson_dumpb, _orjson_loads)
+
+BACKEND = os.environ.get("JSON_CODEC") or ("orjson" if orjson is not None else "json")
+if BACKEND not in BACKENDS:
+    BACKEND = "json"
+_dumpb, _loads = BACKENDS[BACKEND]
+
+def dumpb(obj, pretty=False, default=None):
+    """Zakóduje obj do JSON a vráti bajty v UTF-8."""
+    return _dumpb(obj, pretty, default)
+
+def dumps(obj, pretty=False, default=None):
+    """Zakóduje obj do JSON a vráti reťazec."""
+    return _dumpb(obj, pretty, default).decode("utf-8")
+
+def loads(data):
+    """Dekóduje JSON z reťazca alebo bajtov (bytes, bytearray, memoryview)."""
+    return _loads(data)
+
+def load(f):
+    """Načíta JSON z otvoreného súboru (textového aj binárneho)."""
+    return _loads(f.read())
+
+def dump(obj, f, pretty=False):
+    """Zapíše obj do otvoreného súboru (textového aj binárneho)."""
+    data = _dumpb(obj, pretty)
+    if pretty:
+        data += b"\n"
+    if isinstance(f, io.TextIOBase):
+        f.write(data.decode("utf-8"))
+    else:
+        f.write(data)
@@ -0,0 +1,209 @@
+# metrics.py - Počítadlá a histogramy časov na horúcich cestách
+#
+# Metriky sa držia v pamäti, web_app ich zverejňuje na /metrics vo formáte
+# Prometheus a súhrn posiela na stránku MQTT Monitor. Keď sú metriky vypnuté
+# (sekcia "metrics" v settings.json), inc/observe skončia hneď po kontrole
+# príznaku a timer() vráti zdieľaný prázdny kontext, takže meranie nestojí
+# prakticky nič.
+import bisect
+import threading
+import time
+
+# Hranice košov histogramov v sekundách
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Popis metrík pre # HELP a # TYPE
+METRICS = {
+    "mqtt_messages_total": ("counter", "Spracované MQTT správy podľa triedy tém"),
+    "mqtt_queue_wait_seconds": ("histogram", "Čas správy vo fronte od príchodu po začiatok spracovania"),
+    "mqtt_decode_seconds": ("histogram", "Dekódovanie MQTT správy (UTF-8, JSON)"),
+    "mqtt_dispatch_seconds": ("histogram", "Spracovanie dekódovanej MQTT správy vrátane callbackov"),
+    "device_status_update_seconds": ("histogram", "Trvanie update_device_status"),
+    "state_update_seconds": ("histogram", "Trvanie zmeny stavu systému (modify_state/update_state)"),
+    "alert_write_seconds": ("histogram", "Zápis upozornenia do žurnálu"),
+    "email_send_seconds": ("histogram", "Odoslanie e-mailu cez SMTP"),
+    "image_write_seconds": ("histogram", "Zápis obrázka na disk"),
+    "image_write_bytes_total": ("counter", "Bajty obrázkov zapísané na disk"),
+    "trigger_to_countdown_seconds": ("histogram", "Od vyhodnotenia správy zo senzora po spustenie odpočtu alarmu"),
+    "http_request_seconds": ("histogram", "Trvanie HTTP požiadavky podľa routy"),
+    "http_requests_total": ("counter", "HTTP požiadavky podľa routy a stavového kódu"),
+    "mqtt_queue_depth": ("gauge", "Počet správ čakajúcich vo fronte podľa triedy tém"),
+    "mqtt_dropped_messages": ("gauge", "Zahodené správy od spustenia podľa triedy tém")
+}
+
+_enabled = False
+_lock = threading.Lock()
+_counters = {}     # (názov, štítky) -> hodnota
+_gauges = {}       # (názov, štítky) -> hodnota
+_histograms = {}   # (názov, štítky) -> [počty v košoch..., súčet, počet, maximum]
+_started_at = time.time()
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _observe(self.name, time.perf_counter() - self.start, self.labels)
+        return False
+
+def is_enabled():
+    return _enabled
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+def configure_metrics(config):
+    """Použije sekciu "metrics" zo settings.json."""
+    set_enabled((config or {}).get("enabled", True))
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())) if labels else ())
+
+def inc(name, value=1, **labels):
+    """Zvýši počítadlo name o value."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def set_gauge(name, value, **labels):
+    if not _enabled:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+def observe(name, value, **labels):
+    """Zaznamená hodnotu (v sekundách) do histogramu name."""
+    if _enabled:
+        _observe(name, value, labels)
+
+def _observe(name, value, labels):
+    key = _key(name, labels)
+    index = bisect.bisect_left(DEFAULT_BUCKETS, value)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(DEFAULT_BUCKETS) + 1) + [0.0, 0, 0.0]
+        histogram[index] += 1
+        histogram[-3] += value
+        histogram[-2] += 1
+        if value > histogram[-1]:
+            histogram[-1] = value
+
+def timer(name, **labels):
+    """Kontextový manažér, ktorý zmeria trvanie bloku do histogramu name."""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name, labels)
+
+def reset_metrics():
+    global _started_at
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+        _started_at = time.time()
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = []
+    for label, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{label}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+def render_prometheus():
+    """Vráti všetky metriky v textovom formáte Prometheus."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {key: list(values) for key, values in _histograms.items()}
+
+    series = {}
+    for kind, store in (("counter", counters), ("gauge", gauges), ("histogram", histograms)):
+        for (name, labels), value in store.items():
+            series.setdefault((name, kind), []).append((labels, value))
+
+    lines = []
+    for (name, kind), entries in sorted(series.items()):
+        help_text = METRICS.get(name, (kind, name))[1]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(entries):
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(DEFAULT_BUCKETS, value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+            cumulative += value[len(DEFAULT_BUCKETS)]
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-3])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[-2]}")
+    return "\n".join(lines) + "\n"
+
+def _bucket_quantile(counts, total, q):
+    """Horná hranica koša, do ktorého padne kvantil q (odhad z histogramu)."""
+    rank = q * total
+    cumulative = 0
+    for bound, count in zip(DEFAULT_BUCKETS, counts):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return None
+
+def get_summary():
+    """Súhrn metrík pre stránku MQTT Monitor (časy v milisekundách)."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(values) for key, values in _histograms.items()}
+
+    timings = []
+    for (name, labels), values in sorted(histograms.items()):
+        count = values[-2]
+        if not count:
+            continue
+        p95 = _bucket_quantile(values, count, 0.95)
+        timings.append({
+            "name": name,
+            "labels": dict(labels),
+            "count": count,
+            "mean_ms": round(values[-3] / count * 1000, 3),
+            "p95_ms": round(p95 * 1000, 3) if p95 is not None else None,
+            "max_ms": round(values[-1] * 1000, 3)
+        })
+
+    image_bytes = sum(value for (name, _), value in counters.items() if name == "image_write_bytes_total")
+    image_seconds = sum(values[-3] for (name, _), values in histograms.items() if name == "image_write_seconds")
+    return {
+        "enabled": _enabled,
+        "since": _started_at,
+        "counters": [{"name": name, "labels": dict(labels), "value": value}
+                     for (name, labels), value in sorted(counters.items())],
+        "timings": timings,
+        "image_write_bytes_per_second": round(image_bytes / image_seconds) if image_seconds > 0 else None
+    }
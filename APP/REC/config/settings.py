@@ -1,13 +1,155 @@
 # settings.py - Správa nastavení
-import json
+#
+# Nastavenia sa držia v pamäti a zo súboru sa načítajú znova iba vtedy,
+# keď sa zmení jeho mtime, inode alebo veľkosť (napr. ručná úprava súboru),
+# alebo po save_settings. Poslucháči zaregistrovaní cez
+# register_settings_listener dostanú zoznam zmenených sekcií.
+import copy
+import logging
 import os
+import threading
+from config.storage import atomic_write_json
+from config import json_codec
 
 SETTINGS_FILE = os.path.join(os.path.dirname(__file__), '../../data/settings.json')
 
+# Sekcie, ktoré musia byť objektmi
+DICT_SECTIONS = (
+    "notification_preferences", "email_settings", "storage", "alerts_log", "sensor_monitoring",
+    "email_dispatch", "image_retention", "image_cache", "web_server", "metrics", "logging"
+)
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+_settings = None
+_file_key = None
+_lock = threading.Lock()
+_listeners = []
+_MISSING = object()
+
+def validate_settings(settings):
+    """Vráti zoznam chýb v nastaveniach (prázdny zoznam = nastavenia sú platné)."""
+    if not isinstance(settings, dict):
+        return ["Nastavenia musia byť JSON objekt"]
+    errors = []
+    pin = settings.get("pin_code")
+    if pin is not None and (not isinstance(pin, str) or not pin.isdigit()):
+        errors.append("pin_code musí byť reťazec číslic")
+    for section in DICT_SECTIONS:
+        if section in settings and not isinstance(settings[section], dict):
+            errors.append(f"Sekcia {section} musí byť objekt")
+    prefs = settings.get("notification_preferences")
+    if isinstance(prefs, dict):
+        for key, value in prefs.items():
+            if not isinstance(value, bool):
+                errors.append(f"notification_preferences.{key} musí byť true alebo false")
+    email = settings.get("email_settings")
+    if isinstance(email, dict) and "smtp_port" in email:
+        port = email["smtp_port"]
+        if isinstance(port, bool) or not isinstance(port, int) or not 0 < port < 65536:
+            errors.append("email_settings.smtp_port musí byť číslo portu 1-65535")
+    log_config = settings.get("logging")
+    if isinstance(log_config, dict):
+        levels = log_config.get("levels") or {}
+        if not isinstance(levels, dict):
+            errors.append("logging.levels musí byť objekt {logger: úroveň}")
+            levels = {}
+        levels = dict(levels)
+        if "level" in log_config:
+            levels["(root)"] = log_config["level"]
+        for name, level in levels.items():
+            if level not in LOG_LEVELS:
+                errors.append(f"Úroveň logovania {name} musí byť jedna z {', '.join(LOG_LEVELS)}")
+        if log_config.get("format", "json") not in ("json", "text"):
+            errors.append("logging.format musí byť json alebo text")
+    return errors
+
+def _stat_key():
+    try:
+        stat = os.stat(SETTINGS_FILE)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+def _changed_keys(old, new):
+    old = old or {}
+    return sorted(key for key in set(old) | set(new) if old.get(key, _MISSING) != new.get(key, _MISSING))
+
+def _refresh():
+    """Načíta súbor znova, ak sa od posledného čítania zmenil. Vráti zmenené sekcie."""
+    global _settings, _file_key
+    key = _stat_key()
+    if _settings is not None and key == _file_key:
+        return []
+
+    try:
+        with open(SETTINGS_FILE, 'rb') as f:
+            data = json_codec.load(f)
+    except (OSError, ValueError) as e:
+        if _settings is None:
+            raise
+        logging.error(f"Nepodarilo sa znova načítať nastavenia, ponechávajú sa posledné platné: {e}")
+        _file_key = key
+        return []
+
+    errors = validate_settings(data)
+    if errors:
+        if _settings is not None:
+            logging.error(f"Neplatné nastavenia v {SETTINGS_FILE}, ponechávajú sa posledné platné: {'; '.join(errors)}")
+            _file_key = key
+            return []
+        logging.warning(f"Nastavenia obsahujú chyby: {'; '.join(errors)}")
+
+    changed = _changed_keys(_settings, data) if _settings is not None else []
+    _settings = data
+    _file_key = key
+    return changed
+
+def _notify(changed, settings):
+    if not changed:
+        return
+    for callback, keys in list(_listeners):
+        if keys is not None and keys.isdisjoint(changed):
+            continue
+        try:
+            callback(changed, settings)
+        except Exception as e:
+            logging.error(f"Chyba v poslucháčovi zmien nastavení: {e}")
+
+def get_settings():
+    """Vráti zdieľanú kópiu nastavení v pamäti - iba na čítanie, na úpravy slúži load_settings."""
+    with _lock:
+        changed = _refresh()
+        settings = _settings
+    _notify(changed, settings)
+    return settings
+
+def get_setting(key, default=None):
+    return get_settings().get(key, default)
+
 def load_settings():
-    with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Vráti kópiu nastavení, ktorú môže volajúci upraviť a uložiť cez save_settings."""
+    return copy.deepcopy(get_settings())
 
 def save_settings(settings):
-    with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(settings, f, ensure_ascii=False, indent=2)
+    errors = validate_settings(settings)
+    if errors:
+        raise ValueError(f"Neplatné nastavenia: {'; '.join(errors)}")
+
+    global _settings, _file_key
+    with _lock:
+        atomic_write_json(SETTINGS_FILE, settings, pretty=True)
+        new_settings = copy.deepcopy(settings)
+        changed = _changed_keys(_settings, new_settings)
+        _settings = new_settings
+        _file_key = _stat_key()
+    _notify(changed, new_settings)
+
+def register_settings_listener(callback, keys=None):
+    """Zaregistruje funkciu callback(changed_keys, settings) volanú po zmene nastavení.
+
+    Ak je zadané keys, callback sa volá iba pri zmene niektorej z týchto sekcií.
+    """
+    keys = frozenset(keys) if keys is not None else None
+    if not any(existing is callback for existing, _ in _listeners):
+        _listeners.append((callback, keys))
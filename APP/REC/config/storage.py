@@ -0,0 +1,35 @@
+# storage.py - Pomocné funkcie pre bezpečný zápis dátových súborov
+import os
+import tempfile
+from config import json_codec
+
+def atomic_write_json(path, data, fsync=True, pretty=False):
+    """Atomicky zapíše dáta do JSON súboru.
+
+    Dáta sa najprv zapíšu do dočasného súboru v rovnakom adresári a ten sa
+    potom premenuje na cieľový súbor, takže pri páde sa nikdy neobjaví
+    napoly zapísaný súbor.
+
+    Args:
+        path (str): Cesta k cieľovému súboru
+        data: Dáta serializovateľné do JSON
+        fsync (bool): Či sa má pred premenovaním vynútiť zápis na disk
+        pretty (bool): Odsadený výstup pre súbory, ktoré upravuje človek
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            json_codec.dump(data, f, pretty=pretty)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
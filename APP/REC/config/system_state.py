@@ -1,12 +1,34 @@
 # system_state.py - Správa stavu systému
-import json
+#
+# Stav sa drží v pamäti procesu a všetky zmeny prechádzajú cez jeden zámok,
+# takže súbežné zápisy (odpočet, webové požiadavky, UI, MQTT) sa navzájom
+# neprepíšu. Každá zmena zvýši verziu stavu a zapíše sa atomicky (dočasný
+# súbor + premenovanie), voliteľne s fsync podľa "storage.state_fsync".
+# Odvodené polia (zostávajúci čas odpočtu) sa neukladajú, počítajú sa pri čítaní.
 import os
 import logging
+import threading
+import time
 from datetime import datetime
+from config.storage import atomic_write_json
+from config import json_codec
+from config.metrics import observe
+
+# Funkcie volané po každom uložení stavu (napr. odosielanie zmien do webu)
+_state_listeners = []
+# Počítadlo zmien stavu (napr. pre ETag webového API a compare-and-swap)
+_state_version = 0
+# Stav držaný v pamäti - zdieľaný celým procesom
+_state_lock = threading.RLock()
+_state_cache = None
+_state_fsync = None
 
 # Cesta k súboru so stavom systému
 STATE_FILE = os.path.join(os.path.dirname(__file__), '../../data/system_state.json')
 
+# Polia vypočítané pri čítaní z trvalých polí - na disk sa nikdy nezapisujú
+EPHEMERAL_FIELDS = ("alarm_countdown_remaining",)
+
 # Výchozí stav systému
 DEFAULT_STATE = {
     "system_activated": False,
@@ -27,8 +49,7 @@ def ensure_state_file_exists():
         # Skontrolujeme, či existuje súbor
         if not os.path.exists(STATE_FILE):
             # Ak nie, vytvoríme ho s predvoleným stavom
-            with open(STATE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(DEFAULT_STATE, f, ensure_ascii=False, indent=2)
+            atomic_write_json(STATE_FILE, DEFAULT_STATE)
             logging.info(f"Vytvorený nový súbor stavu systému: {STATE_FILE}")
             return True
         
@@ -37,68 +58,180 @@ def ensure_state_file_exists():
         logging.error(f"Chyba pri kontrole/vytváraní súboru stavu: {e}")
         return False
 
-def load_state():
-    """Načíta aktuálny stav systému zo súboru."""
+def _read_state_file():
+    """Načíta stav zo súboru, poškodený súbor nahradí predvoleným stavom."""
+    ensure_state_file_exists()
     try:
-        # Zabezpečíme, že súbor existuje
-        ensure_state_file_exists()
-        
-        with open(STATE_FILE, 'r', encoding='utf-8') as f:
-            state = json.load(f)
-        
-        # Zabezpečiť, že všetky potrebné kľúče existujú
-        for key, value in DEFAULT_STATE.items():
-            if key not in state:
-                state[key] = value
-        
-        return state
-    except Exception as e:
-        logging.error(f"Chyba pri načítaní stavu systému: {e}")
-        # V prípade chyby vrátime predvolený stav
-        return DEFAULT_STATE.copy()
+        with open(STATE_FILE, 'rb') as f:
+            state = json_codec.load(f)
+        if not isinstance(state, dict):
+            raise ValueError("stav nie je JSON objekt")
+    except (OSError, ValueError) as e:
+        logging.error(f"Chyba pri načítaní stavu systému, použije sa predvolený stav: {e}")
+        state = {}
+    # Súbory zo staršej verzie môžu obsahovať uložené odvodené polia
+    for key in EPHEMERAL_FIELDS:
+        state.pop(key, None)
+    
+    # Zabezpečiť, že všetky potrebné kľúče existujú
+    for key, value in DEFAULT_STATE.items():
+        if key not in state:
+            state[key] = value
+    return state
+
+def _get_cache():
+    """Vráti stav v pamäti, pri prvom použití ho načíta zo súboru.
+
+    Musí sa volať so zamknutým _state_lock.
+    """
+    global _state_cache
+    if _state_cache is None:
+        _state_cache = _read_state_file()
+    return _state_cache
+
+def _use_fsync():
+    global _state_fsync
+    if _state_fsync is None:
+        try:
+            from config.settings import get_setting
+            _state_fsync = bool(get_setting('storage', {}).get('state_fsync', True))
+        except Exception:
+            _state_fsync = True
+    return _state_fsync
+
+def set_state_fsync(enabled):
+    """Zapne alebo vypne fsync pri ukladaní stavu."""
+    global _state_fsync
+    _state_fsync = bool(enabled)
+
+def get_countdown_remaining(state, now=None):
+    """Vráti zostávajúce sekundy odpočtu alarmu vypočítané z alarm_countdown_deadline."""
+    deadline = state.get('alarm_countdown_deadline')
+    if not state.get('alarm_countdown_active', False) or not deadline:
+        return 0
+    return max(0, int(deadline - (now if now is not None else time.time())))
 
-def save_state(state):
-    """Uloží stav systému do súboru."""
+def _with_derived(state):
+    state['alarm_countdown_remaining'] = get_countdown_remaining(state)
+    return state
+
+def load_state():
+    """Vráti kópiu aktuálneho stavu systému vrátane odvodených polí."""
+    with _state_lock:
+        return _with_derived(dict(_get_cache()))
+
+def load_state_versioned():
+    """Vráti (kópia stavu, verzia) pre neskoršie compare_and_set."""
+    with _state_lock:
+        return _with_derived(dict(_get_cache())), _state_version
+
+def _commit(state):
+    """Uloží nový stav do pamäte aj na disk. Volá sa so zamknutým _state_lock."""
+    global _state_cache, _state_version
+    for key in EPHEMERAL_FIELDS:
+        state.pop(key, None)
+    atomic_write_json(STATE_FILE, state, fsync=_use_fsync())
+    _state_cache = state
+    _state_version += 1
+    return _with_derived(dict(state))
+
+def save_state(state, expected_version=None):
+    """Nahradí celý stav systému.
+
+    Ak je zadané expected_version a stav sa medzitým zmenil, nič neuloží a vráti False.
+    """
     try:
-        # Zabezpečíme, že adresár existuje
-        os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
-        
-        with open(STATE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
+        with _state_lock:
+            if expected_version is not None and expected_version != _state_version:
+                return False
+            saved = _commit(dict(state))
+            _notify_state_listeners(saved)
         return True
     except Exception as e:
         logging.error(f"Chyba pri ukladaní stavu systému: {e}")
         return False
 
-def update_state(updates):
-    """Aktualizuje stav systému špecifickými hodnotami."""
+def get_state_version():
+    """Vráti počítadlo zmien stavu, mení sa pri každom uložení."""
+    return _state_version
+
+def register_state_listener(callback):
+    """Zaregistruje funkciu callback(state) volanú po každej zmene stavu."""
+    if callback not in _state_listeners:
+        _state_listeners.append(callback)
+
+def unregister_state_listener(callback):
+    if callback in _state_listeners:
+        _state_listeners.remove(callback)
+
+def _notify_state_listeners(state):
+    for callback in list(_state_listeners):
+        try:
+            callback(dict(state))
+        except Exception as e:
+            logging.error(f"Chyba v poslucháčovi zmien stavu: {e}")
+
+def _merge(state, updates):
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(state.get(key, {}), dict):
+            # Ak je hodnota slovník, vykonať vnorené zlúčenie
+            state[key] = {**state.get(key, {}), **value}
+        else:
+            # Inak jednoducho aktualizovať hodnotu
+            state[key] = value
+
+def modify_state(mutator):
+    """Atomicky upraví stav funkciou mutator(state), ktorá mení dodanú kópiu.
+
+    Ak mutator vráti False, stav sa neuloží. Vráti nový stav alebo None.
+    """
+    started = time.perf_counter()
     try:
-        state = load_state()
-        for key, value in updates.items():
-            if isinstance(value, dict) and isinstance(state.get(key, {}), dict):
-                # Ak je hodnota slovník, vykonať vnorené zlúčenie
-                state[key] = {**state.get(key, {}), **value}
-            else:
-                # Inak jednoducho aktualizovať hodnotu
-                state[key] = value
-        
-        # Pridať časovú značku poslednej aktualizácie
-        state['last_updated'] = datetime.now().isoformat()
-        
-        save_state(state)
-        return state
+        with _state_lock:
+            state = dict(_get_cache())
+            if mutator(state) is False:
+                return None
+            # Pridať časovú značku poslednej aktualizácie
+            state['last_updated'] = datetime.now().isoformat()
+            saved = _commit(state)
+            # Poslucháči sa volajú pod zámkom, aby dostali zmeny v poradí zápisov
+            _notify_state_listeners(saved)
+        observe("state_update_seconds", time.perf_counter() - started)
+        return saved
     except Exception as e:
         logging.error(f"Chyba pri aktualizácii stavu systému: {e}")
         return None
 
+def update_state(updates):
+    """Aktualizuje stav systému špecifickými hodnotami."""
+    return modify_state(lambda state: _merge(state, updates))
+
+def compare_and_set(expected_version, updates):
+    """Aplikuje updates iba vtedy, ak sa stav od načítania (load_state_versioned) nezmenil.
+
+    Vráti nový stav alebo None, ak medzitým stav zmenil iný zapisovateľ.
+    """
+    def apply(state):
+        if _state_version != expected_version:
+            return False
+        _merge(state, updates)
+    return modify_state(apply)
+
+def register_failed_attempt(max_attempts=3, lockout_seconds=30):
+    """Zvýši počet nesprávnych PIN kódov, po max_attempts nastaví lockout."""
+    def apply(state):
+        attempts = state.get('failed_attempts', 0) + 1
+        if attempts >= max_attempts:
+            state['lockout_until'] = datetime.now().timestamp() + lockout_seconds
+            attempts = 0
+        state['failed_attempts'] = attempts
+    return modify_state(apply)
+
 def set_lockout(seconds):
     """Nastaví lockout systému na určený počet sekúnd."""
     try:
-        state = load_state()
         until = (datetime.now().timestamp() + seconds)
-        state['lockout_until'] = until
-        save_state(state)
-        return True
+        return update_state({'lockout_until': until}) is not None
     except Exception as e:
         logging.error(f"Chyba pri nastavovaní lockout: {e}")
         return False
@@ -117,29 +250,25 @@ def is_locked_out():
 
 def reset_system_state():
     """Reset the system to fix any issues while preserving armed/disarmed state."""
-    try:
-        # Load the current state to preserve armed mode
-        current_state = load_state()
-        armed_mode = current_state.get("armed_mode", "disarmed")
+    def reset(state):
+        # Preserve the armed mode
+        armed_mode = state.get("armed_mode", "disarmed")
         
         # Create a clean state
-        state = DEFAULT_STATE.copy()
-        state["last_updated"] = datetime.now().isoformat()
-        
-        # Preserve the armed mode
+        state.clear()
+        state.update(DEFAULT_STATE)
         state["armed_mode"] = armed_mode
         
         # Reset the problematic countdown/alarm states
         state["alarm_countdown_active"] = False
         state["alarm_countdown_deadline"] = None
         state["alarm_trigger_message"] = None
-        state["alarm_countdown_remaining"] = 0
         state["alarm_active"] = False
         state["lockout_until"] = None
-        
         logging.info(f"Resetting system state while preserving armed mode: {armed_mode}")
-        save_state(state)
-        return True
+    
+    try:
+        return modify_state(reset) is not None
     except Exception as e:
         logging.error(f"Error resetting system state: {e}")
         return False
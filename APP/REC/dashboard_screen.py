@@ -7,9 +7,9 @@ from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.button import MDFlatButton, MDRaisedButton
 from kivymd.uix.textfield import MDTextField
 from kivy.uix.gridlayout import GridLayout
-from config.system_state import load_state, update_state
+from config.system_state import load_state, update_state, get_countdown_remaining
 from config.devices_manager import load_devices
-from config.settings import load_settings
+from config.settings import get_settings
 import notification_service as ns
 import time
 import json
@@ -145,7 +145,7 @@ class DashboardScreen(MDScreen):
         if self.alarm_active:
             self.status_text = "ALARM AKTÍVNY! Narušenie detekované!"
         elif alarm_countdown_active:
-            countdown_remaining = max(0, int(state.get('alarm_countdown_deadline', 0) - time.time()))
+            countdown_remaining = get_countdown_remaining(state)
             self.status_text = f"POZOR! Odpočítavanie alarmu: {countdown_remaining}s"
         elif self.armed_mode == 'armed_home':
             self.status_text = "Systém zabezpečený - režim Doma"
@@ -157,11 +157,6 @@ class DashboardScreen(MDScreen):
         try:
             devices = load_devices()
             
-            device_status_path = os.path.join(os.path.dirname(__file__), '../data/device_status.json')
-            if os.path.exists(device_status_path):
-                with open(device_status_path, 'r', encoding='utf-8') as f:
-                    device_status = json.load(f)
-            
             self.device_count = str(len(devices))
             
         except Exception as e:
@@ -212,7 +207,7 @@ class DashboardScreen(MDScreen):
         if not pin:
             return
             
-        settings = load_settings()
+        settings = get_settings()
         correct_pin = settings.get("security_pin", "1234")
         
         if pin == correct_pin:
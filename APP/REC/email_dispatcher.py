@@ -0,0 +1,346 @@
+# email_dispatcher.py - Asynchrónne odosielanie e-mailových notifikácií
+import os
+import queue
+import smtplib
+import threading
+import time
+import logging
+from datetime import datetime
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from email.mime.image import MIMEImage
+from email.mime.base import MIMEBase
+from email import encoders
+from config.metrics import observe
+
+# Predvolená konfigurácia (sekcia "email_dispatch" v settings.json)
+DEFAULT_DISPATCH_CONFIG = {
+    "digest_window": 5,      # sekundy, počas ktorých sa upozornenia zlučujú do jedného e-mailu
+    "max_retries": 3,
+    "retry_backoff": 2,      # základ exponenciálneho čakania medzi pokusmi (sekundy)
+    "queue_size": 100,
+    "pool_size": 1,
+    "idle_timeout": 120      # po koľkých sekundách nečinnosti sa spojenie zatvorí
+}
+
+# Maximálny počet obrázkov priložených k súhrnnému e-mailu
+MAX_DIGEST_ATTACHMENTS = 3
+
+class EmailConfigError(Exception):
+    """Chýbajúce alebo neplatné e-mailové nastavenia - opakovanie nepomôže."""
+
+def _connection_key(email_config):
+    return (
+        email_config.get("smtp_server", "smtp.gmail.com"),
+        email_config.get("smtp_port", 587),
+        email_config.get("username", "")
+    )
+
+class SMTPConnectionPool:
+    """Udržiava otvorené a prihlásené SMTP spojenia pre opakované použitie."""
+
+    def __init__(self, max_size=1, idle_timeout=120):
+        self.max_size = max(1, int(max_size))
+        self.idle_timeout = idle_timeout
+        self._idle = []   # [(key, server, last_used)]
+        self._lock = threading.Lock()
+
+    def _open(self, email_config):
+        smtp_server = email_config.get("smtp_server", "smtp.gmail.com")
+        smtp_port = email_config.get("smtp_port", 587)
+        username = email_config.get("username", "")
+        password = email_config.get("password", "")
+
+        if not username or not password:
+            raise EmailConfigError("Chýba používateľské meno alebo heslo")
+
+        if smtp_port == 465:
+            server = smtplib.SMTP_SSL(smtp_server, smtp_port, timeout=30)
+        else:
+            server = smtplib.SMTP(smtp_server, smtp_port, timeout=30)
+            server.starttls()
+        server.login(username, password)
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def acquire(self, email_config):
+        """Vráti živé spojenie pre dané nastavenia, podľa potreby otvorí nové."""
+        key = _connection_key(email_config)
+        now = time.time()
+        stale = []
+        server = None
+        with self._lock:
+            remaining = []
+            for entry in self._idle:
+                entry_key, entry_server, last_used = entry
+                if server is None and entry_key == key and now - last_used < self.idle_timeout:
+                    server = entry_server
+                elif entry_key != key or now - last_used >= self.idle_timeout:
+                    stale.append(entry_server)
+                else:
+                    remaining.append(entry)
+            self._idle = remaining
+
+        for old in stale:
+            self._close(old)
+
+        if server is not None:
+            try:
+                # Overenie, že server spojenie medzitým nezatvoril
+                if server.noop()[0] == 250:
+                    return server
+            except Exception:
+                pass
+            self._close(server)
+
+        return self._open(email_config)
+
+    def release(self, email_config, server, broken=False):
+        """Vráti spojenie do poolu, pokazené spojenia zatvorí."""
+        if broken:
+            self._close(server)
+            return
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append((_connection_key(email_config), server, time.time()))
+                return
+        self._close(server)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, server, _ in idle:
+            self._close(server)
+
+def build_email(email_config, messages, image_paths=None):
+    """Zostaví e-mail s jedným upozornením alebo súhrnom viacerých upozornení."""
+    recipient = email_config.get("recipient")
+    image_paths = [path for path in (image_paths or []) if path and os.path.exists(path)]
+
+    msg = MIMEMultipart()
+    msg['From'] = email_config.get("username", "security@homesystem.local")
+    msg['To'] = recipient
+
+    if len(messages) == 1:
+        msg['Subject'] = "Domáci bezpečnostný systém - Upozornenie"
+        text, created = messages[0]
+        body = f"""
+        Domáci bezpečnostný systém - Upozornenie
+
+        {text}
+
+        Čas: {datetime.fromtimestamp(created).strftime('%d.%m.%Y %H:%M:%S')}
+        """
+    else:
+        msg['Subject'] = f"Domáci bezpečnostný systém - Súhrn upozornení ({len(messages)})"
+        lines = "\n".join(
+            f"        {datetime.fromtimestamp(created).strftime('%H:%M:%S')}  {text}"
+            for text, created in messages
+        )
+        body = f"""
+        Domáci bezpečnostný systém - Súhrn upozornení
+
+{lines}
+        """
+
+    if not image_paths:
+        body += "\n\nŽiadny obrázok nie je k dispozícii."
+    else:
+        body += "\n\nObrázok z kamery je priložený v prílohe."
+
+    msg.attach(MIMEText(body, 'plain'))
+
+    for image_path in image_paths[:MAX_DIGEST_ATTACHMENTS]:
+        try:
+            with open(image_path, 'rb') as img_file:
+                img_data = img_file.read()
+
+            if image_path.lower().endswith(('.jpg', '.jpeg')):
+                img_attachment = MIMEImage(img_data, _subtype="jpeg")
+            else:
+                img_attachment = MIMEBase('application', 'octet-stream')
+                img_attachment.set_payload(img_data)
+                encoders.encode_base64(img_attachment)
+
+            img_filename = os.path.basename(image_path)
+            img_attachment.add_header('Content-Disposition', f'attachment; filename="{img_filename}"')
+            msg.attach(img_attachment)
+        except Exception as e:
+            logging.error(f"Chyba pri pridávaní obrázka do e-mailu: {e}")
+
+    return msg
+
+class EmailDispatcher:
+    """Fronta e-mailových notifikácií spracovávaná na pozadí.
+
+    Volajúci sa vráti okamžite. Upozornenia, ktoré prídu počas digest_window,
+    sa odošlú ako jeden súhrnný e-mail, neúspešné odoslanie sa opakuje
+    s exponenciálnym čakaním.
+    """
+
+    def __init__(self, settings_loader, config=None):
+        """
+        Args:
+            settings_loader: Funkcia vracajúca aktuálne nastavenia systému
+            config (dict, optional): Sekcia "email_dispatch" zo settings.json
+        """
+        self.settings_loader = settings_loader
+        self.config = {**DEFAULT_DISPATCH_CONFIG, **(config or {})}
+        self.pool = SMTPConnectionPool(self.config["pool_size"], self.config["idle_timeout"])
+        self._queue = queue.Queue(maxsize=int(self.config["queue_size"]))
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "sent_emails": 0,
+            "sent_alerts": 0,
+            "digests": 0,
+            "failed": 0,
+            "dropped": 0,
+            "retries": 0,
+            "last_latency": None,
+            "max_latency": 0.0,
+            "total_latency": 0.0
+        }
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._worker_loop, daemon=True, name="EmailDispatcherThread")
+        self._thread.start()
+
+    def enqueue(self, message, image_path=None):
+        """Zaradí upozornenie na odoslanie. Vráti False, ak je fronta plná."""
+        self.start()
+        try:
+            self._queue.put_nowait((message, image_path, time.time()))
+        except queue.Full:
+            self._count("dropped")
+            logging.error(f"Fronta e-mailov je plná, upozornenie nebude odoslané: {message}")
+            return False
+        self._count("enqueued")
+        return True
+
+    def send_now(self, message, settings=None, image_path=None):
+        """Synchronne odošle jeden e-mail cez zdieľaný pool spojení (napr. testovací e-mail)."""
+        if settings is None:
+            settings = self.settings_loader()
+        email_config = settings.get("email_settings", {})
+        try:
+            self._deliver(email_config, [(message, time.time())], [image_path] if image_path else [])
+            return True
+        except Exception as e:
+            logging.error(f"Chyba pri odosielaní e-mailu: {e}")
+            return False
+
+    def reset_connections(self):
+        """Zatvorí otvorené spojenia - napr. po zmene e-mailových nastavení."""
+        self.pool.close_all()
+
+    def reconfigure(self, config):
+        """Použije novú sekciu "email_dispatch" bez reštartu (queue_size sa zmení až po reštarte)."""
+        self.config = {**DEFAULT_DISPATCH_CONFIG, **(config or {})}
+        self.pool.max_size = max(1, int(self.config["pool_size"]))
+        self.pool.idle_timeout = self.config["idle_timeout"]
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _collect_batch(self):
+        """Počká na prvé upozornenie a pridá k nemu tie, ktoré prídu počas digest_window."""
+        batch = [self._queue.get()]
+        deadline = time.time() + float(self.config["digest_window"])
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, email_config, messages, image_paths):
+        recipient = email_config.get("recipient")
+        if not recipient:
+            raise EmailConfigError("Nie je nastavený príjemca")
+
+        started = time.perf_counter()
+        msg = build_email(email_config, messages, image_paths)
+        server = self.pool.acquire(email_config)
+        try:
+            server.sendmail(email_config.get("username", ""), recipient, msg.as_string())
+        except Exception:
+            self.pool.release(email_config, server, broken=True)
+            raise
+        self.pool.release(email_config, server)
+        observe("email_send_seconds", time.perf_counter() - started)
+
+    def _worker_loop(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self._send_batch(batch)
+            except Exception as e:
+                logging.error(f"Neočakávaná chyba pri odosielaní e-mailov: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _send_batch(self, batch):
+        messages = [(message, created) for message, _, created in batch]
+        image_paths = []
+        for _, image_path, _ in batch:
+            if image_path and image_path not in image_paths:
+                image_paths.append(image_path)
+
+        max_retries = int(self.config["max_retries"])
+        for attempt in range(max_retries + 1):
+            try:
+                email_config = self.settings_loader().get("email_settings", {})
+                self._deliver(email_config, messages, image_paths)
+                break
+            except EmailConfigError as e:
+                logging.warning(f"Nepodarilo sa odoslať e-mail: {e}")
+                self._count("failed", len(batch))
+                return
+            except Exception as e:
+                if attempt >= max_retries:
+                    logging.error(f"Odoslanie e-mailu zlyhalo po {attempt + 1} pokusoch: {e}")
+                    self._count("failed", len(batch))
+                    return
+                delay = float(self.config["retry_backoff"]) * (2 ** attempt)
+                logging.warning(f"Chyba pri odosielaní e-mailu ({e}), ďalší pokus o {delay:.0f}s")
+                self._count("retries")
+                time.sleep(delay)
+
+        latency = time.time() - min(created for _, _, created in batch)
+        with self._stats_lock:
+            self._stats["sent_emails"] += 1
+            self._stats["sent_alerts"] += len(batch)
+            if len(batch) > 1:
+                self._stats["digests"] += 1
+            self._stats["last_latency"] = latency
+            self._stats["total_latency"] += latency
+            self._stats["max_latency"] = max(self._stats["max_latency"], latency)
+        logging.info(f"E-mail odoslaný ({len(batch)} upozornení, oneskorenie {latency:.1f}s)")
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        sent = stats.pop("sent_emails")
+        total_latency = stats.pop("total_latency")
+        stats["sent_emails"] = sent
+        stats["avg_latency"] = total_latency / sent if sent else None
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
@@ -0,0 +1,93 @@
+# event_bus.py - Rozposielanie udalostí systému odberateľom (napr. SSE klientom webu)
+import queue
+import threading
+import itertools
+import time
+
+# Predvolená veľkosť fronty jedného odberateľa
+DEFAULT_SUBSCRIBER_QUEUE = 256
+
+class Subscription:
+    """Odber udalostí s vlastnou ohraničenou frontou.
+
+    Pomalý odberateľ nebrzdí vydavateľa - pri plnej fronte sa zahodí najstaršia
+    udalosť a nastaví sa príznak overflowed, podľa ktorého si klient vyžiada
+    celý stav znova.
+    """
+
+    def __init__(self, bus, max_queue):
+        self._bus = bus
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+        self.created = time.time()
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                pass
+
+    def get(self, timeout=None):
+        """Vráti ďalšiu udalosť alebo None, ak do timeout žiadna neprišla."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def reset(self):
+        """Zahodí nespracované udalosti a zruší príznak pretečenia."""
+        self.overflowed = False
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+class EventBus:
+    """Jednoduchý publish/subscribe v rámci procesu."""
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+
+    def subscribe(self, max_queue=DEFAULT_SUBSCRIBER_QUEUE):
+        subscription = Subscription(self, max_queue)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event_type, data):
+        """Doručí udalosť všetkým odberateľom. Nikdy neblokuje."""
+        with self._lock:
+            if not self._subscribers:
+                return None
+            event = {"id": next(self._ids), "type": event_type, "data": data}
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+        return event["id"]
+
+event_bus = EventBus()
@@ -0,0 +1,221 @@
+# image_derivatives.py - Zmenšené verzie obrázkov (náhľad, stredná veľkosť) s diskovou cache
+#
+# Zmenšeniny sa vytvárajú pri príjme obrázka alebo pri prvej požiadavke
+# a ukladajú sa do IMAGES_DIR/.cache. Kľúč obsahuje čas zmeny originálu,
+# takže prepísaný obrázok dostane novú zmenšeninu. Pri prekročení max_bytes
+# sa mažú najdlhšie nepoužité súbory (LRU).
+import os
+import hashlib
+import queue
+import threading
+import logging
+from collections import OrderedDict
+from config.image_store import IMAGES_DIR
+from config.settings import load_settings
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Veľkosti zmenšenín (najväčšia šírka a výška)
+SIZES = {
+    "thumb": (160, 120),
+    "medium": (640, 480)
+}
+
+# Predvolená konfigurácia (sekcia "image_cache" v settings.json)
+DEFAULT_CACHE_CONFIG = {
+    "max_bytes": 100 * 1024 * 1024,
+    "quality": 75,
+    "pregenerate": ["thumb", "medium"]   # vytvárajú sa hneď pri príjme obrázka
+}
+
+class DerivativeCache:
+    """Disková cache zmenšenín s LRU mazaním."""
+
+    def __init__(self, cache_dir, config=None):
+        self.cache_dir = cache_dir
+        self.config = {**DEFAULT_CACHE_CONFIG, **(config or {})}
+        self._entries = OrderedDict()   # cesta -> veľkosť, od najdlhšie nepoužitej
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0, "errors": 0}
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.jpg') and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_atime, entry.path, stat.st_size))
+        for _, path, size in sorted(entries):
+            self._entries[path] = size
+            self._bytes += size
+
+    def _key_path(self, image_path, size):
+        stat = os.stat(image_path)
+        key = f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.cache_dir, f"{digest}_{size}.jpg")
+
+    def _lookup(self, path):
+        """Ak je zmenšenina v cache, započíta zásah a vráti True."""
+        with self._lock:
+            self._ensure_loaded()
+            if path in self._entries:
+                self._entries.move_to_end(path)
+                self.stats["hits"] += 1
+                return True
+        return False
+
+    def lookup(self, image_path, size):
+        """Vráti cestu k hotovej zmenšenine alebo None - nič nevytvára."""
+        if size not in SIZES or Image is None:
+            return None
+        try:
+            path = self._key_path(image_path, size)
+        except OSError:
+            return None
+        return path if self._lookup(path) else None
+
+    def get(self, image_path, size):
+        """Vráti cestu k zmenšenine; ak ju nemožno vytvoriť, vráti pôvodný obrázok."""
+        if size not in SIZES or Image is None:
+            return image_path
+        try:
+            path = self._key_path(image_path, size)
+        except OSError:
+            return image_path
+
+        if self._lookup(path):
+            return path
+        with self._lock:
+            self.stats["misses"] += 1
+
+        try:
+            written = self._render(image_path, path, SIZES[size])
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            logging.warning(f"Nepodarilo sa vytvoriť zmenšeninu {size} pre {image_path}: {e}")
+            return image_path
+
+        with self._lock:
+            if path not in self._entries:
+                self._entries[path] = written
+                self._bytes += written
+            self._evict()
+        return path
+
+    def _render(self, image_path, path, max_size):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with Image.open(image_path) as image:
+            # JPEG sa dekóduje rovno v zmenšenom rozlíšení
+            image.draft('RGB', max_size)
+            image = image.convert('RGB')
+            image.thumbnail(max_size)
+            image.save(tmp_path, format='JPEG', quality=self.config["quality"], optimize=True)
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+    def _evict(self):
+        max_bytes = self.config["max_bytes"]
+        while max_bytes and self._bytes > max_bytes and len(self._entries) > 1:
+            path, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.stats["evicted"] += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def configure(self, config):
+        with self._lock:
+            self.config = {**DEFAULT_CACHE_CONFIG, **(config or {})}
+            self._evict()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["available"] = Image is not None
+        return stats
+
+_cache = None
+_cache_lock = threading.Lock()
+# Zmenšeniny vyžiadané z UI vlákna vytvára jedno vlákno na pozadí
+_render_queue = queue.Queue()
+_render_thread = None
+
+def _get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                config = load_settings().get("image_cache", {})
+            except Exception:
+                config = {}
+            _cache = DerivativeCache(os.path.join(IMAGES_DIR, '.cache'), config)
+        return _cache
+
+def get_derivative(image_path, size):
+    """Vráti cestu k obrázku vo veľkosti size ("thumb", "medium", inak originál)."""
+    if not image_path or size not in SIZES:
+        return image_path
+    return _get_cache().get(image_path, size)
+
+def request_derivative(image_path, size, callback):
+    """Neblokujúca verzia get_derivative pre UI vlákno.
+
+    Hotovú zmenšeninu vráti hneď. Inak vráti originál, zmenšeninu vytvorí
+    vlákno na pozadí a potom zavolá callback(cesta) - z tohto vlákna, Kivy
+    obrazovky ho preto presúvajú cez Clock.schedule_once.
+    """
+    global _render_thread
+    if not image_path or size not in SIZES:
+        return image_path
+    cache = _get_cache()
+    cached = cache.lookup(image_path, size)
+    if cached:
+        return cached
+    if Image is None:
+        return image_path
+    _render_queue.put((image_path, size, callback))
+    with _cache_lock:
+        if _render_thread is None or not _render_thread.is_alive():
+            _render_thread = threading.Thread(target=_render_worker, daemon=True, name="ImageDerivativeThread")
+            _render_thread.start()
+    return image_path
+
+def _render_worker():
+    while True:
+        image_path, size, callback = _render_queue.get()
+        path = _get_cache().get(image_path, size)
+        if path == image_path:
+            continue
+        try:
+            callback(path)
+        except Exception as e:
+            logging.error(f"Chyba v callbacku zmenšeniny {image_path}: {e}")
+
+def pregenerate_derivatives(device_id, image_path, metadata=None):
+    """Callback pre on_image_message - vytvorí zmenšeniny hneď po prijatí obrázka."""
+    cache = _get_cache()
+    for size in cache.config["pregenerate"]:
+        cache.get(image_path, size)
+
+def configure_derivatives(config):
+    """Použije novú sekciu "image_cache" bez reštartu."""
+    _get_cache().configure(config)
+
+def get_derivative_stats():
+    return _get_cache().get_stats()
@@ -0,0 +1,59 @@
+# image_protocol.py - Binárny formát obrázkov posielaných cez MQTT (verzia 2)
+#
+# Správa = MAGIC (4 B) + dĺžka hlavičky (uint16, big-endian) + JSON hlavička + JPEG dáta.
+# JPEG sa prenáša bez base64, takže je o tretinu menší a prijímač ho zapíše
+# na disk priamo z prijatého bufferu.
+#
+# Veľké obrázky sa posielajú po častiach s CHUNK_MAGIC. Hlavička časti obsahuje
+# id prenosu, poradové číslo, počet častí, veľkosť časti, celkovú veľkosť
+# a sha256 celého obrázka.
+import struct
+from config import json_codec
+
+MAGIC = b"IMG2"
+CHUNK_MAGIC = b"IMGC"
+_HEADER_LENGTH = struct.Struct(">H")
+PREFIX_SIZE = len(MAGIC) + _HEADER_LENGTH.size
+MAX_HEADER_SIZE = 0xFFFF
+
+def _pack(magic, header, data):
+    header = json_codec.dumpb(header)
+    if len(header) > MAX_HEADER_SIZE:
+        raise ValueError("Hlavička obrázka je príliš veľká")
+    return b"".join((magic, _HEADER_LENGTH.pack(len(header)), header, data))
+
+def _parse(magic, payload):
+    view = memoryview(payload)
+    if len(view) < PREFIX_SIZE or view[:len(magic)] != magic:
+        raise ValueError("Neplatná binárna správa s obrázkom")
+    (header_length,) = _HEADER_LENGTH.unpack_from(view, len(magic))
+    header_end = PREFIX_SIZE + header_length
+    if len(view) < header_end:
+        raise ValueError("Neúplná hlavička obrázka")
+    header = json_codec.loads(view[PREFIX_SIZE:header_end])
+    return header, view[header_end:]
+
+def pack_image(metadata, image_data):
+    """Zabalí metadáta a JPEG do jednej binárnej správy."""
+    return _pack(MAGIC, metadata, image_data)
+
+def is_binary_image(payload):
+    return payload[:len(MAGIC)] == MAGIC
+
+def parse_image(payload):
+    """Rozbalí binárnu správu na (metadata, image_view).
+
+    image_view je memoryview do pôvodného payloadu - dáta obrázka sa nekopírujú.
+    """
+    return _parse(MAGIC, payload)
+
+def pack_chunk(header, chunk_data):
+    """Zabalí jednu časť obrázka (header: id, seq, total, chunk_size, size, sha256, metadata)."""
+    return _pack(CHUNK_MAGIC, header, chunk_data)
+
+def is_chunk(payload):
+    return payload[:len(CHUNK_MAGIC)] == CHUNK_MAGIC
+
+def parse_chunk(payload):
+    """Rozbalí časť obrázka na (header, chunk_view)."""
+    return _parse(CHUNK_MAGIC, payload)
@@ -0,0 +1,235 @@
+# image_reassembly.py - Skladanie obrázkov prijatých po častiach
+import os
+import re
+import hashlib
+import threading
+import time
+import logging
+from collections import deque
+from config.image_store import IMAGES_DIR, store_image_file
+
+# Predvolená konfigurácia (sekcia "image_transfer" v mqtt_config.json)
+DEFAULT_TRANSFER_CONFIG = {
+    "resend_after": 5,           # po koľkých sekundách bez novej časti sa vyžiadajú chýbajúce
+    "max_resend_requests": 3,
+    "stale_timeout": 60,         # nedokončený prenos sa po tomto čase zahodí
+    "max_image_size": 20 * 1024 * 1024,
+    "max_active_transfers": 16
+}
+
+# Počet nedávno dokončených prenosov, ktorých oneskorené časti sa ignorujú
+COMPLETED_HISTORY = 64
+
+# Id prenosu je súčasťou názvu súboru, povolené sú iba hexadecimálne znaky
+TRANSFER_ID_PATTERN = re.compile(r"[0-9a-fA-F]{1,32}")
+
+class _Transfer:
+    def __init__(self, device_id, header, part_path):
+        self.device_id = device_id
+        self.transfer_id = header["id"]
+        self.size = int(header["size"])
+        self.chunk_size = int(header["chunk_size"])
+        self.total = int(header["total"])
+        self.sha256 = header.get("sha256")
+        self.metadata = header.get("metadata", {})
+        self.part_path = part_path
+        self.received = bytearray(self.total)
+        self.received_count = 0
+        self.created = time.time()
+        self.last_activity = self.created
+        self.last_request = 0
+        self.resend_requests = 0
+        # Predalokovaný súbor - časti sa zapisujú priamo na svoje miesto
+        self.file = open(part_path, 'w+b')
+        self.file.truncate(self.size)
+
+    def expected_length(self, seq):
+        if seq == self.total - 1:
+            return self.size - seq * self.chunk_size
+        return self.chunk_size
+
+    def missing_ranges(self):
+        """Vráti chýbajúce časti ako zoznam intervalov [od, do] (vrátane)."""
+        ranges = []
+        start = None
+        for seq, done in enumerate(self.received):
+            if not done and start is None:
+                start = seq
+            elif done and start is not None:
+                ranges.append([start, seq - 1])
+                start = None
+        if start is not None:
+            ranges.append([start, self.total - 1])
+        return ranges
+
+    def discard(self):
+        try:
+            self.file.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self.part_path)
+        except OSError:
+            pass
+
+class ImageReassembler:
+    """Skladá obrázky z častí do predalokovaných .part súborov.
+
+    Po dokončení overí sha256 a súbor presunie medzi ostatné obrázky.
+    Prenosy, ktorým chýbajú časti, vedia vrátiť zoznam chýbajúcich intervalov
+    pre príkaz resend_chunks, a po stale_timeout sa zahodia.
+    """
+
+    def __init__(self, config=None):
+        self.config = {**DEFAULT_TRANSFER_CONFIG, **(config or {})}
+        self.partial_dir = os.path.join(IMAGES_DIR, '.partial')
+        self._transfers = {}
+        self._completed = deque(maxlen=COMPLETED_HISTORY)
+        self._lock = threading.Lock()
+        self.stats = {
+            "completed": 0,
+            "failed_checksum": 0,
+            "expired": 0,
+            "rejected": 0,
+            "duplicate_chunks": 0,
+            "resend_requests": 0
+        }
+        self._remove_leftovers()
+
+    def _remove_leftovers(self):
+        """Zmaže .part súbory, ktoré ostali po predchádzajúcom behu."""
+        if not os.path.isdir(self.partial_dir):
+            return
+        for name in os.listdir(self.partial_dir):
+            if name.endswith('.part'):
+                try:
+                    os.remove(os.path.join(self.partial_dir, name))
+                except OSError:
+                    pass
+
+    def _validate(self, header):
+        size = int(header["size"])
+        chunk_size = int(header["chunk_size"])
+        total = int(header["total"])
+        if size <= 0 or size > self.config["max_image_size"]:
+            raise ValueError(f"Neplatná veľkosť obrázka: {size}")
+        if chunk_size <= 0 or total != (size + chunk_size - 1) // chunk_size:
+            raise ValueError("Nesúhlasí počet častí s veľkosťou obrázka")
+
+    def add_chunk(self, device_id, header, chunk):
+        """Zapíše časť obrázka. Po prijatí poslednej časti vráti (image_path, metadata)."""
+        key = (device_id, str(header["id"]))
+        seq = int(header["seq"])
+        if not TRANSFER_ID_PATTERN.fullmatch(key[1]):
+            self.stats["rejected"] += 1
+            logging.warning(f"Odmietnutá časť obrázka od {device_id}: neplatné id prenosu {key[1]!r}")
+            return None
+
+        with self._lock:
+            if key in self._completed:
+                self.stats["duplicate_chunks"] += 1
+                return None
+
+            transfer = self._transfers.get(key)
+            if transfer is None:
+                try:
+                    self._validate(header)
+                except (KeyError, ValueError) as e:
+                    self.stats["rejected"] += 1
+                    logging.warning(f"Odmietnutý prenos obrázka {key[1]} od {device_id}: {e}")
+                    return None
+                if len(self._transfers) >= self.config["max_active_transfers"]:
+                    self._expire_oldest()
+                os.makedirs(self.partial_dir, exist_ok=True)
+                part_path = os.path.join(self.partial_dir, f"{device_id}_{key[1]}.part")
+                transfer = _Transfer(device_id, header, part_path)
+                self._transfers[key] = transfer
+
+            if seq < 0 or seq >= transfer.total or len(chunk) != transfer.expected_length(seq):
+                self.stats["rejected"] += 1
+                logging.warning(f"Neplatná časť {seq} prenosu {key[1]} od {device_id}")
+                return None
+
+            transfer.last_activity = time.time()
+            if transfer.received[seq]:
+                self.stats["duplicate_chunks"] += 1
+                return None
+
+            transfer.file.seek(seq * transfer.chunk_size)
+            transfer.file.write(chunk)
+            transfer.received[seq] = 1
+            transfer.received_count += 1
+
+            if transfer.received_count < transfer.total:
+                return None
+
+            del self._transfers[key]
+            self._completed.append(key)
+
+        return self._finish(transfer)
+
+    def _finish(self, transfer):
+        transfer.file.flush()
+        if transfer.sha256:
+            digest = hashlib.sha256()
+            transfer.file.seek(0)
+            for block in iter(lambda: transfer.file.read(1024 * 1024), b''):
+                digest.update(block)
+            if digest.hexdigest() != transfer.sha256:
+                with self._lock:
+                    self.stats["failed_checksum"] += 1
+                logging.error(f"Kontrolný súčet obrázka {transfer.transfer_id} od {transfer.device_id} nesedí, obrázok zahodený")
+                transfer.discard()
+                return None
+        transfer.file.close()
+
+        try:
+            image_path = store_image_file(transfer.device_id, transfer.part_path, transfer.metadata)
+        except ValueError as e:
+            with self._lock:
+                self.stats["rejected"] += 1
+            logging.warning(f"Obrázok {transfer.transfer_id} od {transfer.device_id} zahodený: {e}")
+            transfer.discard()
+            return None
+        with self._lock:
+            self.stats["completed"] += 1
+        return image_path, transfer.metadata
+
+    def _expire_oldest(self):
+        key = min(self._transfers, key=lambda k: self._transfers[k].last_activity)
+        self._transfers.pop(key).discard()
+        self.stats["expired"] += 1
+
+    def get_resend_requests(self, force=False):
+        """Vráti [(device_id, transfer_id, ranges)] pre prenosy, ktorým chýbajú časti.
+
+        Pri force=True (napr. po opätovnom pripojení) sa vrátia všetky nedokončené
+        prenosy bez ohľadu na čas poslednej časti. Zastarané prenosy sa zahodia.
+        """
+        now = time.time()
+        requests = []
+        with self._lock:
+            for key, transfer in list(self._transfers.items()):
+                idle = now - transfer.last_activity
+                if idle > self.config["stale_timeout"]:
+                    logging.warning(f"Prenos obrázka {transfer.transfer_id} od {transfer.device_id} vypršal "
+                                    f"({transfer.received_count}/{transfer.total} častí)")
+                    del self._transfers[key]
+                    transfer.discard()
+                    self.stats["expired"] += 1
+                    continue
+                if transfer.resend_requests >= self.config["max_resend_requests"]:
+                    continue
+                waiting = now - max(transfer.last_activity, transfer.last_request)
+                if force or waiting > self.config["resend_after"]:
+                    transfer.resend_requests += 1
+                    transfer.last_request = now
+                    self.stats["resend_requests"] += 1
+                    requests.append((transfer.device_id, transfer.transfer_id, transfer.missing_ranges()))
+        return requests
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["active_transfers"] = len(self._transfers)
+        return stats
@@ -0,0 +1,185 @@
+# image_retention.py - Uchovávanie obrázkov podľa veku, počtu a veľkosti
+import os
+import threading
+import time
+import logging
+from config.settings import load_settings
+from config.alerts_log import get_recent_alerts, register_alert_listener
+from config.image_store import get_storage_usage, get_oldest_images, delete_image, remove_orphaned_events
+
+# Predvolené limity (sekcia "image_retention" v settings.json), 0 = bez obmedzenia
+DEFAULT_RETENTION_CONFIG = {
+    "max_age_days": 30,
+    "max_images_per_device": 5000,
+    "max_bytes_per_device": 0,
+    "max_images": 0,
+    "max_bytes": 2 * 1024 * 1024 * 1024,
+    "interval": 60,          # sekundy medzi kontrolami
+    "batch_size": 200        # najviac zmazaných obrázkov v jednej kontrole
+}
+
+class ImageRetentionManager:
+    """Postupne maže najstaršie obrázky, kým nie sú splnené limity.
+
+    Pracuje nad katalógom z image_store, takže kontrola nevyžaduje prechádzanie
+    adresárov. Obrázky, na ktoré odkazuje log upozornení, sa mažú až vtedy,
+    keď zariadeniu nezostali žiadne iné.
+    """
+
+    def __init__(self, config=None):
+        self.config = {**DEFAULT_RETENTION_CONFIG, **(config or {})}
+        self._protected = set()
+        self._protected_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.stats = {"deleted": 0, "freed_bytes": 0, "protected_deleted": 0, "runs": 0, "last_run": None}
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._load_protected()
+        register_alert_listener(self._on_alert)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ImageRetentionThread")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+
+    def _load_protected(self):
+        paths = {os.path.normpath(a["image_path"]) for a in get_recent_alerts(None) if a.get("image_path")}
+        with self._protected_lock:
+            self._protected = paths
+
+    def _on_alert(self, alert):
+        if alert.get("image_path"):
+            with self._protected_lock:
+                self._protected.add(os.path.normpath(alert["image_path"]))
+
+    def is_protected(self, image_path):
+        with self._protected_lock:
+            return os.path.normpath(image_path) in self._protected
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Chyba pri uchovávaní obrázkov: {e}")
+            if self._stop_event.wait(self.config["interval"]):
+                return
+
+    def run_once(self):
+        """Zmaže najviac batch_size obrázkov porušujúcich limity, vráti ich počet."""
+        deleted = 0
+        budget = self.config["batch_size"]
+        self.stats["freed_bytes"] += remove_orphaned_events()
+        usage = get_storage_usage()
+
+        for device_id in list(usage):
+            if deleted >= budget:
+                break
+            deleted += self._enforce(usage, [device_id], budget - deleted, per_device=True)
+        if deleted < budget:
+            deleted += self._enforce(usage, list(usage), budget - deleted, per_device=False)
+
+        self.stats["runs"] += 1
+        self.stats["last_run"] = time.time()
+        if deleted:
+            logging.info(f"Uchovávanie obrázkov: zmazaných {deleted} obrázkov")
+        return deleted
+
+    def _over_limit(self, usage, devices, per_device, oldest, check_age=True):
+        if per_device:
+            count = usage[devices[0]]["count"]
+            size = usage[devices[0]]["bytes"]
+            max_count = self.config["max_images_per_device"]
+            max_bytes = self.config["max_bytes_per_device"]
+        else:
+            count = sum(usage[d]["count"] for d in devices)
+            size = sum(usage[d]["bytes"] for d in devices)
+            max_count = self.config["max_images"]
+            max_bytes = self.config["max_bytes"]
+        max_age = self.config["max_age_days"]
+        too_old = check_age and per_device and max_age and oldest < time.time() - max_age * 86400
+        return bool((max_count and count > max_count) or (max_bytes and size > max_bytes) or too_old)
+
+    def _enforce(self, usage, devices, budget, per_device):
+        """Maže od najstaršieho obrázka vybraných zariadení, kým sú prekročené limity."""
+        deleted = 0
+        with self._protected_lock:
+            window = budget + len(self._protected) + 1
+        candidates = {d: get_oldest_images(d, window) for d in devices}
+
+        while deleted < budget:
+            choice = self._next_candidate(candidates, skip_protected=True)
+            check_age = choice is not None
+            if choice is None:
+                # Zostali iba obrázky z upozornení - mažú sa až ako posledné a nie kvôli veku
+                choice = self._next_candidate(candidates, skip_protected=False)
+            if choice is None:
+                break
+            device_id, index = choice
+            timestamp, image_path = candidates[device_id][index]
+            if not self._over_limit(usage, devices, per_device, timestamp, check_age):
+                break
+
+            protected = self.is_protected(image_path)
+            freed = delete_image(image_path)
+            candidates[device_id].pop(index)
+            usage[device_id]["count"] -= 1
+            usage[device_id]["bytes"] -= freed
+            deleted += 1
+            self.stats["deleted"] += 1
+            self.stats["freed_bytes"] += freed
+            if protected:
+                self.stats["protected_deleted"] += 1
+        return deleted
+
+    def _next_candidate(self, candidates, skip_protected):
+        """Vráti (device_id, index) najstaršieho obrázka spomedzi zariadení."""
+        best = None
+        for device_id, images in candidates.items():
+            index = 0
+            while skip_protected and index < len(images) and self.is_protected(images[index][1]):
+                index += 1
+            if index < len(images) and (best is None or images[index][0] < candidates[best[0]][best[1]][0]):
+                best = (device_id, index)
+        return best
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["protected_images"] = len(self._protected)
+        return stats
+
+_retention_manager = None
+
+def _load_config():
+    try:
+        return load_settings().get("image_retention", {})
+    except Exception as e:
+        logging.warning(f"Nepodarilo sa načítať nastavenia uchovávania obrázkov, použijú sa predvolené: {e}")
+        return {}
+
+def start_image_retention():
+    """Spustí uchovávanie obrázkov na pozadí (opakované volanie nič nerobí)."""
+    global _retention_manager
+    if _retention_manager is None:
+        _retention_manager = ImageRetentionManager(_load_config())
+    _retention_manager.start()
+    return _retention_manager
+
+def configure_image_retention(config):
+    """Použije novú sekciu "image_retention" bez reštartu."""
+    if _retention_manager is not None:
+        _retention_manager.config = {**DEFAULT_RETENTION_CONFIG, **(config or {})}
+
+def stop_image_retention():
+    if _retention_manager is not None:
+        _retention_manager.stop()
+
+def get_retention_stats():
+    return _retention_manager.get_stats() if _retention_manager is not None else {}
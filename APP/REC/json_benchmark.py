@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# json_benchmark.py - Porovnanie JSON backendov json_codec na typických dátach
+#
+# Spustenie: python3 json_benchmark.py [--devices 200] [--image-kb 512] [--output report.json]
+#
+# Pre každý dostupný backend (json, orjson) zmeria kódovanie (kompaktné aj
+# odsadené) a dekódovanie správ zo senzorov, stavových správ, hlavičky
+# obrázka, obrázka v base64 (legacy formát), stavu zariadení, nastavení
+# a záznamu upozornenia. Vypíše čas na operáciu a veľkosť výstupu.
+import argparse
+import base64
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from config import json_codec
+
+SETTINGS_FILE = os.path.join(os.path.dirname(__file__), '../data/settings.json')
+
+def build_payloads(devices=200, image_kb=512, seed=1):
+    """Vytvorí sadu reprezentatívnych dát: názov -> objekt."""
+    rng = random.Random(seed)
+    now = datetime.now().isoformat()
+    sensor = {
+        "device_id": "rpi_obyvacka_01",
+        "device_name": "Obývačka",
+        "sensor_type": "motion",
+        "value": True,
+        "timestamp": time.time()
+    }
+    status = {
+        "status": "ONLINE",
+        "device_id": "rpi_obyvacka_01",
+        "device_name": "Obývačka",
+        "room": "Obývačka",
+        "ip": "192.168.1.42",
+        "timestamp": time.time()
+    }
+    image_header = {
+        "device_id": "rpi_obyvacka_01",
+        "device_name": "Obývačka",
+        "timestamp": time.time(),
+        "event_id": "e5b1c3d2",
+        "frame": 1,
+        "frames": 3,
+        "resolution": "1920x1080",
+        "size": image_kb * 1024
+    }
+    image_legacy = {
+        "image_data": base64.b64encode(rng.randbytes(image_kb * 1024)).decode("utf-8"),
+        "metadata": image_header
+    }
+    device_status = {
+        f"rpi_{i:03d}": {
+            "name": f"Zariadenie {i}",
+            "status": rng.choice(("online", "offline")),
+            "last_seen": now,
+            "ip": f"192.168.1.{i % 250 + 2}",
+            "sensors": {
+                "motion": {"value": rng.random() < 0.1, "last_update": now},
+                "door": {"value": rng.random() < 0.1, "last_update": now},
+                "window": {"value": rng.random() < 0.1, "last_update": now}
+            }
+        }
+        for i in range(devices)
+    }
+    alert = {
+        "timestamp": now,
+        "device_id": "rpi_obyvacka_01",
+        "device_name": "Obývačka",
+        "sensor_type": "door",
+        "message": "Dvere boli otvorené počas zabezpečenia",
+        "read": False
+    }
+    payloads = {
+        "sensor": sensor,
+        "status": status,
+        "image_header": image_header,
+        "alert": alert,
+        "device_status": device_status,
+        "image_legacy": image_legacy
+    }
+    try:
+        with open(SETTINGS_FILE, 'rb') as f:
+            payloads["settings"] = json_codec.load(f)
+    except (OSError, ValueError):
+        pass
+    return payloads
+
+def measure(func, arg, min_time=0.2):
+    """Priemerný čas jedného volania func(arg) v mikrosekundách."""
+    count = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(count):
+            func(arg)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / count * 1e6
+        # Odhad počtu opakovaní, ktoré vyplnia min_time
+        count = max(count * 2, int(count * min_time * 1.1 / elapsed)) if elapsed > 0 else count * 10
+
+def run(payloads, min_time=0.2):
+    results = {}
+    for name, obj in payloads.items():
+        compact = json_codec.BACKENDS["json"][0](obj)
+        pretty = json_codec.BACKENDS["json"][0](obj, True)
+        entry = {"compact_bytes": len(compact), "pretty_bytes": len(pretty), "backends": {}}
+        for backend, (dumpb, loads) in json_codec.BACKENDS.items():
+            encoded = dumpb(obj)
+            entry["backends"][backend] = {
+                "dump_us": round(measure(dumpb, obj, min_time), 2),
+                "dump_pretty_us": round(measure(lambda o: dumpb(o, True), obj, min_time), 2),
+                "load_us": round(measure(loads, encoded, min_time), 2)
+            }
+        results[name] = entry
+    return results
+
+def print_table(results):
+    backends = list(json_codec.BACKENDS)
+    print(f"Aktívny backend: {json_codec.BACKEND}")
+    header = f"{'dáta':<15}{'kompaktne B':>12}{'odsadené B':>12}"
+    for backend in backends:
+        header += f"{backend + ' dump µs':>18}{backend + ' load µs':>18}"
+    print(header)
+    for name, entry in results.items():
+        line = f"{name:<15}{entry['compact_bytes']:>12}{entry['pretty_bytes']:>12}"
+        for backend in backends:
+            timing = entry["backends"][backend]
+            line += f"{timing['dump_us']:>18}{timing['load_us']:>18}"
+        print(line)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Porovná JSON backendy json_codec na typických dátach")
+    parser.add_argument("--devices", type=int, default=200, help="Počet zariadení v stave zariadení")
+    parser.add_argument("--image-kb", type=int, default=512, help="Veľkosť obrázka v legacy správe (KB)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Najkratší čas jedného merania (s)")
+    parser.add_argument("--output", help="Uložiť JSON report do súboru")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if len(json_codec.BACKENDS) < 2:
+        print("orjson nie je nainštalovaný, meria sa iba štandardný modul json")
+    results = run(build_payloads(args.devices, args.image_kb), args.min_time)
+    print_table(results)
+    if args.output:
+        report = {"active_backend": json_codec.BACKEND, "results": results}
+        with open(args.output, 'wb') as f:
+            json_codec.dump(report, f, pretty=True)
+        print(f"Report uložený do {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,8 +7,8 @@ from kivy.properties import StringProperty
 from kivy.lang import Builder
 from kivy.clock import Clock
 from config.system_state import load_state, save_state, is_locked_out, set_lockout
-from config.settings import load_settings
-from notification_service import play_alarm, stop_alarm, send_email
+from config.settings import get_settings
+from notification_service import play_alarm, stop_alarm, queue_email
 import time
 from datetime import datetime
 
@@ -65,12 +65,12 @@ class LoginScreen(MDScreen):
             self.first_update = False
             
     def send_alarm_email(self):
-        settings = load_settings()
+        settings = get_settings()
         notification_prefs = settings.get('notification_preferences', {})
         
         if notification_prefs.get('email', False):
             message = "UPOZORNENIE: Alarm bol aktivovaný! Nikto nezadal PIN kód v stanovenom čase. Skontrolujte svoj domáci bezpečnostný systém."
-            send_email(message, settings)
+            queue_email(message)
 
     def on_number_press(self, number):
         if self.locked:
@@ -105,7 +105,7 @@ class LoginScreen(MDScreen):
         if self.locked:
             return
         state = load_state()
-        settings = load_settings()
+        settings = get_settings()
         if self.pin == settings['pin_code']:
             self.failed_attempts = 0
             dashboard = self.manager.get_screen('dashboard')
@@ -15,6 +15,7 @@ import time
 import json
 import os
 import traceback
+import logging
 
 try:
     # Import KivyMD - must be before our custom screens
@@ -29,12 +30,15 @@ try:
     from mqtt_client import mqtt_client
     import notification_service as ns
     from config.system_state import update_state, load_state
+    from structured_logging import setup_logging, log_event
 except Exception as e:
     # Log import errors for debugging
     print(f"CRITICAL IMPORT ERROR: {e}")
     traceback.print_exc()
     # We'll continue to try to initialize what we can
 
+logger = logging.getLogger("main")
+
 # Nastavenie cesty k súborom
 os.environ['KIVY_HOME'] = os.path.abspath(os.path.join(os.path.dirname(__file__), '../.kivy'))
 
@@ -77,6 +81,9 @@ class MainApp(MDApp):
     def delayed_initialization(self, dt):
         """Perform delayed initialization tasks after the UI has loaded"""
         try:
+            # Logy idú cez frontu a samostatné vlákno, úrovne sa menia v nastaveniach
+            setup_logging()
+            
             # Registrovanie MQTT callback funkcií
             mqtt_client.register_callback("on_sensor_message", self.handle_sensor_update)
             mqtt_client.register_callback("on_image_message", self.handle_image_message)
@@ -123,7 +130,8 @@ class MainApp(MDApp):
     
     def handle_sensor_update(self, device_id, data):
         """Spracuje aktualizácie zo senzorov prijaté cez MQTT."""
-        print(f"Aktualizácia senzora z {device_id}: {data}")
+        log_event(logger, logging.INFO, "ui.sensor_update", "Aktualizácia senzora z %s", device_id,
+                  device_id=device_id, data=data)
         
         # Kontrola stavov senzorov pre upozornenia
         if 'motion' in data and data['motion'] == 'DETECTED':
@@ -148,7 +156,8 @@ class MainApp(MDApp):
     
     def handle_image_message(self, device_id, image_path, metadata):
         """Spracuje správy s obrázkami prijaté cez MQTT."""
-        print(f"Prijatý obrázok od zariadenia {device_id}: {image_path}")
+        log_event(logger, logging.INFO, "ui.image_message", "Prijatý obrázok od zariadenia %s", device_id,
+                  device_id=device_id, path=image_path)
         
         # Pridanie upozornenia s obrázkom
         message = f"Zachytená fotografia z {device_id}"
@@ -156,7 +165,8 @@ class MainApp(MDApp):
     
     def handle_status_message(self, device_id, status):
         """Spracuje správy o stave zariadení prijaté cez MQTT."""
-        print(f"Prijatý stav zariadenia {device_id}: {status}")
+        log_event(logger, logging.INFO, "ui.status_message", "Prijatý stav zariadenia %s", device_id,
+                  device_id=device_id, data=status)
         
         # Aktualizácia stavu zariadenia v systéme
         try:
@@ -192,8 +202,8 @@ class MainApp(MDApp):
                 if hasattr(screen, 'update_device_status'):
                     Clock.schedule_once(lambda dt: screen.update_device_status())
         except Exception as e:
-            print(f"ERROR IN HANDLE STATUS MESSAGE: {e}")
-            traceback.print_exc()
+            log_event(logger, logging.ERROR, "ui.status_error", "Chyba pri spracovaní stavu zariadenia %s: %s",
+                      device_id, e, exc_info=True)
     
     def on_stop(self):
         """Čistenie pri ukončení aplikácie."""
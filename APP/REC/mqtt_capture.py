@@ -0,0 +1,145 @@
+# mqtt_capture.py - Záznam prichádzajúcich MQTT správ do binárneho súboru a ich čítanie
+#
+# Formát súboru:
+#   hlavička:  b"MQCAP" + verzia (1 bajt) + čas začiatku záznamu (float64)
+#   záznam:    čas príchodu (float64), QoS (1 bajt), dĺžka témy (uint16),
+#              dĺžka payloadu (uint32), téma (UTF-8), payload (surové bajty)
+# Všetky čísla sú big-endian. Sieťové vlákno paho iba pridá n-ticu do fronty,
+# balenie a zápis robí samostatné vlákno, ktoré zapisuje v dávkach.
+import collections
+import logging
+import os
+import struct
+import threading
+import time
+
+CAPTURE_MAGIC = b"MQCAP"
+CAPTURE_VERSION = 1
+HEADER = struct.Struct(">5sBd")
+RECORD = struct.Struct(">dBHI")
+
+# Predvolená konfigurácia (sekcia "capture" v mqtt_config.json)
+DEFAULT_CAPTURE_CONFIG = {
+    "directory": "../data/mqtt/captures",
+    "flush_interval": 0.5,       # ako často sa fronta zapisuje na disk (s)
+    "max_pending": 10000,        # viac nezapísaných správ sa zahodí
+    "max_bytes": 0               # 0 = bez limitu veľkosti súboru
+}
+
+class CaptureWriter:
+    """Zapisuje MQTT správy do záznamového súboru vo vlastnom vlákne."""
+
+    def __init__(self, path, config=None):
+        self.path = path
+        self.config = {**DEFAULT_CAPTURE_CONFIG, **(config or {})}
+        self._pending = collections.deque()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+        self._file = None
+        self.started_at = None
+        self.stats = {"messages": 0, "bytes": 0, "dropped": 0, "errors": 0}
+
+    def start(self):
+        if self._running:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.started_at = time.time()
+        self._file = open(self.path, 'wb', buffering=1024 * 1024)
+        self._file.write(HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, self.started_at))
+        self.stats["bytes"] = HEADER.size
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="MQTTCaptureThread")
+        self._thread.start()
+        logging.info(f"Záznam MQTT správ spustený: {self.path}")
+
+    def write(self, topic, payload, qos, received_at):
+        """Zaradí správu na zápis - volá sa zo sieťového vlákna, preto iba pridá do fronty."""
+        if not self._running:
+            return False
+        if len(self._pending) >= self.config["max_pending"]:
+            self.stats["dropped"] += 1
+            return False
+        self._pending.append((received_at, qos, topic, payload))
+        return True
+
+    def _run(self):
+        interval = self.config["flush_interval"]
+        while self._running:
+            self._wakeup.wait(interval)
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        if not self._pending:
+            return
+        max_bytes = self.config["max_bytes"]
+        try:
+            while self._pending:
+                received_at, qos, topic, payload = self._pending.popleft()
+                topic_bytes = topic.encode('utf-8')
+                payload = bytes(payload)
+                size = RECORD.size + len(topic_bytes) + len(payload)
+                if max_bytes and self.stats["bytes"] + size > max_bytes:
+                    self.stats["dropped"] += 1
+                    continue
+                self._file.write(RECORD.pack(received_at, qos, len(topic_bytes), len(payload)))
+                self._file.write(topic_bytes)
+                self._file.write(payload)
+                self.stats["messages"] += 1
+                self.stats["bytes"] += size
+            self._file.flush()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logging.error(f"Chyba pri zápise MQTT záznamu {self.path}: {e}")
+
+    def stop(self):
+        """Zapíše zvyšok fronty, zatvorí súbor a vráti štatistiky."""
+        if not self._running:
+            return self.get_stats()
+        self._running = False
+        self._wakeup.set()
+        self._thread.join(5)
+        self._thread = None
+        self._file.close()
+        self._file = None
+        logging.info(f"Záznam MQTT správ ukončený: {self.path} ({self.stats['messages']} správ)")
+        return self.get_stats()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["path"] = self.path
+        stats["running"] = self._running
+        stats["pending"] = len(self._pending)
+        stats["started_at"] = self.started_at
+        return stats
+
+def read_capture_header(f):
+    """Prečíta hlavičku záznamu a vráti čas jeho začiatku."""
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("Súbor je príliš krátky na MQTT záznam")
+    magic, version, started_at = HEADER.unpack(header)
+    if magic != CAPTURE_MAGIC:
+        raise ValueError("Súbor nie je MQTT záznam")
+    if version != CAPTURE_VERSION:
+        raise ValueError(f"Nepodporovaná verzia MQTT záznamu: {version}")
+    return started_at
+
+def iter_capture(path):
+    """Vracia správy zo záznamu ako n-tice (received_at, topic, payload, qos).
+
+    Neúplný posledný záznam (napr. po páde počas zápisu) sa ticho vynechá.
+    """
+    with open(path, 'rb') as f:
+        read_capture_header(f)
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return
+            received_at, qos, topic_len, payload_len = RECORD.unpack(head)
+            topic = f.read(topic_len)
+            payload = f.read(payload_len)
+            if len(topic) < topic_len or len(payload) < payload_len:
+                return
+            yield received_at, topic.decode('utf-8'), payload, qos
@@ -1,5 +1,4 @@
 # mqtt_client.py - MQTT klient pre prijímač
-import json
 import os
 import threading
 import time
@@ -7,16 +6,39 @@ import random
 import math
 from datetime import datetime
 import paho.mqtt.client as mqtt
-from config.system_state import update_state
+from config.system_state import update_state, set_state_fsync
 from config.devices_manager import update_device_status
+from config.image_store import save_image, is_primary_frame
+from config.settings import register_settings_listener, get_setting
+from config import json_codec
+from config.metrics import configure_metrics, observe, inc
+from config.alerts_log import configure_retention, DEFAULT_RETENTION
+from config.devices_manager import set_status_flush_interval, DEFAULT_STATUS_FLUSH_INTERVAL
+from mqtt_ingest import IngestPipeline, DEFAULT_INGEST_CONFIG
+from image_protocol import parse_image, is_chunk, parse_chunk
+from image_reassembly import ImageReassembler, DEFAULT_TRANSFER_CONFIG
+from image_retention import start_image_retention, configure_image_retention
+from image_derivatives import pregenerate_derivatives, configure_derivatives
+from mqtt_capture import CaptureWriter, DEFAULT_CAPTURE_CONFIG
 import base64
+import logging
+from structured_logging import log_event
+
+logger = logging.getLogger("mqtt_client")
 
 class MQTTClient:
     def __init__(self):
         self.client = None
         self.connected = False
         self.config = self._load_config()
+        # Staršie konfigurácie nemajú tému pre binárne obrázky
+        self.config.setdefault('topics', {}).setdefault('image_raw', "home/security/images_raw")
         self.reconnect_attempt = 0
+        self.ingest = None
+        self._ingest_lock = threading.Lock()
+        self.reassembler = None
+        self._transfer_thread = None
+        self.capture = None
         self.callbacks = {
             "on_sensor_message": [],
             "on_image_message": [],
@@ -28,10 +50,10 @@ class MQTTClient:
         """Načíta konfiguráciu MQTT z JSON súboru."""
         try:
             config_path = os.path.join(os.path.dirname(__file__), '../data/mqtt_config.json')
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(config_path, 'rb') as f:
+                return json_codec.load(f)
         except Exception as e:
-            print(f"Chyba pri načítaní MQTT konfigurácie: {e}")
+            logger.error(f"Chyba pri načítaní MQTT konfigurácie: {e}")
             return {
                 "broker": "localhost",
                 "port": 1883,
@@ -41,6 +63,7 @@ class MQTTClient:
                 "topics": {
                     "sensor": "home/security/sensors",
                     "image": "home/security/images",
+                    "image_raw": "home/security/images_raw",
                     "control": "home/security/control",
                     "status": "home/security/status"
                 },
@@ -66,7 +89,10 @@ class MQTTClient:
                     "use_random_suffix": True,
                     "persistent_storage": False,
                     "storage_path": "../data/mqtt_client_id.txt"
-                }
+                },
+                "ingest": DEFAULT_INGEST_CONFIG,
+                "image_transfer": DEFAULT_TRANSFER_CONFIG,
+                "capture": DEFAULT_CAPTURE_CONFIG
             }
     
     def _generate_client_id(self):
@@ -84,7 +110,7 @@ class MQTTClient:
                         if client_id:
                             return client_id
             except Exception as e:
-                print(f"Chyba pri načítaní ID klienta: {e}")
+                logger.error(f"Chyba pri načítaní ID klienta: {e}")
         
         if client_id_settings.get('use_random_suffix', True):
             random_suffix = ''.join(random.choices('0123456789abcdef', k=8))
@@ -101,7 +127,7 @@ class MQTTClient:
                 with open(storage_path, 'w') as f:
                     f.write(client_id)
             except Exception as e:
-                print(f"Chyba pri ukladaní ID klienta: {e}")
+                logger.error(f"Chyba pri ukladaní ID klienta: {e}")
         
         return client_id
     
@@ -121,12 +147,43 @@ class MQTTClient:
                 
         return delay
     
+    def _on_settings_changed(self, changed, settings):
+        """Prekonfiguruje ukladanie obrázkov a záznamov po zmene settings.json."""
+        try:
+            if "image_retention" in changed:
+                configure_image_retention(settings.get("image_retention", {}))
+            if "image_cache" in changed:
+                configure_derivatives(settings.get("image_cache", {}))
+            if "alerts_log" in changed:
+                alerts_log = settings.get("alerts_log", {})
+                configure_retention(**{k: v for k, v in alerts_log.items() if k in DEFAULT_RETENTION})
+            if "storage" in changed:
+                storage = settings.get("storage", {})
+                set_status_flush_interval(storage.get("device_status_flush_interval", DEFAULT_STATUS_FLUSH_INTERVAL))
+                set_state_fsync(storage.get("state_fsync", True))
+            if "metrics" in changed:
+                configure_metrics(settings.get("metrics", {}))
+            logger.info(f"Nastavenia zmenené ({', '.join(changed)}), konfigurácia aktualizovaná")
+        except Exception as e:
+            logger.error(f"Chyba pri aplikovaní zmenených nastavení: {e}")
+    
     def start(self):
         """Spustí MQTT klienta v samostatnom vlákne."""
         if self.client is not None:
-            print("MQTT klient už beží")
+            logger.info("MQTT klient už beží")
             return
         
+        self._ensure_ingest()
+        self._start_transfer_maintenance()
+        start_image_retention()
+        if pregenerate_derivatives not in self.callbacks["on_image_message"]:
+            self.register_callback("on_image_message", pregenerate_derivatives)
+        configure_metrics(get_setting("metrics", {}))
+        register_settings_listener(self._on_settings_changed,
+                                   ("image_retention", "image_cache", "alerts_log", "storage", "metrics"))
+        if self.config.get('capture', {}).get('enabled', False):
+            self.start_capture()
+        
         client_id = self._generate_client_id()
         clean_session = self.config.get('clean_session', True)
         
@@ -143,7 +200,7 @@ class MQTTClient:
             lwt_topic = last_will.get('topic', f"{self.config['topics']['status']}/receiver")
             lwt_msg = last_will.get('message', 'OFFLINE')
             if isinstance(lwt_msg, dict):
-                lwt_msg = json.dumps({
+                lwt_msg = json_codec.dumpb({
                     **lwt_msg,
                     "timestamp": datetime.now().isoformat()
                 })
@@ -151,7 +208,7 @@ class MQTTClient:
             lwt_retain = last_will.get('retain', True)
             
             self.client.will_set(lwt_topic, lwt_msg, qos=lwt_qos, retain=lwt_retain)
-            print(f"Nastavená Last Will správa na téme {lwt_topic}")
+            logger.info(f"Nastavená Last Will správa na téme {lwt_topic}")
         
         self.client.on_connect = self._on_connect
         self.client.on_disconnect = self._on_disconnect
@@ -159,7 +216,7 @@ class MQTTClient:
         
         threading.Thread(target=self._connect_and_loop, daemon=True, 
                          name="MQTTClientThread").start()
-        print(f"MQTT klient spustený s ID: {client_id}, clean session: {clean_session}")
+        logger.info(f"MQTT klient spustený s ID: {client_id}, clean session: {clean_session}")
     
     def _connect_and_loop(self):
         """Pripojí sa k brokeru a spustí smyčku MQTT klienta."""
@@ -169,78 +226,195 @@ class MQTTClient:
         
         while True:
             if max_retries > 0 and self.reconnect_attempt >= max_retries:
-                print(f"Dosiahnutý maximálny počet pokusov o pripojenie ({max_retries}). Ukončujem...")
+                logger.error(f"Dosiahnutý maximálny počet pokusov o pripojenie ({max_retries}). Ukončujem...")
                 break
                 
             try:
                 keep_alive = self.config.get('keep_alive_interval', 60)
-                print(f"Pripájam sa k MQTT brokeru {self.config['broker']}:{self.config['port']} "
-                      f"(pokus č. {self.reconnect_attempt + 1}, keep-alive: {keep_alive}s)...")
+                logger.info(f"Pripájam sa k MQTT brokeru {self.config['broker']}:{self.config['port']} "
+                            f"(pokus č. {self.reconnect_attempt + 1}, keep-alive: {keep_alive}s)...")
                 
                 self.client.connect(self.config['broker'], self.config['port'], keepalive=keep_alive)
                 self.reconnect_attempt = 0
                 self.client.loop_forever()
             except Exception as e:
-                print(f"Chyba MQTT pripojenia: {e}")
+                logger.error(f"Chyba MQTT pripojenia: {e}")
                 self.connected = False
                 
                 self.reconnect_attempt += 1
                 delay = self._calculate_reconnect_delay()
                 
-                print(f"Pokus o opätovné pripojenie za {delay:.1f} sekúnd... "
-                      f"(pokus {self.reconnect_attempt}{' z ' + str(max_retries) if max_retries > 0 else ''})")
+                logger.info(f"Pokus o opätovné pripojenie za {delay:.1f} sekúnd... "
+                            f"(pokus {self.reconnect_attempt}{' z ' + str(max_retries) if max_retries > 0 else ''})")
                 time.sleep(delay)
     
     def _on_connect(self, client, userdata, flags, rc):
         """Callback pri úspešnom pripojení k brokeru."""
         if rc == 0:
             self.connected = True
-            print(f"Úspešne pripojený k MQTT brokeru ({self.config['broker']})")
+            logger.info(f"Úspešne pripojený k MQTT brokeru ({self.config['broker']})")
             
             for topic_type, topic in self.config['topics'].items():
                 client.subscribe(f"{topic}/#", qos=self.config.get('qos', 1))
-                print(f"Prihlásený na téme: {topic}/#")
+                logger.info(f"Prihlásený na téme: {topic}/#")
             
             self.publish_status("ONLINE", "Prijímač je pripravený")
+            
+            # Po výpadku spojenia si vyžiadať chýbajúce časti rozpracovaných obrázkov
+            if self.reassembler is not None:
+                self._request_missing_chunks(force=True)
         else:
-            print(f"Neúspešné pripojenie k MQTT brokeru, kód: {rc}")
+            logger.error(f"Neúspešné pripojenie k MQTT brokeru, kód: {rc}")
             self.connected = False
     
     def _on_disconnect(self, client, userdata, rc):
         """Callback pri odpojení od brokera."""
         self.connected = False
         if rc != 0:
-            print(f"Neočakávané odpojenie od MQTT brokera, kód: {rc}")
+            logger.warning(f"Neočakávané odpojenie od MQTT brokera, kód: {rc}")
         else:
-            print("Odpojený od MQTT brokera")
+            logger.info("Odpojený od MQTT brokera")
+    
+    def _ensure_ingest(self):
+        """Spustí fronty a pracovné vlákna pre spracovanie správ, ak ešte nebežia."""
+        with self._ingest_lock:
+            if self.ingest is None or not self.ingest.running:
+                self.ingest = IngestPipeline(self._handle_message, self.config.get('ingest'))
+                self.ingest.start()
+            return self.ingest
+    
+    def _classify_topic(self, topic):
+        """Určí triedu témy (sensor, image, status) podľa prvých troch úrovní."""
+        topic_base = '/'.join(topic.split('/')[0:3])
+        topics = self.config['topics']
+        if topic_base == topics['sensor']:
+            return "sensor"
+        if topic_base in (topics['image'], topics.get('image_raw')):
+            return "image"
+        return "status"
     
     def _on_message(self, client, userdata, message):
-        """Spracuje prichádzajúcu MQTT správu."""
+        """Zaradí prichádzajúcu MQTT správu do fronty - beží v sieťovom vlákne paho."""
         try:
-            topic = message.topic
-            payload = message.payload.decode('utf-8')
-            
-            topic_base = topic.split('/')[0:3]
-            topic_base = '/'.join(topic_base)
+            received_at = time.time()
+            capture = self.capture
+            if capture is not None:
+                capture.write(message.topic, message.payload, message.qos, received_at)
+            self.ingest_raw(message.topic, message.payload, message.qos, received_at)
+        except Exception as e:
+            log_event(logger, logging.ERROR, "mqtt.enqueue_error", "Chyba pri zaradení MQTT správy: %s", e)
+    
+    def ingest_raw(self, topic, payload, qos=0, received_at=None):
+        """Zaradí surovú správu na spracovanie. Vráti False, ak bola zahodená."""
+        pipeline = self.ingest if self.ingest is not None and self.ingest.running else self._ensure_ingest()
+        topic_class = self._classify_topic(topic)
+        accepted = pipeline.submit(topic_class, topic.split('/')[-1], topic, payload, qos, received_at)
+        if not accepted:
+            log_event(logger, logging.WARNING, "mqtt.queue_full", "MQTT fronta '%s' je plná, správa z %s bola zahodená",
+                      topic_class, topic, topic_class=topic_class)
+        return accepted
+    
+    def start_capture(self, path=None):
+        """Začne zaznamenávať prichádzajúce správy do binárneho súboru. Vráti cestu k záznamu."""
+        if self.capture is not None:
+            return self.capture.path
+        config = {**DEFAULT_CAPTURE_CONFIG, **self.config.get('capture', {})}
+        if path is None:
+            directory = os.path.join(os.path.dirname(__file__), config['directory'])
+            path = os.path.join(directory, f"capture_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mqcap")
+        capture = CaptureWriter(path, config)
+        capture.start()
+        self.capture = capture
+        logger.info(f"Záznam MQTT správ do {path}")
+        return path
+    
+    def stop_capture(self):
+        """Ukončí záznam a vráti jeho štatistiky (None, ak záznam nebežal)."""
+        capture, self.capture = self.capture, None
+        if capture is None:
+            return None
+        return capture.stop()
+    
+    def get_capture_stats(self):
+        capture = self.capture
+        return capture.get_stats() if capture is not None else None
+    
+    def _get_reassembler(self):
+        with self._ingest_lock:
+            if self.reassembler is None:
+                self.reassembler = ImageReassembler(self.config.get('image_transfer'))
+            return self.reassembler
+    
+    def _start_transfer_maintenance(self):
+        """Spustí vlákno, ktoré žiada chýbajúce časti obrázkov a zahadzuje zastarané prenosy."""
+        if self._transfer_thread is not None and self._transfer_thread.is_alive():
+            return
+        self._get_reassembler()
+        self._transfer_thread = threading.Thread(target=self._transfer_maintenance_loop, daemon=True,
+                                                 name="ImageTransferThread")
+        self._transfer_thread.start()
+    
+    def _transfer_maintenance_loop(self):
+        while True:
+            time.sleep(1)
+            try:
+                self._request_missing_chunks()
+            except Exception as e:
+                logger.error(f"Chyba pri kontrole prenosov obrázkov: {e}")
+    
+    def _request_missing_chunks(self, force=False):
+        for device_id, transfer_id, ranges in self.reassembler.get_resend_requests(force):
+            logger.info(f"Žiadam opätovné odoslanie častí {ranges} obrázka {transfer_id} od {device_id}")
+            self.publish_control_message(device_id, "resend_chunks", {
+                "transfer_id": transfer_id,
+                "ranges": ranges
+            })
+    
+    def get_ingest_stats(self):
+        """Vráti štatistiky front a pracovných vlákien."""
+        if self.ingest is None:
+            return {}
+        stats = self.ingest.get_stats()
+        if self.reassembler is not None:
+            stats["image_transfers"] = self.reassembler.get_stats()
+        return stats
+    
+    def _handle_message(self, topic_class, topic, payload, qos, received_at):
+        """Spracuje MQTT správu - beží v pracovnom vlákne danej triedy tém."""
+        try:
+            inc("mqtt_messages_total", topic_class=topic_class)
+            observe("mqtt_queue_wait_seconds", time.time() - received_at, topic_class=topic_class)
+            started = time.perf_counter()
+            topic_base = '/'.join(topic.split('/')[0:3])
+            if topic_base == self.config['topics'].get('image_raw'):
+                # Binárny obrázok (v2) - bez dekódovania UTF-8/JSON/base64
+                self._process_raw_image_message(topic, payload)
+                observe("mqtt_dispatch_seconds", time.perf_counter() - started, topic_class=topic_class)
+                return
             
+            # JSON sa dekóduje priamo z bajtov, text sa zostavuje iba pre ne-JSON správy
             try:
-                payload_data = json.loads(payload)
-            except json.JSONDecodeError:
-                payload_data = {"raw": payload}
+                payload_data = json_codec.loads(payload)
+            except ValueError:
+                payload_data = {"raw": payload.decode('utf-8')}
+            decoded = time.perf_counter()
+            observe("mqtt_decode_seconds", decoded - started, topic_class=topic_class)
                 
             for callback in self.callbacks.get("on_message", []):
                 callback(topic, payload_data)
                 
-            if topic_base == self.config['topics']['sensor']:
+            if topic_class == "sensor":
                 self._process_sensor_message(topic, payload_data)
-            elif topic_base == self.config['topics']['image']:
+            elif topic_class == "image":
                 self._process_image_message(topic, payload_data)
             elif topic_base == self.config['topics']['status']:
                 self._process_status_message(topic, payload_data)
             else:
-                print(f"Prijatá správa na neznámej téme: {topic}")
+                log_event(logger, logging.WARNING, "mqtt.unknown_topic", "Prijatá správa na neznámej téme: %s", topic)
+            observe("mqtt_dispatch_seconds", time.perf_counter() - decoded, topic_class=topic_class)
         except Exception as e:
-            print(f"Chyba pri spracovaní MQTT správy: {e}")
+            log_event(logger, logging.ERROR, "mqtt.handler_error", "Chyba pri spracovaní MQTT správy: %s", e,
+                      topic=topic)
     
     def _process_sensor_message(self, topic, payload):
         """Spracuje správu zo senzora."""
@@ -248,7 +422,8 @@ class MQTTClient:
             device_id = topic.split('/')[-1]
             data = payload
             
-            print(f"Prijatá správa zo senzora {device_id}: {data}")
+            log_event(logger, logging.INFO, "mqtt.sensor_message", "Prijatá správa zo senzora %s", device_id,
+                      device_id=device_id, data=data)
             
             device_status = {}
             if device_id not in device_status:
@@ -262,40 +437,74 @@ class MQTTClient:
             
             if any(status == 'DETECTED' for status in data.values()) or \
                any(status == 'OPEN' for status in data.values()):
-                update_state("alert", True)
+                update_state({"alert": True})
             
             for callback in self.callbacks["on_sensor_message"]:
                 callback(device_id, data)
                 
         except Exception as e:
-            print(f"Chyba pri spracovaní správy zo senzora: {e}")
+            log_event(logger, logging.ERROR, "mqtt.handler_error", "Chyba pri spracovaní správy zo senzora: %s", e,
+                      topic=topic)
     
     def _process_image_message(self, topic, payload):
-        """Spracuje správu s obrázkom."""
+        """Spracuje správu s obrázkom v pôvodnom formáte (base64 v JSON)."""
         try:
             device_id = topic.split('/')[-1]
             data = payload
             
-            print(f"Prijatá správa s obrázkom od zariadenia {device_id}")
+            log_event(logger, logging.INFO, "mqtt.image_message", "Prijatá správa s obrázkom od zariadenia %s", device_id,
+                      device_id=device_id, format="legacy")
             
             if 'image_data' in data and 'metadata' in data:
                 image_data = base64.b64decode(data['image_data'])
-                metadata = data['metadata']
-                
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                image_dir = os.path.join(os.path.dirname(__file__), '../data/images')
-                os.makedirs(image_dir, exist_ok=True)
-                
-                image_path = os.path.join(image_dir, f"{device_id}_{timestamp}.jpg")
-                with open(image_path, 'wb') as f:
-                    f.write(image_data)
-                
-                print(f"Obrázok uložený: {image_path}")
-                
-                for callback in self.callbacks["on_image_message"]:
-                    callback(device_id, image_path, metadata)
+                self._store_image(device_id, image_data, data['metadata'])
+        except Exception as e:
+            log_event(logger, logging.ERROR, "mqtt.handler_error", "Chyba pri spracovaní správy s obrázkom: %s", e,
+                      topic=topic)
+    
+    def _process_raw_image_message(self, topic, payload):
+        """Spracuje binárnu správu s obrázkom (image_protocol v2)."""
+        try:
+            device_id = topic.split('/')[-1]
+            
+            if is_chunk(payload):
+                header, chunk_view = parse_chunk(payload)
+                result = self._get_reassembler().add_chunk(device_id, header, chunk_view)
+                if result is not None:
+                    image_path, metadata = result
+                    log_event(logger, logging.INFO, "mqtt.image_message", "Obrázok od zariadenia %s zložený z %d častí",
+                              device_id, header['total'], device_id=device_id, path=image_path)
+                    self._notify_image(topic, device_id, image_path, metadata)
+                return
+            
+            metadata, image_view = parse_image(payload)
+            log_event(logger, logging.INFO, "mqtt.image_message", "Prijatý binárny obrázok od zariadenia %s", device_id,
+                      device_id=device_id, bytes=len(image_view), format="v2")
+            image_path = save_image(device_id, image_view, metadata)
+            self._notify_image(topic, device_id, image_path, metadata)
         except Exception as e:
-            print(f"Chyba pri spracovaní správy s obrázkom: {e}")
+            log_event(logger, logging.ERROR, "mqtt.handler_error", "Chyba pri spracovaní binárneho obrázka: %s", e,
+                      topic=topic)
+    
+    def _store_image(self, device_id, image_data, metadata):
+        image_path = save_image(device_id, image_data, metadata)
+        log_event(logger, logging.DEBUG, "mqtt.image_stored", "Obrázok uložený: %s", image_path)
+        
+        for callback in self.callbacks["on_image_message"]:
+            callback(device_id, image_path, metadata)
+    
+    def _notify_image(self, topic, device_id, image_path, metadata):
+        """Ohlási uložený binárny obrázok odberateľom.
+        
+        Snímky burstu pred a po spúšťači sa iba uložia k udalosti, notifikácie
+        a galéria dostanú len spúšťaciu snímku.
+        """
+        if not is_primary_frame(metadata):
+            return
+        for callback in self.callbacks.get("on_message", []):
+            callback(topic, metadata)
+        for callback in self.callbacks["on_image_message"]:
+            callback(device_id, image_path, metadata)
     
     def _process_status_message(self, topic, payload):
         """Spracuje správu o stave zariadenia."""
@@ -303,37 +512,39 @@ class MQTTClient:
             device_id = topic.split('/')[-1]
             data = payload
             
-            print(f"Prijatý stav zariadenia {device_id}: {data}")
+            log_event(logger, logging.INFO, "mqtt.status_message", "Prijatý stav zariadenia %s", device_id,
+                      device_id=device_id, data=data)
             
             for callback in self.callbacks["on_status_message"]:
                 callback(device_id, data)
                 
             if isinstance(data, dict) and data.get('status') == 'DISCOVER':
-                print(f"Prijatá požiadavka na discovery od {device_id}")
+                logger.info(f"Prijatá požiadavka na discovery od {device_id}")
                 self.publish_control_message(device_id, "DISCOVERY_RESPONSE", {
                     "system_id": "SECURITY_SYSTEM",
                     "status": "ONLINE",
                     "broker_ip": self.config['broker']
                 })
         except Exception as e:
-            print(f"Chyba pri spracovaní správy o stave: {e}")
+            log_event(logger, logging.ERROR, "mqtt.handler_error", "Chyba pri spracovaní správy o stave: %s", e,
+                      topic=topic)
     
     def start_discovery_service(self):
         """Spustí službu pre detekciu nových zariadení cez MQTT."""
         if not self.connected:
-            print("MQTT klient nie je pripojený, nemôžem spustiť službu detekcie zariadení")
+            logger.warning("MQTT klient nie je pripojený, nemôžem spustiť službu detekcie zariadení")
             return
             
         discovery_topic = f"{self.config['topics']['status']}/discovery"
         self.client.subscribe(discovery_topic, qos=self.config.get('qos', 1))
-        print(f"Spustená služba detekcie zariadení, počúvam na téme {discovery_topic}")
+        logger.info(f"Spustená služba detekcie zariadení, počúvam na téme {discovery_topic}")
         
         self.publish_status("ONLINE", "Prijímač je pripravený na detekciu zariadení")
     
     def publish_control_message(self, target_device, command, data=None):
         """Publikuje riadiacu správu pre konkrétne zariadenie."""
         if not self.connected:
-            print("MQTT klient nie je pripojený")
+            logger.warning("MQTT klient nie je pripojený")
             return False
         
         if data is None:
@@ -348,14 +559,14 @@ class MQTTClient:
         topic = f"{self.config['topics']['control']}/{target_device}"
         return self.client.publish(
             topic, 
-            json.dumps(payload), 
+            json_codec.dumpb(payload), 
             qos=self.config.get('qos', 1)
         )
     
     def publish_status(self, status, message=""):
         """Publikuje stav prijímača."""
         if not self.connected:
-            print("MQTT klient nie je pripojený")
+            logger.warning("MQTT klient nie je pripojený")
             return False
             
         payload = {
@@ -367,7 +578,7 @@ class MQTTClient:
         topic = f"{self.config['topics']['status']}/receiver"
         return self.client.publish(
             topic, 
-            json.dumps(payload), 
+            json_codec.dumpb(payload), 
             qos=self.config.get('qos', 1)
         )
     
@@ -388,13 +599,13 @@ class MQTTClient:
     def stop(self):
         """Zastaví MQTT klienta."""
         if self.client and self.connected:
-            print("Zastavujem MQTT klienta...")
+            logger.info("Zastavujem MQTT klienta...")
             self.publish_status("OFFLINE", "Prijímač sa vypína")
             self.client.disconnect()
             self.client.loop_stop()
             self.client = None
             self.connected = False
-            print("MQTT klient zastavený")
+            logger.info("MQTT klient zastavený")
 
 # Singleton inštancia
 mqtt_client = MQTTClient()
\ No newline at end of file
@@ -2,11 +2,11 @@
 # mqtt_discovery.py - Automatické zisťovanie MQTT brokera na sieti
 
 import socket
-import json
 import time
 import threading
 import logging
 from datetime import datetime
+from config import json_codec
 
 class MQTTDiscoveryService:
     """Služba pre automatické zisťovanie MQTT brokera na sieti.
@@ -99,7 +99,7 @@ class MQTTDiscoveryService:
                 }
                 
                 # Konverzia na JSON a odoslanie
-                json_message = json.dumps(message).encode("utf-8")
+                json_message = json_codec.dumpb(message)
                 sock.sendto(json_message, broadcast_address)
                 self.log.debug(f"Odoslaná discovery správa: {message}")
                 
@@ -139,7 +139,7 @@ class MQTTDiscoveryService:
                     
                     # Parsovanie JSON správy
                     try:
-                        message = json.loads(data.decode("utf-8"))
+                        message = json_codec.loads(data)
                         
                         # Kontrola, či ide o požiadavku na discovery
                         if message.get("type") == "mqtt_discovery_request":
@@ -159,10 +159,10 @@ class MQTTDiscoveryService:
                             }
                             
                             # Odoslanie odpovede späť zariadeniu
-                            json_response = json.dumps(response).encode("utf-8")
+                            json_response = json_codec.dumpb(response)
                             sock.sendto(json_response, addr)
                             self.log.info(f"Odoslaná odpoveď zariadeniu {device_id} na {addr}")
-                    except json.JSONDecodeError:
+                    except json_codec.JSONDecodeError:
                         self.log.warning(f"Prijatá neplatná JSON správa od {addr}: {data}")
                     except Exception as e:
                         self.log.error(f"Chyba pri spracovaní požiadavky: {e}")
@@ -215,7 +215,7 @@ class MQTTBrokerFinder:
             self.log.info(f"Prijatá správa od {addr}")
             
             # Parsovanie JSON správy
-            message = json.loads(data.decode("utf-8"))
+            message = json_codec.loads(data)
             
             if message.get("type") == "mqtt_discovery":
                 broker_info = {
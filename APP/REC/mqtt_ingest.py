@@ -0,0 +1,221 @@
+# mqtt_ingest.py - Fronty a pracovné vlákna pre spracovanie prichádzajúcich MQTT správ
+import queue
+import threading
+import time
+import zlib
+import logging
+
+# Predvolená konfigurácia (sekcia "ingest" v mqtt_config.json)
+DEFAULT_INGEST_CONFIG = {
+    "queue_depth": 1000,
+    "workers": {
+        "sensor": 2,
+        "image": 1,
+        "status": 1
+    },
+    "overflow_policy": "block",  # block, drop_newest, drop_oldest
+    "block_timeout": 0.5
+}
+
+OVERFLOW_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+_STOP = object()
+
+class _TopicClassPool:
+    """Skupina pracovných vlákien pre jednu triedu tém (sensor, image, status).
+
+    Každé vlákno má vlastnú ohraničenú frontu. Správy jedného zariadenia idú
+    vždy do rovnakej fronty, takže sa spracujú v poradí, v akom prišli.
+    """
+
+    def __init__(self, name, worker_count, queue_depth, handler):
+        self.name = name
+        self.handler = handler
+        worker_count = max(1, int(worker_count))
+        per_worker_depth = max(1, int(queue_depth) // worker_count)
+        self.queues = [queue.Queue(maxsize=per_worker_depth) for _ in range(worker_count)]
+        self.threads = []
+        self.stats = {
+            "enqueued": 0,
+            "processed": 0,
+            "dropped": 0,
+            "overflow": 0,
+            "errors": 0,
+            "max_depth": 0
+        }
+        self._stats_lock = threading.Lock()
+        # _closed: pri zastavovaní sa nové správy neprijímajú
+        # _abort: zarážka sa nezmestila do plnej fronty, vlákna skončia po aktuálnej správe
+        self._closed = threading.Event()
+        self._abort = threading.Event()
+
+    def start(self):
+        self._closed.clear()
+        self._abort.clear()
+        for index, work_queue in enumerate(self.queues):
+            thread = threading.Thread(target=self._worker_loop, args=(work_queue,), daemon=True,
+                                      name=f"MQTTIngest-{self.name}-{index}")
+            thread.start()
+            self.threads.append(thread)
+
+    def _queue_for(self, device_key):
+        if len(self.queues) == 1:
+            return self.queues[0]
+        index = zlib.crc32(device_key.encode('utf-8')) % len(self.queues)
+        return self.queues[index]
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def submit(self, device_key, item, policy, block_timeout):
+        """Vloží správu do fronty. Vráti False, ak bola správa zahodená."""
+        if self._closed.is_set():
+            self._count("dropped")
+            return False
+        work_queue = self._queue_for(device_key)
+        try:
+            work_queue.put_nowait(item)
+        except queue.Full:
+            self._count("overflow")
+            if policy == "block":
+                # Spätný tlak - sieťové vlákno počká, kým sa vo fronte uvoľní miesto
+                try:
+                    work_queue.put(item, timeout=block_timeout)
+                except queue.Full:
+                    self._count("dropped")
+                    return False
+            elif policy == "drop_oldest":
+                try:
+                    oldest = work_queue.get_nowait()
+                    work_queue.task_done()
+                except queue.Empty:
+                    oldest = None
+                if oldest is _STOP:
+                    # Zarážka pri zastavovaní sa nezahadzuje - vráti sa do fronty namiesto správy
+                    self._put_stop(work_queue)
+                    self._count("dropped")
+                    return False
+                if oldest is not None:
+                    self._count("dropped")
+                try:
+                    work_queue.put_nowait(item)
+                except queue.Full:
+                    self._count("dropped")
+                    return False
+            else:
+                self._count("dropped")
+                return False
+
+        with self._stats_lock:
+            self.stats["enqueued"] += 1
+            depth = work_queue.qsize()
+            if depth > self.stats["max_depth"]:
+                self.stats["max_depth"] = depth
+        return True
+
+    def _worker_loop(self, work_queue):
+        while True:
+            item = work_queue.get()
+            try:
+                if item is _STOP or self._abort.is_set():
+                    return
+                self.handler(self.name, *item)
+                self._count("processed")
+            except Exception as e:
+                self._count("errors")
+                logging.error(f"Chyba pri spracovaní MQTT správy ({self.name}): {e}")
+            finally:
+                work_queue.task_done()
+
+    def _put_stop(self, work_queue, timeout=None):
+        try:
+            if timeout is None:
+                work_queue.put_nowait(_STOP)
+            else:
+                work_queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            self._abort.set()
+
+    def stop(self, timeout):
+        """Zastaví vlákna. Správy pred zarážkou sa ešte spracujú, ak sa zarážka
+        do plnej fronty nezmestí, vlákna skončia po aktuálnej správe."""
+        self._closed.set()
+        for work_queue in self.queues:
+            self._put_stop(work_queue, timeout)
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["workers"] = len(self.queues)
+        stats["queue_depth"] = sum(q.qsize() for q in self.queues)
+        stats["queue_capacity"] = sum(q.maxsize for q in self.queues)
+        return stats
+
+class IngestPipeline:
+    """Oddeľuje prijímanie MQTT správ od ich spracovania.
+
+    Sieťové vlákno paho iba vloží surovú správu do fronty príslušnej triedy
+    tém, dekódovanie, ukladanie a callbacky bežia v pracovných vláknach.
+    """
+
+    def __init__(self, handler, config=None):
+        """
+        Args:
+            handler: Funkcia handler(topic_class, topic, payload, qos, received_at)
+            config (dict, optional): Sekcia "ingest" z mqtt_config.json
+        """
+        config = {**DEFAULT_INGEST_CONFIG, **(config or {})}
+        workers = {**DEFAULT_INGEST_CONFIG["workers"], **config.get("workers", {})}
+
+        self.policy = config.get("overflow_policy", "block")
+        if self.policy not in OVERFLOW_POLICIES:
+            logging.warning(f"Neznáma politika pretečenia fronty '{self.policy}', používam 'block'")
+            self.policy = "block"
+        self.block_timeout = float(config.get("block_timeout", 0.5))
+        self.pools = {
+            name: _TopicClassPool(name, count, config.get("queue_depth", 1000), handler)
+            for name, count in workers.items()
+        }
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return
+        for pool in self.pools.values():
+            pool.start()
+        self.running = True
+
+    def submit(self, topic_class, device_key, topic, payload, qos=0, received_at=None):
+        """Zaradí správu na spracovanie. Vráti False, ak bola správa zahodená."""
+        pool = self.pools.get(topic_class) or self.pools["status"]
+        if received_at is None:
+            received_at = time.time()
+        return pool.submit(device_key, (topic, payload, qos, received_at), self.policy, self.block_timeout)
+
+    def wait_idle(self, timeout=None):
+        """Počká, kým sa spracujú všetky správy vo frontách."""
+        deadline = None if timeout is None else time.time() + timeout
+        for pool in self.pools.values():
+            for work_queue in pool.queues:
+                while work_queue.unfinished_tasks:
+                    if deadline is not None and time.time() > deadline:
+                        return False
+                    time.sleep(0.005)
+        return True
+
+    def stop(self, timeout=2.0):
+        if not self.running:
+            return
+        for pool in self.pools.values():
+            pool.stop(timeout)
+        self.running = False
+
+    def get_stats(self):
+        return {
+            "overflow_policy": self.policy,
+            "classes": {name: pool.get_stats() for name, pool in self.pools.items()}
+        }
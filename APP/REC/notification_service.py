@@ -2,17 +2,16 @@ import os
 import threading
 import time
 import json
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.image import MIMEImage
-from email.mime.base import MIMEBase
-from email import encoders
 from datetime import datetime, timedelta
 import logging
-from config.system_state import load_state, update_state
-from config.settings import load_settings
+from config.system_state import load_state, update_state, modify_state
+from config.settings import get_settings, get_setting, register_settings_listener
 from config.alerts_log import add_alert_log, get_recent_alerts
+from config.devices_manager import load_device_status
+from config.image_store import get_latest_image
+from config.metrics import observe
+from email_dispatcher import EmailDispatcher
+from scheduler import schedule, schedule_at
 
 logging.basicConfig(
     level=logging.INFO,
@@ -23,17 +22,26 @@ ALARM_SOUND_FILE = os.path.join(os.path.dirname(__file__), 'sounds/alarm.wav')
 
 _alarm_active = False
 _alarm_thread = None
-_monitoring_thread = None
+_monitoring_task = None
 _monitoring_active = False
 _last_sensor_states = {}
+_sensor_states_lock = threading.Lock()
+_sensor_callback_registered = False
+
+SENSOR_TYPES = ('motion', 'door', 'window')
+# Záložná kontrola stavu senzorov - udalosti sa vyhodnocujú priamo z MQTT správ
+DEFAULT_RECONCILE_INTERVAL = 30
+
+_email_dispatcher = None
+_email_dispatcher_lock = threading.Lock()
 
 _alarm_start_time = None
 _alarm_duration_threshold = 59
 _alarm_duration_email_sent = False
-_alarm_duration_monitor_thread = None
+_alarm_duration_task = None
 
 _alarm_countdown_active = False
-_alarm_countdown_thread = None
+_alarm_countdown_task = None
 _alarm_countdown_deadline = None
 _alarm_trigger_message = None
 _alarm_countdown_duration = 60
@@ -55,7 +63,7 @@ def get_alarm_trigger_message():
     return _alarm_trigger_message
 
 def play_alarm():
-    global _alarm_active, _alarm_thread, _alarm_start_time, _alarm_duration_email_sent, _alarm_duration_monitor_thread
+    global _alarm_active, _alarm_thread, _alarm_start_time, _alarm_duration_email_sent, _alarm_duration_task
     
     if _alarm_active:
         return
@@ -73,8 +81,8 @@ def play_alarm():
         _alarm_thread = threading.Thread(target=_alarm_sound_loop, daemon=True)
         _alarm_thread.start()
         
-        _alarm_duration_monitor_thread = threading.Thread(target=_monitor_alarm_duration, daemon=True)
-        _alarm_duration_monitor_thread.start()
+        # Upozornenie na dlho trvajúci alarm - jeden termín namiesto kontroly každú sekundu
+        _alarm_duration_task = schedule(_alarm_duration_threshold, _on_alarm_duration_exceeded)
         
         logging.info("Alarm bol spustený")
         return True
@@ -83,9 +91,14 @@ def play_alarm():
         return False
 
 def stop_alarm():
-    global _alarm_active, _alarm_countdown_active, _alarm_countdown_deadline, _alarm_trigger_message
+    global _alarm_active, _alarm_countdown_active, _alarm_countdown_deadline, _alarm_trigger_message, _alarm_duration_task
     
     try:
+        _cancel_countdown_task()
+        if _alarm_duration_task is not None:
+            _alarm_duration_task.cancel()
+            _alarm_duration_task = None
+        
         if _alarm_countdown_active:
             _alarm_countdown_active = False
             _alarm_countdown_deadline = None
@@ -94,8 +107,7 @@ def stop_alarm():
             update_state({
                 "alarm_countdown_active": False,
                 "alarm_countdown_deadline": None,
-                "alarm_trigger_message": None,
-                "alarm_countdown_remaining": 0
+                "alarm_trigger_message": None
             })
             
             logging.info("Odpočítavanie alarmu zastavené")
@@ -147,22 +159,19 @@ def _alarm_sound_loop():
     except Exception as e:
         logging.error(f"Chyba pri prehrávaní zvuku alarmu: {e}")
 
-def _monitor_alarm_duration():
-    global _alarm_active, _alarm_start_time, _alarm_duration_threshold, _alarm_duration_email_sent
+def _on_alarm_duration_exceeded():
+    global _alarm_duration_email_sent
     
-    while _alarm_active:
-        try:
-            if _alarm_start_time:
-                elapsed_time = time.time() - _alarm_start_time
-                if elapsed_time > _alarm_duration_threshold and not _alarm_duration_email_sent:
-                    send_notification(
-                        f"Alarm beží už viac ako {elapsed_time:.0f} sekúnd.",
-                        level="warning"
-                    )
-                    _alarm_duration_email_sent = True
-            time.sleep(1)
-        except Exception as e:
-            logging.error(f"Chyba pri monitorovaní trvania alarmu: {e}")
+    try:
+        if _alarm_active and _alarm_start_time and not _alarm_duration_email_sent:
+            elapsed_time = time.time() - _alarm_start_time
+            _alarm_duration_email_sent = True
+            send_notification(
+                f"Alarm beží už viac ako {elapsed_time:.0f} sekúnd.",
+                level="warning"
+            )
+    except Exception as e:
+        logging.error(f"Chyba pri monitorovaní trvania alarmu: {e}")
 
 def send_notification(message, level="info", image_path=None):
     try:
@@ -173,19 +182,20 @@ def send_notification(message, level="info", image_path=None):
         
         add_alert_log(message, level, image_path)
         
-        settings = load_settings()
-        notification_prefs = settings.get("notification_preferences", {})
+        notification_prefs = get_setting("notification_preferences", {})
         
         if notification_prefs.get("email", False) and level in ["warning", "danger"]:
-            send_email(message, settings, image_path)
+            queue_email(message, image_path)
         
         if level in ["warning", "danger", "alert"]:
-            system_state = load_state()
-            armed_mode = system_state.get('armed_mode', 'disarmed')
+            def activate_alarm(state):
+                # Kontrola aj zmena v jednom kroku - alarm spustí iba jedna z naraz prijatých notifikácií
+                if state.get('armed_mode', 'disarmed') == 'disarmed' or state.get('alarm_active', False):
+                    return False
+                state['alarm_active'] = True
             
-            if armed_mode != 'disarmed' and not system_state.get('alarm_active', False):
+            if modify_state(activate_alarm) is not None:
                 logging.warning(f"Spúšťa sa alarm na základe notifikácie: {message}")
-                update_state({"alarm_active": True})
                 play_alarm()
                 
                 from kivy.clock import Clock
@@ -209,95 +219,83 @@ def send_notification(message, level="info", image_path=None):
         logging.error(f"Chyba pri odosielaní notifikácie: {e}")
         return False
 
+def _get_email_dispatcher():
+    """Vráti zdieľaný dispečer e-mailov, pri prvom použití ho vytvorí."""
+    global _email_dispatcher
+    with _email_dispatcher_lock:
+        if _email_dispatcher is None:
+            config = get_setting("email_dispatch", {})
+            _email_dispatcher = EmailDispatcher(get_settings, config)
+            _email_dispatcher.start()
+            register_settings_listener(_on_email_settings_changed, ("email_dispatch", "email_settings"))
+        return _email_dispatcher
+
+def _on_email_settings_changed(changed, settings):
+    """Prekonfiguruje dispečer e-mailov po zmene nastavení."""
+    if "email_dispatch" in changed:
+        _email_dispatcher.reconfigure(settings.get("email_dispatch", {}))
+    if "email_settings" in changed:
+        _email_dispatcher.reset_connections()
+    logging.info(f"E-mailové notifikácie prekonfigurované po zmene nastavení: {', '.join(changed)}")
+
+def queue_email(message, image_path=None):
+    """Zaradí e-mail do fronty na odoslanie na pozadí a okamžite sa vráti."""
+    return _get_email_dispatcher().enqueue(message, image_path)
+
+def get_email_dispatch_stats():
+    return _get_email_dispatcher().get_stats()
+
+def reset_email_connections():
+    """Zatvorí udržiavané SMTP spojenia, napr. po zmene e-mailových nastavení."""
+    if _email_dispatcher is not None:
+        _email_dispatcher.reset_connections()
+
 def send_email(message, settings=None, image_path=None):
+    """Synchrónne odošle e-mail (testovací e-mail), bežné upozornenia idú cez queue_email."""
     if settings is None:
-        settings = load_settings()
+        settings = get_settings()
     
     email_config = settings.get("email_settings", {})
-    recipient = email_config.get("recipient")
-    
-    if not recipient:
+    if not email_config.get("recipient"):
         logging.warning("Nepodarilo sa odoslať e-mail: Nie je nastavený príjemca")
         return False
     
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = email_config.get("username", "security@homesystem.local")
-        msg['To'] = recipient
-        msg['Subject'] = "Domáci bezpečnostný systém - Upozornenie"
-        
-        body = f"""
-        Domáci bezpečnostný systém - Upozornenie
-        
-        {message}
-        
-        Čas: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}
-        """
-        
-        if image_path is None:
-            body += "\n\nŽiadny obrázok nie je k dispozícii."
-        else:
-            body += "\n\nObrázok z kamery je priložený v prílohe."
-            
-        msg.attach(MIMEText(body, 'plain'))
-        
-        if image_path and os.path.exists(image_path):
-            try:
-                with open(image_path, 'rb') as img_file:
-                    img_data = img_file.read()
-                    
-                if image_path.lower().endswith(('.jpg', '.jpeg')):
-                    img_attachment = MIMEImage(img_data, _subtype="jpeg")
-                else:
-                    img_attachment = MIMEBase('application', 'octet-stream')
-                    img_attachment.set_payload(img_data)
-                    encoders.encode_base64(img_attachment)
-                    
-                img_filename = os.path.basename(image_path)
-                img_attachment.add_header('Content-Disposition', f'attachment; filename="{img_filename}"')
-                msg.attach(img_attachment)
-                
-                logging.info(f"Obrázok {image_path} priložený k e-mailu")
-            except Exception as e:
-                logging.error(f"Chyba pri pridávaní obrázka do e-mailu: {e}")
-        
-        smtp_server = email_config.get("smtp_server", "smtp.gmail.com")
-        smtp_port = email_config.get("smtp_port", 587)
-        
-        if smtp_port == 465:
-            server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-        else:
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls()
-        
-        username = email_config.get("username", "")
-        password = email_config.get("password", "")
-        
-        if not username or not password:
-            logging.warning("Nepodarilo sa odoslať e-mail: Chýba používateľské meno alebo heslo")
-            return False
-        
-        server.login(username, password)
-        text = msg.as_string()
-        server.sendmail(username, recipient, text)
-        server.quit()
-        
-        logging.info(f"E-mail úspešne odoslaný na adresu: {recipient}" + 
+    if _get_email_dispatcher().send_now(message, settings, image_path):
+        logging.info(f"E-mail úspešne odoslaný na adresu: {email_config.get('recipient')}" + 
                     (f" s prílohou {image_path}" if image_path else ""))
         return True
-    except Exception as e:
-        logging.error(f"Chyba pri odosielaní e-mailu: {e}")
-        return False
+    return False
+
+def get_reconcile_interval():
+    """Vráti periódu záložnej kontroly senzorov (v sekundách, 0 = vypnutá)."""
+    try:
+        monitoring = get_setting("sensor_monitoring", {})
+        return float(monitoring.get("reconcile_interval", DEFAULT_RECONCILE_INTERVAL))
+    except Exception:
+        return DEFAULT_RECONCILE_INTERVAL
 
 def start_sensor_monitoring():
-    global _monitoring_active, _monitoring_thread
+    global _monitoring_active, _last_sensor_states, _sensor_callback_registered
     
     if _monitoring_active:
         return
     
+    with _sensor_states_lock:
+        _last_sensor_states = load_device_status()
+    
     _monitoring_active = True
-    _monitoring_thread = threading.Thread(target=_monitor_sensors_loop, daemon=True)
-    _monitoring_thread.start()
+    
+    # Hlavná cesta - vyhodnotenie priamo pri prijatí správy zo senzora
+    if not _sensor_callback_registered:
+        try:
+            from mqtt_client import mqtt_client
+            mqtt_client.register_callback("on_sensor_message", handle_sensor_event)
+            _sensor_callback_registered = True
+        except Exception as e:
+            logging.error(f"Nepodarilo sa zaregistrovať spracovanie udalostí zo senzorov: {e}")
+    
+    # Záložná kontrola stavu pre prípad zmeškaných udalostí
+    _schedule_reconcile()
     
     logging.info("Monitorovanie senzorov spustené")
     return True
@@ -306,96 +304,138 @@ def stop_sensor_monitoring():
     global _monitoring_active
     
     _monitoring_active = False
+    if _monitoring_task is not None:
+        _monitoring_task.cancel()
     logging.info("Monitorovanie senzorov zastavené")
     return True
 
-def _monitor_sensors_loop():
-    global _monitoring_active, _last_sensor_states
-    
-    while _monitoring_active:
-        try:
-            system_state = load_state()
-            armed_mode = system_state.get('armed_mode', 'disarmed')
-            
-            if armed_mode != 'disarmed':
-                _check_sensor_triggers(armed_mode)
-            
-            time.sleep(1)
-        except Exception as e:
-            logging.error(f"Chyba v monitorovacej slučke senzorov: {e}")
-            time.sleep(5)
+def handle_sensor_event(device_id, data):
+    """Vyhodnotí správu zo senzora hneď po jej prijatí cez MQTT.
 
-def _check_sensor_triggers(armed_mode):
-    global _last_sensor_states
+    Porovnávajú sa iba senzory, ktoré prišli v správe, s ich posledným známym stavom.
+    """
+    if not _monitoring_active or not isinstance(data, dict):
+        return
     
+    detected_at = time.perf_counter()
     try:
-        device_status_path = os.path.join(os.path.dirname(__file__), '../data/device_status.json')
-        
-        if not os.path.exists(device_status_path):
+        changes = {key: value for key, value in data.items() if key in SENSOR_TYPES}
+        if not changes:
             return
         
-        with open(device_status_path, 'r', encoding='utf-8') as f:
-            current_states = json.load(f)
+        previous = _swap_sensor_states(device_id, changes)
         
-        if not _last_sensor_states:
-            _last_sensor_states = current_states.copy()
+        armed_mode = load_state().get('armed_mode', 'disarmed')
+        if armed_mode == 'disarmed':
             return
-            
+        
+        room_name = data.get('room', device_id)
+        device_name = data.get('device_name', device_id)
+        _evaluate_sensor_changes(device_id, changes, previous, armed_mode, room_name, device_name, detected_at)
+    except Exception as e:
+        logging.error(f"Chyba pri spracovaní udalosti zo senzora {device_id}: {e}")
+
+def _swap_sensor_states(device_id, changes):
+    """Zapíše nové stavy senzorov zariadenia a vráti ich predchádzajúce hodnoty."""
+    with _sensor_states_lock:
+        known = _last_sensor_states.get(device_id)
+        previous = dict(known) if isinstance(known, dict) else {}
+        _last_sensor_states[device_id] = {**previous, **changes}
+    return previous
+
+def _schedule_reconcile():
+    """Naplánuje ďalšiu záložnú kontrolu - interval sa číta pri každom naplánovaní."""
+    global _monitoring_task
+    interval = get_reconcile_interval()
+    if _monitoring_active and interval > 0:
+        _monitoring_task = schedule(interval, _reconcile_sensors)
+    else:
+        _monitoring_task = None
+
+def _reconcile_sensors():
+    if not _monitoring_active:
+        return
+    try:
+        system_state = load_state()
+        armed_mode = system_state.get('armed_mode', 'disarmed')
+        
+        _check_sensor_triggers(armed_mode)
+    except Exception as e:
+        logging.error(f"Chyba v monitorovacej slučke senzorov: {e}")
+    _schedule_reconcile()
+
+def _check_sensor_triggers(armed_mode):
+    """Záložné porovnanie uloženého stavu zariadení s posledným vyhodnoteným stavom."""
+    try:
+        current_states = load_device_status()
+        
         for device_id, device_data in current_states.items():
             if not isinstance(device_data, dict):
                 continue
-                
-            trigger_alarm = False
-            trigger_message = None
-            room_name = device_data.get('room', device_id)
-            device_name = device_data.get('device_name', device_id)
-            
-            if 'motion' in device_data and device_data['motion'] == 'DETECTED':
-                if armed_mode == 'armed_away':
-                    if device_id not in _last_sensor_states or _last_sensor_states[device_id].get('motion') != 'DETECTED':
-                        logging.info(f"Pohyb detegovaný pre {device_id} v {room_name}")
-                        trigger_alarm = True
-                        trigger_message = f"Zaznamenaný pohyb v miestnosti {room_name} ({device_name})"
             
-            if 'door' in device_data and device_data['door'] == 'OPEN':
-                if device_id not in _last_sensor_states or _last_sensor_states[device_id].get('door') != 'OPEN':
-                    logging.info(f"Dvere otvorené pre {device_id} v {room_name}")
-                    trigger_alarm = True
-                    trigger_message = f"Otvorené dvere v miestnosti {room_name} ({device_name})"
+            with _sensor_states_lock:
+                known = _last_sensor_states.get(device_id) or {}
+                changes = {key: device_data[key] for key in SENSOR_TYPES
+                           if key in device_data and known.get(key) != device_data[key]}
+            if not changes:
+                continue
             
-            if 'window' in device_data and device_data['window'] == 'OPEN':
-                if device_id not in _last_sensor_states or _last_sensor_states[device_id].get('window') != 'OPEN':
-                    logging.info(f"Otvorené okno v miestnosti pre {device_id} in {room_name}")
-                    trigger_alarm = True
-                    trigger_message = f"Otvorené okno v miestnosti {room_name} ({device_name})"
+            previous = _swap_sensor_states(device_id, changes)
             
-            if trigger_alarm and trigger_message:
-                system_state = load_state()
-                
-                if (_alarm_countdown_active or system_state.get('alarm_countdown_active', False)) and not _alarm_active:
-                    logging.warning(f"Dodatočná udalosť počas odpočítavania: {trigger_message}")
-                    add_alert(f"Dodatočná udalosť počas odpočítavania: {trigger_message}", level="warning")
-                    
-                    update_additional_trigger_message(trigger_message)
-                
-                elif (not system_state.get('alarm_active', False) and 
-                    not system_state.get('alarm_countdown_active', False) and
-                    not _alarm_countdown_active and not _alarm_active):
-                    logging.warning(f"Spúšťa sa odpočítavanie alarmu: {trigger_message}")
-                    start_alarm_countdown(trigger_message)
-        
-        _last_sensor_states = current_states.copy()
+            if armed_mode != 'disarmed':
+                logging.info(f"Záložná kontrola zachytila zmenu senzorov {device_id}: {changes}")
+                room_name = device_data.get('room', device_id)
+                device_name = device_data.get('device_name', device_id)
+                _evaluate_sensor_changes(device_id, changes, previous, armed_mode, room_name, device_name)
         
     except Exception as e:
         logging.error(f"Chyba pri kontrole senzorov: {e}")
         import traceback
         logging.error(traceback.format_exc())
 
+def _evaluate_sensor_changes(device_id, changes, previous, armed_mode, room_name, device_name, detected_at=None):
+    """Rozhodne, či zmena stavu senzorov spustí odpočítavanie alarmu.
+
+    detected_at (time.perf_counter) slúži na meranie času po spustenie odpočtu.
+    """
+    trigger_message = None
+    
+    if changes.get('motion') == 'DETECTED' and previous.get('motion') != 'DETECTED':
+        if armed_mode == 'armed_away':
+            logging.info(f"Pohyb detegovaný pre {device_id} v {room_name}")
+            trigger_message = f"Zaznamenaný pohyb v miestnosti {room_name} ({device_name})"
+    
+    if changes.get('door') == 'OPEN' and previous.get('door') != 'OPEN':
+        logging.info(f"Dvere otvorené pre {device_id} v {room_name}")
+        trigger_message = f"Otvorené dvere v miestnosti {room_name} ({device_name})"
+    
+    if changes.get('window') == 'OPEN' and previous.get('window') != 'OPEN':
+        logging.info(f"Otvorené okno v miestnosti pre {device_id} in {room_name}")
+        trigger_message = f"Otvorené okno v miestnosti {room_name} ({device_name})"
+    
+    if not trigger_message:
+        return
+    
+    system_state = load_state()
+    
+    if (_alarm_countdown_active or system_state.get('alarm_countdown_active', False)) and not _alarm_active:
+        logging.warning(f"Dodatočná udalosť počas odpočítavania: {trigger_message}")
+        add_alert(f"Dodatočná udalosť počas odpočítavania: {trigger_message}", level="warning")
+        
+        update_additional_trigger_message(trigger_message)
+    
+    elif (not system_state.get('alarm_active', False) and 
+        not system_state.get('alarm_countdown_active', False) and
+        not _alarm_countdown_active and not _alarm_active):
+        logging.warning(f"Spúšťa sa odpočítavanie alarmu: {trigger_message}")
+        if start_alarm_countdown(trigger_message) and detected_at is not None:
+            observe("trigger_to_countdown_seconds", time.perf_counter() - detected_at)
+
 def add_alert(message, level="info", image_path=None):
     return add_alert_log(message, level, image_path)
 
 def start_alarm_countdown(trigger_message):
-    global _alarm_countdown_active, _alarm_countdown_thread, _alarm_countdown_deadline, _alarm_trigger_message
+    global _alarm_countdown_active, _alarm_countdown_task, _alarm_countdown_deadline, _alarm_trigger_message
     
     if _alarm_countdown_active:
         return False
@@ -404,21 +444,33 @@ def start_alarm_countdown(trigger_message):
         return False
         
     try:
+        now = time.time()
+        deadline = now + _alarm_countdown_duration
+        
+        def begin_countdown(state):
+            # Pri súbežných udalostiach spustí odpočítavanie iba prvá z nich
+            if state.get('alarm_active', False):
+                return False
+            if state.get('alarm_countdown_active', False) and (state.get('alarm_countdown_deadline') or 0) > now:
+                return False
+            state.update({
+                "alarm_countdown_active": True,
+                "alarm_countdown_deadline": deadline,
+                "alarm_trigger_message": trigger_message
+            })
+        
+        if modify_state(begin_countdown) is None:
+            return False
+        
         _alarm_countdown_active = True
-        _alarm_countdown_deadline = time.time() + _alarm_countdown_duration
+        _alarm_countdown_deadline = deadline
         _alarm_trigger_message = trigger_message
         
-        update_state({
-            "alarm_countdown_active": True,
-            "alarm_countdown_deadline": _alarm_countdown_deadline,
-            "alarm_trigger_message": trigger_message
-        })
-        
         countdown_message = f"POZOR: {trigger_message}. Máte {_alarm_countdown_duration} sekúnd na deaktiváciu systému."
         add_alert(countdown_message, level="warning")
         
-        _alarm_countdown_thread = threading.Thread(target=_monitor_alarm_countdown, daemon=True)
-        _alarm_countdown_thread.start()
+        # Zostávajúci čas sa neukladá - čitatelia ho počítajú z alarm_countdown_deadline
+        _alarm_countdown_task = schedule_at(deadline, _on_alarm_countdown_expired)
         
         logging.info(f"Spustené odpočítavanie alarmu: {_alarm_countdown_duration} sekúnd")
         
@@ -456,6 +508,7 @@ def stop_alarm_countdown():
     global _alarm_countdown_active, _alarm_countdown_deadline, _alarm_trigger_message
     
     try:
+        _cancel_countdown_task()
         _alarm_countdown_active = False
         _alarm_countdown_deadline = None
         _alarm_trigger_message = None
@@ -472,14 +525,16 @@ def stop_alarm_countdown():
         logging.error(f"Chyba pri zastavovaní odpočítavania alarmu: {e}")
         return False
 
-def _monitor_alarm_countdown():
-    global _alarm_countdown_active, _alarm_countdown_deadline, _alarm_trigger_message
-    
-    while _alarm_countdown_active and time.time() < _alarm_countdown_deadline:
-        remaining = max(0, int(_alarm_countdown_deadline - time.time()))
-        update_state({"alarm_countdown_remaining": remaining})
-        time.sleep(1)
+def _cancel_countdown_task():
+    global _alarm_countdown_task
+    if _alarm_countdown_task is not None:
+        _alarm_countdown_task.cancel()
+        _alarm_countdown_task = None
+
+def _on_alarm_countdown_expired():
+    global _alarm_countdown_active, _alarm_countdown_task
     
+    _alarm_countdown_task = None
     if _alarm_countdown_active:
         logging.warning("Odpočítavanie ukončené, spúšťa sa alarm")
         
@@ -506,7 +561,7 @@ def update_additional_trigger_message(new_message):
     return _alarm_trigger_message
 
 def sync_state_from_system():
-    global _alarm_active, _alarm_countdown_active, _alarm_countdown_deadline, _alarm_trigger_message
+    global _alarm_active, _alarm_countdown_active, _alarm_countdown_deadline, _alarm_trigger_message, _alarm_countdown_task
     
     try:
         system_state = load_state()
@@ -516,6 +571,12 @@ def sync_state_from_system():
         _alarm_countdown_deadline = system_state.get("alarm_countdown_deadline", None)
         _alarm_trigger_message = system_state.get("alarm_trigger_message", None)
         
+        # Prebiehajúce odpočítavanie bez naplánovaného konca (napr. po reštarte) sa znova naplánuje
+        if _alarm_countdown_active and _alarm_countdown_deadline and _alarm_countdown_task is None:
+            _alarm_countdown_task = schedule_at(_alarm_countdown_deadline, _on_alarm_countdown_expired)
+        elif not _alarm_countdown_active:
+            _cancel_countdown_task()
+        
         logging.info("Interný stav synchronizovaný so systémovým súborom stavu")
         return True
     except Exception as e:
@@ -523,23 +584,4 @@ def sync_state_from_system():
         return False
 
 def find_latest_image(device_id=None):
-    images_dir = os.path.join(os.path.dirname(__file__), '../data/images')
-    
-    if not os.path.exists(images_dir):
-        return None
-        
-    device_images = []
-    for filename in os.listdir(images_dir):
-        if filename.endswith('.jpg'):
-            if device_id is not None and not filename.startswith(f"{device_id}_"):
-                continue
-                
-            image_path = os.path.join(images_dir, filename)
-            timestamp = os.path.getmtime(image_path)
-            device_images.append((image_path, timestamp))
-    
-    if device_images:
-        device_images.sort(key=lambda x: x[1], reverse=True)
-        return device_images[0][0]
-        
-    return None
+    return get_latest_image(device_id)
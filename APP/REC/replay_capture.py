@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# replay_capture.py - Prehrá MQTT záznam do vstupnej cesty prijímača
+#
+# Spustenie: python3 replay_capture.py capture_X.mqcap --sandbox /tmp/replay [--speed 1.0 | --fast]
+#
+# Správy zo záznamu sa vkladajú cez MQTTClient.ingest_raw, takže prechádzajú
+# rovnakými frontami, pracovnými vláknami a spracovaním ako pri príjme
+# z brokera, ale bez pripojenia k nemu. Spracovanie zapisuje do ../data
+# (stav zariadení, upozornenia, obrázky), preto nástroj vyžaduje buď
+# --sandbox (kópia REC a data bez obrázkov, s vypnutými e-mailmi), alebo
+# výslovné --live-data pre prehratie nad dátami tohto priečinka.
+# Výsledok je JSON report s priepustnosťou a časom spracovania podľa triedy tém.
+import argparse
+import math
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from config import json_codec
+from mqtt_capture import iter_capture
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def percentile(sorted_values, p):
+    """Percentil metódou najbližšieho poradia."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class HandlerTimer:
+    """Obalí _handle_message a meria čas spracovania správ podľa triedy tém."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.durations = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def __call__(self, topic_class, topic, payload, qos, received_at):
+        start = time.perf_counter()
+        try:
+            return self.handler(topic_class, topic, payload, qos, received_at)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.durations[topic_class].append(elapsed)
+
+    def summary(self):
+        result = {}
+        with self._lock:
+            items = {name: sorted(d * 1000 for d in values) for name, values in self.durations.items()}
+        for name, values in items.items():
+            result[name] = {
+                "count": len(values),
+                "mean_ms": round(sum(values) / len(values), 3),
+                "p50_ms": round(percentile(values, 50), 3),
+                "p95_ms": round(percentile(values, 95), 3),
+                "p99_ms": round(percentile(values, 99), 3),
+                "max_ms": round(values[-1], 3)
+            }
+        return result
+
+def replay(client, path, speed=1.0, limit=None):
+    """Vloží správy zo záznamu do client.ingest_raw.
+
+    speed 1.0 zachová pôvodné časovanie, 2.0 je dvojnásobne rýchlejšie,
+    0 posiela správy bez čakania. Vráti (počet vložených, počet zahodených).
+    """
+    submitted = dropped = 0
+    first_at = None
+    start = time.monotonic()
+    for received_at, topic, payload, qos in iter_capture(path):
+        if limit is not None and submitted + dropped >= limit:
+            break
+        if first_at is None:
+            first_at = received_at
+        if speed > 0:
+            delay = (received_at - first_at) / speed - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+        # Čas príchodu je čas prehratia, nie pôvodný čas zo záznamu
+        if client.ingest_raw(topic, payload, qos):
+            submitted += 1
+        else:
+            dropped += 1
+    return submitted, dropped
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Prehrá MQTT záznam do vstupnej cesty prijímača")
+    parser.add_argument("capture", help="Súbor so záznamom (.mqcap)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Rýchlosť prehrávania (1.0 = pôvodné časovanie, 0 = čo najrýchlejšie)")
+    parser.add_argument("--fast", action="store_true", help="To isté ako --speed 0")
+    parser.add_argument("--limit", type=int, help="Prehrať najviac toľko správ")
+    parser.add_argument("--alarm", action="store_true",
+                        help="Vyhodnocovať správy zo senzorov aj v notifikačnej službe (poplach, upozornenia)")
+    parser.add_argument("--derivatives", action="store_true",
+                        help="Vytvárať zmenšeniny prijatých obrázkov ako pri bežnej prevádzke")
+    parser.add_argument("--timeout", type=float, default=120.0,
+                        help="Najdlhšie čakanie na spracovanie front po prehratí (s)")
+    parser.add_argument("--output", help="Uložiť JSON report do súboru")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--sandbox", metavar="DIR",
+                        help="Prehrať v kópii REC a data v novom priečinku DIR (e-maily vypnuté)")
+    target.add_argument("--live-data", action="store_true",
+                        help="Prehrať nad dátami tohto priečinka APP (stav, upozornenia, obrázky, e-maily)")
+    return parser
+
+def prepare_sandbox(sandbox):
+    """Skopíruje REC a data do sandbox a vypne v kópii e-mailové upozornenia.
+
+    Obrázky a MQTT záznamy sa nekopírujú. Vráti cestu ku kópii tohto skriptu.
+    """
+    sandbox = os.path.abspath(sandbox)
+    if os.path.exists(sandbox) and os.listdir(sandbox):
+        raise ValueError(f"Priečinok {sandbox} nie je prázdny")
+    shutil.copytree(os.path.join(APP_DIR, 'REC'), os.path.join(sandbox, 'REC'),
+                    ignore=shutil.ignore_patterns('__pycache__'), dirs_exist_ok=True)
+    shutil.copytree(os.path.join(APP_DIR, 'data'), os.path.join(sandbox, 'data'),
+                    ignore=shutil.ignore_patterns('images', 'captures'), dirs_exist_ok=True)
+
+    settings_path = os.path.join(sandbox, 'data', 'settings.json')
+    if os.path.exists(settings_path):
+        with open(settings_path, 'rb') as f:
+            settings = json_codec.load(f)
+        settings.setdefault("notification_preferences", {})["email"] = False
+        settings.setdefault("email_settings", {}).update(enabled=False, recipient="")
+        with open(settings_path, 'wb') as f:
+            json_codec.dump(settings, f, pretty=True)
+    return os.path.join(sandbox, 'REC', os.path.basename(__file__))
+
+def _forward_args(args):
+    """Argumenty pre spustenie v sandboxe (cesty ako absolútne)."""
+    argv = [os.path.abspath(args.capture), "--live-data",
+            "--speed", str(args.speed), "--timeout", str(args.timeout)]
+    if args.fast:
+        argv.append("--fast")
+    if args.limit is not None:
+        argv += ["--limit", str(args.limit)]
+    if args.alarm:
+        argv.append("--alarm")
+    if args.derivatives:
+        argv.append("--derivatives")
+    if args.output:
+        argv += ["--output", os.path.abspath(args.output)]
+    return argv
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.isfile(args.capture):
+        print(f"Záznam {args.capture} neexistuje")
+        return 1
+    if args.sandbox:
+        try:
+            script = prepare_sandbox(args.sandbox)
+        except (OSError, ValueError) as e:
+            print(f"Nepodarilo sa pripraviť sandbox: {e}")
+            return 1
+        print(f"Prehrávam v sandboxe {os.path.dirname(os.path.dirname(script))}")
+        return subprocess.call([sys.executable, script] + _forward_args(args), cwd=os.path.dirname(script))
+    speed = 0.0 if args.fast else max(0.0, args.speed)
+
+    from mqtt_client import mqtt_client
+    timer = HandlerTimer(mqtt_client._handle_message)
+    # Fronty sa vytvárajú s odkazom na handler, preto sa musí obaliť pred prvou správou
+    mqtt_client._handle_message = timer
+    if args.derivatives:
+        from image_derivatives import pregenerate_derivatives
+        mqtt_client.register_callback("on_image_message", pregenerate_derivatives)
+    if args.alarm:
+        import notification_service as ns
+        ns.start_sensor_monitoring()
+
+    print(f"Prehrávam {args.capture} (rýchlosť: {'max' if speed == 0 else speed})")
+    start = time.monotonic()
+    submitted, dropped = replay(mqtt_client, args.capture, speed, args.limit)
+    fed = time.monotonic() - start
+    idle = mqtt_client.ingest.wait_idle(args.timeout) if mqtt_client.ingest is not None else True
+    elapsed = time.monotonic() - start
+
+    report = {
+        "capture": os.path.abspath(args.capture),
+        "speed": speed,
+        "messages": submitted,
+        "dropped": dropped,
+        "feed_seconds": round(fed, 3),
+        "total_seconds": round(elapsed, 3),
+        "throughput_msgs_per_s": round(submitted / elapsed, 1) if elapsed > 0 else None,
+        "completed": idle,
+        "handler": timer.summary(),
+        "ingest": mqtt_client.get_ingest_stats()
+    }
+    output = json_codec.dumps(report, pretty=True)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    if mqtt_client.ingest is not None:
+        mqtt_client.ingest.stop()
+    return 0 if idle else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
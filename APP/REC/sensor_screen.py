@@ -3,7 +3,9 @@ from kivymd.uix.screen import MDScreen
 from kivy.properties import DictProperty, StringProperty, BooleanProperty, ObjectProperty
 from kivy.clock import Clock
 from config.system_state import load_state
-from config.devices_manager import load_devices
+from config.devices_manager import load_devices, load_device_status
+from config.image_store import get_latest_image
+from image_derivatives import request_derivative
 from kivymd.uix.list import TwoLineAvatarIconListItem, IconLeftWidget, IconRightWidget
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.button import MDFlatButton
@@ -26,7 +28,11 @@ class ImageCard(MDCard):
     
     def __init__(self, image_path, device_name, room_name, device_id, timestamp=None, callback=None, **kwargs):
         super().__init__(**kwargs)
-        self.image_source = image_path
+        # Karta zobrazuje zmenšeninu, po kliknutí sa otvorí originál
+        self.image_path = image_path
+        # Zmenšenina, ktorá ešte nie je v cache, sa vytvorí na pozadí - dovtedy sa zobrazí originál
+        self.image_source = request_derivative(
+            image_path, "medium", lambda path: Clock.schedule_once(lambda dt: setattr(self, "image_source", path)))
         self.device_name = device_name
         self.room_name = room_name
         self.device_id = device_id
@@ -44,7 +50,7 @@ class ImageCard(MDCard):
     
     def on_image_click(self):
         if self.callback:
-            self.callback(self.image_source, self.timestamp)
+            self.callback(self.image_path, self.timestamp)
 
 class ImageViewerDialog(MDBoxLayout):
     image_source = StringProperty("")
@@ -243,19 +249,12 @@ class SensorScreen(MDScreen):
         
         try:
             devices = load_devices()
+            device_states = load_device_status()
             
-            import json
-            import os
-            device_status_path = os.path.join(os.path.dirname(__file__), '../data/device_status.json')
-            
-            if not os.path.exists(device_status_path):
-                print(f"Súbor device_status.json neexistuje na {device_status_path}")
+            if not device_states:
                 self.sensor_states = {}
                 self.last_update = f"Aktualizované: {datetime.now().strftime('%H:%M:%S')} - Žiadne údaje"
                 return
-            
-            with open(device_status_path, 'r', encoding='utf-8') as f:
-                device_states = json.load(f)
                 
             for device in devices:
                 device_id = device['id']
@@ -338,23 +337,10 @@ class SensorScreen(MDScreen):
             return 'devices'
     
     def find_latest_image(self, device_id):
-        images_dir = os.path.join(os.path.dirname(__file__), '../data/images')
-        
-        if not os.path.exists(images_dir):
+        image_path = get_latest_image(device_id)
+        if image_path is None:
             return None
-            
-        device_images = []
-        for filename in os.listdir(images_dir):
-            if filename.startswith(f"{device_id}_") and filename.endswith('.jpg'):
-                image_path = os.path.join(images_dir, filename)
-                timestamp = os.path.getmtime(image_path)
-                device_images.append((image_path, timestamp))
-        
-        if device_images:
-            device_images.sort(key=lambda x: x[1], reverse=True)
-            return {'path': device_images[0][0], 'timestamp': device_images[0][1]}
-            
-        return None
+        return {'path': image_path, 'timestamp': os.path.getmtime(image_path)}
     
     def show_sensor_detail(self, sensor_key):
         if sensor_key not in self.sensor_states:
@@ -1,4 +1,5 @@
 # settings_screen.py - Nastavenia systému
+import logging
 from kivymd.uix.screen import MDScreen
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.button import MDRaisedButton
@@ -9,6 +10,8 @@ from kivy.uix.behaviors import FocusBehavior
 from config.settings import load_settings, save_settings
 from kivy.properties import BooleanProperty
 
+logger = logging.getLogger(__name__)
+
 class SettingsScreen(MDScreen):
     pin_code = StringProperty("")
     sound_notifications = BooleanProperty(True)
@@ -19,6 +22,7 @@ class SettingsScreen(MDScreen):
     email_password = StringProperty("")
     email_recipient = StringProperty("")
     email_enabled = BooleanProperty(False)
+    email_message = StringProperty("")
     
     def on_pre_enter(self):
         self.load_settings_from_file()
@@ -40,6 +44,7 @@ class SettingsScreen(MDScreen):
         self.email_recipient = email_settings.get("recipient", "")
     
     def save_settings_to_file(self):
+        """Uloží nastavenia obrazovky. Vráti chybovú správu alebo None."""
         settings = load_settings()
         
         settings["pin_code"] = self.pin_code
@@ -53,31 +58,55 @@ class SettingsScreen(MDScreen):
             settings["email_settings"] = {}
         settings["email_settings"]["enabled"] = self.email_enabled
         settings["email_settings"]["smtp_server"] = self.smtp_server
-        settings["email_settings"]["smtp_port"] = int(self.smtp_port or 587)
         settings["email_settings"]["username"] = self.email_username
         settings["email_settings"]["password"] = self.email_password
         settings["email_settings"]["recipient"] = self.email_recipient
         
-        save_settings(settings)
+        try:
+            settings["email_settings"]["smtp_port"] = int(self.smtp_port or 587)
+            save_settings(settings)
+        except ValueError as e:
+            # Neplatné hodnoty odmietne validate_settings - súbor ostáva bez zmeny
+            logger.warning(f"Nastavenia neboli uložené: {e}")
+            return str(e)
+        return None
     
     def on_sound_notifications(self, instance, value):
-        self.save_settings_to_file()
+        self.email_message = self.save_settings_to_file() or ""
     
     def on_email_notifications(self, instance, value):
-        self.save_settings_to_file()
+        self.email_message = self.save_settings_to_file() or ""
         
     def on_email_enabled(self, instance, value):
-        self.save_settings_to_file()
+        self.email_message = self.save_settings_to_file() or ""
     
     def update_pin_code(self, new_pin):
-        if new_pin and len(new_pin) >= 4:
-            self.pin_code = new_pin
-            self.save_settings_to_file()
-            return True
-        return False
+        pin_input = self.ids.pin_input
+        if not new_pin or len(new_pin) < 4 or not new_pin.isdigit():
+            pin_input.error = True
+            pin_input.helper_text = "PIN musí mať aspoň 4 číslice"
+            return False
+        old_pin = self.pin_code
+        self.pin_code = new_pin
+        error = self.save_settings_to_file()
+        if error:
+            self.pin_code = old_pin
+            pin_input.error = True
+            pin_input.helper_text = error
+            return False
+        pin_input.error = False
+        pin_input.helper_text = ""
+        return True
         
     def update_email_settings(self):
-        self.save_settings_to_file()
+        if not self.smtp_port.isdigit() or not 0 < int(self.smtp_port) < 65536:
+            self.email_message = "SMTP port musí byť číslo 1-65535"
+            return False
+        error = self.save_settings_to_file()
+        if error:
+            self.email_message = error
+            return False
+        self.email_message = ""
         return True
         
     def go_back(self):
@@ -0,0 +1,251 @@
+# structured_logging.py - Asynchrónne štruktúrované logovanie s obmedzením frekvencie
+#
+# setup_logging() nahradí handlery koreňového loggera jedným handlerom, ktorý
+# záznam iba vloží do fronty - zápis na stdout/journald robí samostatné vlákno.
+# Pri plnej fronte sa záznam zahodí, volajúce vlákno (napr. sieťové vlákno
+# paho) nikdy nečaká. Záznamy sa vypisujú ako JSON (jeden objekt na riadok)
+# alebo ako text. Správy s rovnakým kľúčom (parameter event z log_event,
+# inak logger a úroveň) prechádzajú vzorkovaním a obmedzením frekvencie
+# podľa sekcie "logging" v settings.json, úrovne sa dajú meniť za behu.
+import copy
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from config import json_codec
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+# Predvolená konfigurácia (sekcia "logging" v settings.json)
+DEFAULT_LOGGING_CONFIG = {
+    "level": "INFO",
+    "levels": {},                   # úrovne jednotlivých loggerov, napr. {"mqtt_client": "DEBUG"}
+    "format": "json",               # json alebo text
+    "queue_size": 10000,
+    "rate_limit": {"rate": 50, "burst": 200},   # správ za sekundu a rezerva pre každý kľúč
+    "events": {                     # vzorkovanie (1 z N) a limity pre konkrétne typy správ
+        "mqtt.sensor_message": {"sample": 1, "rate": 10, "burst": 50},
+        "mqtt.status_message": {"sample": 1, "rate": 5, "burst": 20},
+        "mqtt.image_message": {"sample": 1, "rate": 5, "burst": 20},
+        "ui.sensor_update": {"sample": 1, "rate": 10, "burst": 50},
+        "ui.status_message": {"sample": 1, "rate": 5, "burst": 20}
+    }
+}
+
+_TEXT_FORMAT = "[%(asctime)s] %(levelname)s [%(name)s]: %(message)s"
+
+class RateLimitFilter(logging.Filter):
+    """Vzorkovanie a token bucket pre každý kľúč správy."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._buckets = {}   # kľúč -> [tokeny, posledné doplnenie, počítadlo vzoriek, potlačené]
+        self.default = dict(DEFAULT_LOGGING_CONFIG["rate_limit"])
+        self.events = {}
+        self.suppressed = 0
+
+    def configure(self, rate_limit, events):
+        with self._lock:
+            self.default = {**DEFAULT_LOGGING_CONFIG["rate_limit"], **(rate_limit or {})}
+            self.events = dict(events or {})
+            self._buckets.clear()
+
+    def filter(self, record):
+        event = getattr(record, "event", None)
+        key = event or (record.name, record.levelno)
+        limits = self.events.get(event, self.default) if event else self.default
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                burst = limits.get("burst", self.default["burst"])
+                bucket = self._buckets[key] = [float(burst), now, 0, 0]
+
+            sample = limits.get("sample", 1)
+            bucket[2] += 1
+            if sample > 1 and bucket[2] % sample != 1:
+                bucket[3] += 1
+                self.suppressed += 1
+                return False
+
+            rate = limits.get("rate", self.default["rate"])
+            burst = limits.get("burst", self.default["burst"])
+            if rate > 0:
+                bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    bucket[3] += 1
+                    self.suppressed += 1
+                    return False
+                bucket[0] -= 1
+
+            if bucket[3]:
+                record.suppressed = bucket[3]
+                bucket[3] = 0
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, ktorý pri plnej fronte záznam zahodí namiesto čakania."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Text správy sa zostaví hneď, aby sa neskoršie zmeny argumentov neprejavili
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    """Jeden JSON objekt na riadok: čas, úroveň, logger, správa a polia z log_event."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        event = getattr(record, "event", None)
+        if event:
+            entry["event"] = event
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            entry.setdefault(key, value)
+        suppressed = getattr(record, "suppressed", None)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json_codec.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__(_TEXT_FORMAT)
+
+    def format(self, record):
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        suppressed = getattr(record, "suppressed", None)
+        if suppressed:
+            text += f" (potlačených podobných správ: {suppressed})"
+        return text
+
+_lock = threading.Lock()
+_handler = None
+_listener = None
+_output = None
+_rate_filter = RateLimitFilter()
+_configured_loggers = set()
+
+def log_event(logger, level, event, msg, *args, exc_info=None, **fields):
+    """Zapíše správu typu event s doplnkovými poľami.
+
+    Ak je úroveň vypnutá alebo správu zahodí obmedzenie frekvencie,
+    text správy sa vôbec nezostavuje - preto treba použiť args, nie f-reťazec.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, msg, *args, exc_info=exc_info, extra={"event": event, "fields": fields})
+
+def setup_logging(config=None):
+    """Presmeruje koreňový logger do fronty a spustí zapisovacie vlákno.
+
+    Bez config sa použije sekcia "logging" zo settings.json a jej zmeny sa
+    uplatnia za behu.
+    """
+    global _handler, _listener, _output
+    from_settings = config is None
+    if from_settings:
+        config = _load_settings_config()
+    config = {**DEFAULT_LOGGING_CONFIG, **(config or {})}
+
+    with _lock:
+        if _handler is None:
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            log_queue = queue.Queue(maxsize=int(config["queue_size"]))
+            _handler = NonBlockingQueueHandler(log_queue)
+            _handler.addFilter(_rate_filter)
+            root.addHandler(_handler)
+            _output = logging.StreamHandler(sys.stderr)
+            _listener = logging.handlers.QueueListener(log_queue, _output, respect_handler_level=False)
+            _listener.start()
+
+    configure_logging(config)
+    if from_settings:
+        from config.settings import register_settings_listener
+        register_settings_listener(_on_settings_changed, ("logging",))
+
+def _load_settings_config():
+    try:
+        from config.settings import get_setting
+        return get_setting("logging", {})
+    except Exception:
+        return {}
+
+def _on_settings_changed(changed, settings):
+    configure_logging(settings.get("logging", {}))
+
+def _level(name, default=logging.INFO):
+    name = str(name).upper()
+    return getattr(logging, name) if name in LEVELS else default
+
+def configure_logging(config):
+    """Použije úrovne, formát a limity zo sekcie "logging" bez reštartu."""
+    config = {**DEFAULT_LOGGING_CONFIG, **(config or {})}
+    logging.getLogger().setLevel(_level(config["level"]))
+
+    with _lock:
+        levels = config.get("levels") or {}
+        for name in _configured_loggers - set(levels):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+        for name, level in levels.items():
+            logging.getLogger(name).setLevel(_level(level))
+        _configured_loggers.clear()
+        _configured_loggers.update(levels)
+
+        if _output is not None:
+            _output.setFormatter(TextFormatter() if config["format"] == "text" else JsonFormatter())
+
+    _rate_filter.configure(config.get("rate_limit"), config.get("events"))
+
+def set_log_level(level, logger_name=None):
+    """Zmení úroveň koreňového alebo konkrétneho loggera (iba do reštartu)."""
+    logging.getLogger(logger_name).setLevel(_level(level))
+
+def get_logging_stats():
+    with _lock:
+        return {
+            "active": _handler is not None,
+            "queued": _handler.queue.qsize() if _handler is not None else 0,
+            "dropped": _handler.dropped if _handler is not None else 0,
+            "suppressed": _rate_filter.suppressed,
+            "level": logging.getLevelName(logging.getLogger().level)
+        }
+
+def stop_logging():
+    """Vypíše zvyšok fronty (volá sa pri ukončení programu)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
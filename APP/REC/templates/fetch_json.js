@@ -0,0 +1,19 @@
+// Podmienené GET požiadavky - server pri nezmenených dátach vráti 304
+// a použije sa naposledy prijatá odpoveď
+const conditionalCache = {};
+function fetchJSON(url) {
+    const cached = conditionalCache[url];
+    const headers = cached ? {'If-None-Match': cached.etag} : {};
+    return fetch(url, {headers: headers, cache: 'no-store'}).then(response => {
+        if (response.status === 304 && cached) {
+            return cached.data;
+        }
+        return response.json().then(data => {
+            const etag = response.headers.get('ETag');
+            if (response.ok && etag) {
+                conditionalCache[url] = {etag: etag, data: data};
+            }
+            return data;
+        });
+    });
+}
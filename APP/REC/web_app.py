@@ -1,20 +1,113 @@
 # web_app.py - Flask web rozhranie
-from flask import Flask, render_template, request, redirect, url_for, jsonify, send_file, abort
-from config.system_state import load_state, save_state, set_lockout, is_locked_out, update_state
-from config.settings import load_settings, save_settings
-from config.devices_manager import load_devices
-from config.alerts_log import get_recent_alerts, clear_alerts
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify, send_file, abort, g
+from flask.json.provider import DefaultJSONProvider
+from config.system_state import (load_state, is_locked_out, update_state, modify_state, register_failed_attempt,
+                                 register_state_listener, get_state_version)
+from config.settings import load_settings, save_settings, get_settings, get_setting
+from config.devices_manager import load_devices, load_device_status, get_devices_version
+from config.alerts_log import get_recent_alerts, clear_alerts, register_alert_listener, get_alerts_version
+from config.image_store import get_event, list_events, get_latest_images, get_catalog_version
+from image_derivatives import get_derivative, SIZES as IMAGE_SIZES
 from mqtt_client import mqtt_client
+from event_bus import event_bus
+from structured_logging import setup_logging, get_logging_stats, LEVELS as LOG_LEVELS
+from config import metrics
+from config import json_codec
 import notification_service as ns
 from datetime import datetime, timedelta
 import time
-import json
 import os
 import threading
+import logging
+import argparse
+import gzip
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """jsonify a request.get_json cez json_codec (orjson, ak je dostupný)."""
+
+    def dumps(self, obj, **kwargs):
+        # jsonify posiela separators (kompaktne) alebo indent (debug režim)
+        pretty = bool(kwargs.pop("indent", None))
+        kwargs.pop("separators", None)
+        if kwargs:
+            return super().dumps(obj, indent=2 if pretty else None, **kwargs)
+        return json_codec.dumps(obj, pretty=pretty, default=self.default)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return json_codec.loads(s)
 
 app = Flask(__name__, template_folder='templates')
+app.json = CodecJSONProvider(app)
+
+# Predvolená konfigurácia webového servera (sekcia "web_server" v settings.json)
+DEFAULT_WEB_SERVER_CONFIG = {
+    "mode": "development",       # development (Flask server) alebo production (waitress)
+    "host": "0.0.0.0",
+    "port": 5000,
+    "threads": 8,                # počet vlákien obsluhujúcich požiadavky
+    "connection_limit": 100,     # maximálny počet súčasných spojení
+    "channel_timeout": 60,       # zatvorenie nečinného spojenia (sekundy)
+    "max_stream_clients": 4      # SSE klienti držia vlákno, musia ostať voľné vlákna pre API
+}
+
+WEB_SERVER_MODES = ("development", "production")
+
+# Ako dlho (s) môže prehliadač použiť obrázok bez overenia - názvy obrázkov sa neopakujú
+IMAGE_CACHE_MAX_AGE = 3600
+
+# Počítadlá verzií začínajú po reštarte od nuly, ETag preto obsahuje aj čas spustenia
+_ETAG_PREFIX = format(int(time.time()), 'x')
+
+def conditional_json(version, build):
+    """Vráti JSON odpoveď s ETag odvodeným z verzie dát.
+
+    Ak klient pošle If-None-Match so zhodnou verziou, odpovie 304 bez volania
+    build(), takže sa nečíta disk ani neserializuje JSON.
+    """
+    tag = f"{_ETAG_PREFIX}-" + "-".join(str(part) for part in version)
+    if request.if_none_match.contains_weak(tag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(tag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Odpovede menšie ako tento počet bajtov sa nekomprimujú
+GZIP_MIN_SIZE = 512
+
+def gzip_response(response):
+    """Skomprimuje JSON odpoveď, ak klient podporuje gzip."""
+    response.headers.add('Vary', 'Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()):
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.before_request
+def _start_request_timer():
+    if metrics.is_enabled():
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Štítok je šablóna routy, nie konkrétna URL - počet sérií zostane malý
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe("http_request_seconds", time.perf_counter() - started, route=route, method=request.method)
+        metrics.inc("http_requests_total", route=route, method=request.method, status=response.status_code)
+    return response
 
 mqtt_stats = {
+    'version': 0,               # zvyšuje sa pri zmene connected_devices
     'start_time': time.time(),
     'message_count': 0,
     'connected_devices': {},
@@ -42,9 +135,58 @@ def on_mqtt_message(topic, payload):
                 'room': payload.get('room', None),
                 'ip': payload.get('ip', None)
             })
+            mqtt_stats['version'] += 1
         except Exception as e:
             app.logger.error(f"Chyba pri spracovaní MQTT status správy: {e}")
 
+# Interval, po ktorom sa SSE klientovi pošle keepalive komentár (sekundy)
+STREAM_KEEPALIVE = 15
+
+_stream_clients = 0
+_stream_clients_lock = threading.Lock()
+
+_stream_state = load_state()
+_stream_state_lock = threading.Lock()
+
+def _publish_state_delta(state):
+    """Pošle do streamu iba kľúče stavu systému, ktoré sa zmenili."""
+    global _stream_state
+    with _stream_state_lock:
+        changes = {key: value for key, value in state.items() if _stream_state.get(key) != value}
+        for key in _stream_state:
+            if key not in state:
+                changes[key] = None
+        _stream_state = state
+    changes.pop('last_updated', None)
+    if changes:
+        event_bus.publish('state', changes)
+
+def _publish_sensor_event(device_id, data):
+    sensors = [{
+        'device_id': device_id,
+        'sensor_type': sensor_type,
+        'sensor': get_sensor_name(sensor_type),
+        'status': get_state_text(sensor_type, status),
+        'raw_status': status,
+        'status_class': get_status_class(sensor_type, status)
+    } for sensor_type, status in data.items() if sensor_type in ['motion', 'door', 'window']]
+    if sensors:
+        event_bus.publish('sensor', {'device_id': device_id, 'sensors': sensors})
+
+def _publish_image_event(device_id, image_path, metadata):
+    event_bus.publish('image', {
+        'device_id': device_id,
+        'path': image_path,
+        'timestamp': time.time(),
+        'filename': os.path.basename(image_path),
+        'event_id': (metadata or {}).get('event_id')
+    })
+
+register_state_listener(_publish_state_delta)
+register_alert_listener(lambda alert: event_bus.publish('alert', alert))
+mqtt_client.register_callback("on_sensor_message", _publish_sensor_event)
+mqtt_client.register_callback("on_image_message", _publish_image_event)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -65,78 +207,75 @@ def mqtt_page():
 def settings_page():
     return render_template('settings.html')
 
-@app.route('/api/sensors', methods=['GET'])
-def api_sensors():
-    try:
-        devices = load_devices()
-        device_status_path = os.path.join(os.path.dirname(__file__), '../data/device_status.json')
+def build_sensors_payload():
+    """Zostaví zoznam senzorov a súhrnné metriky pre web."""
+    devices = load_devices()
+    device_states = load_device_status()
         
-        if not os.path.exists(device_status_path):
-            app.logger.warning("Súbor stavu zariadenia nenájdený")
-            return jsonify({"sensors": [], "metrics": {"total_devices": 0, "online_devices": 0, "triggered_sensors": 0}}), 200
+    sensors_data = []
+    unique_devices = set()
+    online_devices = set()
+    triggered_count = 0
+    
+    for device in devices:
+        device_id = None
+        if 'id' in device:
+            device_id = device['id']
+        elif 'device_id' in device:
+            device_id = device['device_id']
+        else:
+            app.logger.warning(f"Zariadeniu chýba identifikačné pole: {device}")
+            continue
+            
+        device_name = device.get('name', device.get('device_name', device_id))
+        unique_devices.add(device_id)
         
-        with open(device_status_path, 'r', encoding='utf-8') as f:
-            device_states = json.load(f)
+        if device_id in device_states:
+            device_status = device_states[device_id].get('status', None)
+            has_sensor_data = any(k in device_states[device_id] for k in ['motion', 'door', 'window'])
             
-        sensors_data = []
-        unique_devices = set()
-        online_devices = set()
-        triggered_count = 0
-        
-        for device in devices:
-            device_id = None
-            if 'id' in device:
-                device_id = device['id']
-            elif 'device_id' in device:
-                device_id = device['device_id']
-            else:
-                app.logger.warning(f"Zariadeniu chýba identifikačné pole: {device}")
-                continue
-                
-            device_name = device.get('name', device.get('device_name', device_id))
-            unique_devices.add(device_id)
+            if device_status == 'ONLINE' or (device_status is None and has_sensor_data):
+                online_devices.add(device_id)
+            
+            room = device.get('room', 'Neznáma miestnosť')
             
-            if device_id in device_states:
-                device_status = device_states[device_id].get('status', None)
-                has_sensor_data = any(k in device_states[device_id] for k in ['motion', 'door', 'window'])
+            for sensor_type, status in device_states[device_id].items():
+                if sensor_type not in ['motion', 'door', 'window']:
+                    continue
+                    
+                if (sensor_type == 'motion' and status == 'DETECTED') or \
+                   (sensor_type in ['door', 'window'] and status == 'OPEN'):
+                    triggered_count += 1
+                    
+                sensor_name = get_sensor_name(sensor_type)
+                state_text = get_state_text(sensor_type, status)
                 
-                if device_status == 'ONLINE' or (device_status is None and has_sensor_data):
-                    online_devices.add(device_id)
+                sensors_data.append({
+                    'device_id': device_id,
+                    'device_name': device_name,
+                    'room': room,
+                    'sensor_type': sensor_type,
+                    'sensor': sensor_name,
+                    'status': state_text,
+                    'raw_status': status,
+                    'status_class': get_status_class(sensor_type, status)
+                })
                 
-                room = device.get('room', 'Neznáma miestnosť')
+    metrics = {
+        'total_devices': len(unique_devices),
+        'online_devices': len(online_devices),
+        'triggered_sensors': triggered_count
+    }
                 
-                for sensor_type, status in device_states[device_id].items():
-                    if sensor_type not in ['motion', 'door', 'window']:
-                        continue
-                        
-                    if (sensor_type == 'motion' and status == 'DETECTED') or \
-                       (sensor_type in ['door', 'window'] and status == 'OPEN'):
-                        triggered_count += 1
-                        
-                    sensor_name = get_sensor_name(sensor_type)
-                    state_text = get_state_text(sensor_type, status)
-                    
-                    sensors_data.append({
-                        'device_id': device_id,
-                        'device_name': device_name,
-                        'room': room,
-                        'sensor_type': sensor_type,
-                        'sensor': sensor_name,
-                        'status': state_text,
-                        'raw_status': status,
-                        'status_class': get_status_class(sensor_type, status)
-                    })
-                    
-        metrics = {
-            'total_devices': len(unique_devices),
-            'online_devices': len(online_devices),
-            'triggered_sensors': triggered_count
-        }
-                    
-        return jsonify({
-            "sensors": sensors_data,
-            "metrics": metrics
-        })
+    return {
+        "sensors": sensors_data,
+        "metrics": metrics
+    }
+
+@app.route('/api/sensors', methods=['GET'])
+def api_sensors():
+    try:
+        return conditional_json(get_devices_version(), build_sensors_payload)
     except KeyError as e:
         app.logger.error(f"KeyError pri získavaní senzorov: {e}")
         return jsonify({"error": f"Key error: {str(e)}"}), 500
@@ -146,10 +285,131 @@ def api_sensors():
         app.logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+def state_version():
+    """Verzia stavu pre ETag a cache súhrnného pohľadu.
+
+    alarm_countdown_remaining sa počíta pri čítaní a počas odpočtu sa mení bez
+    uloženia stavu, preto je súčasťou verzie.
+    """
+    return get_state_version(), load_state()["alarm_countdown_remaining"]
+
+# Časti súhrnného pohľadu /api/snapshot a verzie dát, z ktorých sa skladajú
+SNAPSHOT_FIELDS = {
+    "state": state_version,
+    "sensors": get_devices_version,
+    "metrics": get_devices_version,
+    "images": lambda: (get_catalog_version(),),
+    "alerts": lambda: (get_alerts_version(),)
+}
+SNAPSHOT_ALERTS = 10
+
+_snapshot_cache = {}
+_snapshot_lock = threading.Lock()
+
+def _build_snapshot_part(field, alerts_count):
+    """Vráti časť súhrnného pohľadu - rovnaká verzia dát sa zostavuje iba raz pre všetkých klientov."""
+    version = SNAPSHOT_FIELDS[field]()
+    key = (field, alerts_count) if field == "alerts" else field
+    with _snapshot_lock:
+        cached = _snapshot_cache.get(key)
+        if cached is not None and cached[0] == version:
+            return version, cached[1]
+
+    if field in ("sensors", "metrics"):
+        payload = build_sensors_payload()
+        with _snapshot_lock:
+            _snapshot_cache["sensors"] = (version, payload["sensors"])
+            _snapshot_cache["metrics"] = (version, payload["metrics"])
+        return version, payload[field]
+    if field == "state":
+        value = load_state()
+    elif field == "images":
+        value = get_latest_images()
+    else:
+        value = get_recent_alerts(alerts_count)
+    with _snapshot_lock:
+        _snapshot_cache[key] = (version, value)
+    return version, value
+
+@app.route('/api/snapshot', methods=['GET'])
+def api_snapshot():
+    """Súhrnný pohľad pre dashboard v jednej odpovedi.
+
+    fields= vyberá časti (state, sensors, metrics, images, alerts), alerts= počet upozornení.
+    """
+    fields_arg = request.args.get('fields')
+    fields = [f.strip() for f in fields_arg.split(',') if f.strip()] if fields_arg else list(SNAPSHOT_FIELDS)
+    unknown = [f for f in fields if f not in SNAPSHOT_FIELDS]
+    if unknown:
+        return jsonify({"success": False, "message": f"Neznáme polia: {', '.join(unknown)}"}), 400
+    alerts_count = max(1, min(request.args.get('alerts', SNAPSHOT_ALERTS, type=int), 100))
+
+    try:
+        versions = [part for field in fields for part in SNAPSHOT_FIELDS[field]()]
+        if "alerts" in fields:
+            versions.append(alerts_count)
+
+        def build():
+            snapshot = {}
+            for field in fields:
+                snapshot[field] = _build_snapshot_part(field, alerts_count)[1]
+            snapshot["generated_at"] = time.time()
+            return snapshot
+
+        return gzip_response(conditional_json(versions, build))
+    except Exception as e:
+        app.logger.error(f"Chyba pri zostavovaní súhrnného pohľadu: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+def _format_sse(event_type, data, event_id=None):
+    message = f"event: {event_type}\ndata: {json_codec.dumps(data)}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message
+
+def _stream_snapshot():
+    return _format_sse('snapshot', {'state': load_state(), **build_sensors_payload()})
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events - pri pripojení pošle celý stav, potom už iba zmeny."""
+    global _stream_clients
+    max_clients = get_web_server_config()["max_stream_clients"]
+    with _stream_clients_lock:
+        if _stream_clients >= max_clients:
+            # Prehliadač prejde na záložné dopytovanie
+            return Response("Príliš veľa pripojení", status=503, headers={'Retry-After': '30'})
+        _stream_clients += 1
+
+    def generate():
+        global _stream_clients
+        subscription = event_bus.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            yield _stream_snapshot()
+            while True:
+                event = subscription.get(timeout=STREAM_KEEPALIVE)
+                if subscription.overflowed:
+                    # Klient nestíha - namiesto chýbajúcich zmien dostane celý stav
+                    subscription.reset()
+                    yield _stream_snapshot()
+                elif event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield _format_sse(event['type'], event['data'], event['id'])
+        finally:
+            subscription.close()
+            with _stream_clients_lock:
+                _stream_clients -= 1
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/state', methods=['GET'])
 def api_state():
-    state = load_state()
-    return jsonify(state)
+    return conditional_json(state_version(), load_state)
 
 @app.route('/api/system/arm', methods=['POST'])
 def api_arm_system():
@@ -162,14 +422,9 @@ def api_arm_system():
         if arm_mode not in ['armed_home', 'armed_away']:
             return jsonify({"success": False, "message": "Neplatný režim zabezpečenia"}), 400
         
-        settings = load_settings()
+        settings = get_settings()
         if pin != settings.get('pin_code'):
-            state = load_state()
-            state['failed_attempts'] = state.get('failed_attempts', 0) + 1
-            if state['failed_attempts'] >= 3:
-                set_lockout(30)
-                state['failed_attempts'] = 0
-            save_state(state)
+            register_failed_attempt()
             return jsonify({"success": False, "message": "Nesprávny PIN kód!"}), 401
             
         update_state({"armed_mode": arm_mode, "alarm_active": False, "failed_attempts": 0})
@@ -192,14 +447,9 @@ def api_disarm_system():
         data = request.get_json()
         pin = data.get('pin')
         
-        settings = load_settings()
+        settings = get_settings()
         if pin != settings.get('pin_code'):
-            state = load_state()
-            state['failed_attempts'] = state.get('failed_attempts', 0) + 1
-            if state['failed_attempts'] >= 3:
-                set_lockout(30)
-                state['failed_attempts'] = 0
-            save_state(state)
+            register_failed_attempt()
             return jsonify({"success": False, "message": "Nesprávny PIN kód!"}), 401
         
         update_state({
@@ -233,7 +483,7 @@ def api_stop_alarm():
         data = request.get_json()
         pin = data.get('pin')
         
-        settings = load_settings()
+        settings = get_settings()
         if pin != settings.get('pin_code'):
             return jsonify({"success": False, "message": "Nesprávny PIN kód!"}), 401
         
@@ -263,8 +513,10 @@ def api_alerts():
     """API endpoint pre získanie histórie upozornení."""
     try:
         count = request.args.get('count', 10, type=int)
-        alerts = get_recent_alerts(count)
-        return jsonify({"alerts": alerts})
+        level = request.args.get('level')
+        since = request.args.get('since', type=int)
+        return conditional_json((get_alerts_version(),),
+                                lambda: {"alerts": get_recent_alerts(count, level=level, since=since)})
     except Exception as e:
         app.logger.error(f"Chyba pri získavaní histórie upozornení: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -284,11 +536,17 @@ def api_alerts_clear():
 
 @app.route('/api/image', methods=['GET'])
 def api_get_image():
-    """Poskytuje obrázky z alertov."""
+    """Poskytuje obrázky z alertov (size=thumb|medium|full).
+
+    Odpoveď má ETag a Last-Modified, prehliadač si nezmenený obrázok znova nesťahuje.
+    """
     try:
         image_path = request.args.get('path')
         if not image_path:
             return "Chýba parameter 'path'", 400
+        size = request.args.get('size', 'full')
+        if size != 'full' and size not in IMAGE_SIZES:
+            return "Neplatný parameter 'size'", 400
         
         image_path = os.path.abspath(image_path)
         data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data'))
@@ -298,12 +556,35 @@ def api_get_image():
             
         if not os.path.exists(image_path):
             return "Obrázok nenájdený", 404
-            
-        return send_file(image_path, mimetype='image/jpeg')
+        
+        image_path = get_derivative(image_path, size)
+        return send_file(image_path, mimetype='image/jpeg', conditional=True, etag=True,
+                         max_age=IMAGE_CACHE_MAX_AGE)
     except Exception as e:
         app.logger.error(f"Chyba pri získavaní obrázku: {e}")
         return "Interná chyba serveru", 500
 
+@app.route('/api/events', methods=['GET'])
+def api_events():
+    """Poskytuje posledné udalosti so sekvenciou snímok (burst pred a po spúšťači)."""
+    try:
+        device_id = request.args.get('device_id')
+        limit = request.args.get('limit', 20, type=int)
+        return jsonify({"events": list_events(device_id, limit)})
+    except Exception as e:
+        app.logger.error(f"Chyba pri získavaní udalostí: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/api/events/<device_id>/<event_id>', methods=['GET'])
+def api_event_detail(device_id, event_id):
+    """Poskytuje snímky jednej udalosti zoradené podľa poradia."""
+    if '/' in event_id or '..' in event_id or '/' in device_id or '..' in device_id:
+        return jsonify({"success": False, "message": "Neplatná udalosť"}), 400
+    event = get_event(device_id, event_id)
+    if event is None:
+        return jsonify({"success": False, "message": "Udalosť nenájdená"}), 404
+    return jsonify(event)
+
 @app.route('/api/activate', methods=['POST'])
 def api_activate():
     """Spätná kompatibilita s pôvodným API - nastaví režim 'armed_away'"""
@@ -311,14 +592,9 @@ def api_activate():
         data = request.get_json()
         pin = data.get('pin')
         
-        settings = load_settings()
+        settings = get_settings()
         if pin != settings.get('pin_code'):
-            state = load_state()
-            state['failed_attempts'] = state.get('failed_attempts', 0) + 1
-            if state['failed_attempts'] >= 3:
-                set_lockout(30)
-                state['failed_attempts'] = 0
-            save_state(state)
+            register_failed_attempt()
             return jsonify({"success": False, "message": "Nesprávny PIN kód!"}), 401
         
         update_state({"armed_mode": "armed_away", "alarm_active": False, "failed_attempts": 0})
@@ -330,15 +606,16 @@ def api_activate():
 
 @app.route('/api/sensor_trigger', methods=['POST'])
 def api_sensor_trigger():
-    state = load_state()
-    if not state['system_activated'] or state['alarm_triggered']:
+    def trigger(state):
+        if not state['system_activated'] or state['alarm_triggered']:
+            return False
+        state['alarm_triggered'] = True
+        if not state.get('alarm_deadline'):
+            deadline = (datetime.now() + timedelta(seconds=60)).timestamp()
+            state['alarm_deadline'] = deadline
+    
+    if modify_state(trigger) is None:
         return jsonify({"ok": False, "msg": "Systém nie je aktivovaný alebo alarm už beží"}), 400
-        
-    state['alarm_triggered'] = True
-    if not state.get('alarm_deadline'):
-        deadline = (datetime.now() + timedelta(seconds=60)).timestamp()
-        state['alarm_deadline'] = deadline
-    save_state(state)
     return jsonify({"ok": True})
 
 @app.route('/api/pin', methods=['POST'])
@@ -348,11 +625,10 @@ def api_pin():
         
     data = request.get_json()
     pin = data.get('pin', '')
-    settings = load_settings()
-    state = load_state()
+    settings = get_settings()
     
     if pin == settings['pin_code']:
-        if state.get('alarm_active', False):
+        if load_state().get('alarm_active', False):
             ns.stop_alarm()
             update_state({"alarm_active": False})
             return jsonify({"success": True, "message": "Alarm deaktivovaný"})
@@ -364,11 +640,7 @@ def api_pin():
         })
         return jsonify({"success": True, "message": "Systém deaktivovaný"})
     else:
-        state['failed_attempts'] = state.get('failed_attempts', 0) + 1
-        if state['failed_attempts'] >= 3:
-            set_lockout(30)
-            state['failed_attempts'] = 0
-        save_state(state)
+        register_failed_attempt()
         return jsonify({"success": False, "message": "Nesprávny PIN kód!"}), 401
 
 @app.route('/api/mqtt/status', methods=['GET'])
@@ -390,13 +662,48 @@ def api_mqtt_status():
         'device_count': len(mqtt_stats['connected_devices']),
         'online_device_count': online_devices,
         'reconnect_count': mqtt_stats['reconnect_count'],
-        'last_error': mqtt_stats['last_error']
+        'last_error': mqtt_stats['last_error'],
+        'ingest': mqtt_client.get_ingest_stats(),
+        'capture': mqtt_client.get_capture_stats(),
+        'metrics': metrics.get_summary()
     })
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Metriky vo formáte Prometheus"""
+    if not metrics.is_enabled():
+        return Response("Metriky sú vypnuté (settings.json: metrics.enabled)\n", status=404, mimetype='text/plain')
+    for topic_class, stats in mqtt_client.get_ingest_stats().get('classes', {}).items():
+        metrics.set_gauge("mqtt_queue_depth", stats.get('queue_depth', 0), topic_class=topic_class)
+        metrics.set_gauge("mqtt_dropped_messages", stats.get('dropped', 0), topic_class=topic_class)
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/mqtt/capture', methods=['GET', 'POST'])
+def api_mqtt_capture():
+    """Spustí alebo zastaví záznam prichádzajúcich MQTT správ"""
+    if request.method == 'GET':
+        return jsonify({'capture': mqtt_client.get_capture_stats()})
+    
+    action = (request.json or {}).get('action')
+    try:
+        if action == 'start':
+            path = mqtt_client.start_capture()
+            return jsonify({'success': True, 'message': f'Záznam spustený: {path}',
+                            'capture': mqtt_client.get_capture_stats()})
+        if action == 'stop':
+            stats = mqtt_client.stop_capture()
+            if stats is None:
+                return jsonify({'success': False, 'message': 'Záznam nebeží'}), 400
+            return jsonify({'success': True, 'message': f"Záznam uložený: {stats['path']}", 'capture': stats})
+        return jsonify({'success': False, 'message': 'Neznáma akcia, použite start alebo stop'}), 400
+    except Exception as e:
+        app.logger.error(f"Chyba pri ovládaní záznamu MQTT správ: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/mqtt/devices', methods=['GET'])
 def api_mqtt_devices():
     """Poskytuje zoznam všetkých MQTT zariadení a ich stavov"""
-    return jsonify({
+    return conditional_json((mqtt_stats['version'],), lambda: {
         'devices': list(mqtt_stats['connected_devices'].values())
     })
 
@@ -405,10 +712,11 @@ def api_mqtt_devices_clear():
     """Vymaže zoznam všetkých MQTT zariadení zo systému"""
     try:
         mqtt_stats['connected_devices'] = {}
+        mqtt_stats['version'] += 1
         
         for topic in mqtt_client.config['topics'].values():
             if mqtt_client.connected:
-                mqtt_client.client.publish(f"{topic}/broadcast", json.dumps({
+                mqtt_client.client.publish(f"{topic}/broadcast", json_codec.dumpb({
                     "command": "RECONNECT",
                     "timestamp": datetime.now().isoformat()
                 }))
@@ -450,7 +758,7 @@ def api_mqtt_config():
             
             config_path = os.path.join(os.path.dirname(__file__), '../data/mqtt_config.json')
             with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(current_config, f, indent=4, ensure_ascii=False)
+                json_codec.dump(current_config, f, pretty=True)
             
             return jsonify({'success': True, 'message': 'Konfigurácia bola úspešne aktualizovaná'})
         except Exception as e:
@@ -525,8 +833,7 @@ def api_identify_device(device_id):
 def api_settings():
     """API endpoint pre získanie aktuálnych nastavení systému."""
     try:
-        settings = load_settings()
-        return jsonify(settings)
+        return jsonify(get_settings())
     except Exception as e:
         app.logger.error(f"Chyba pri načítavaní nastavení: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -542,8 +849,8 @@ def api_settings_pin():
         if not old_pin or not new_pin:
             return jsonify({"success": False, "message": "Chýba starý alebo nový PIN"}), 400
             
-        if len(new_pin) < 4:
-            return jsonify({"success": False, "message": "PIN musí mať aspoň 4 znaky"}), 400
+        if len(new_pin) < 4 or not new_pin.isdigit():
+            return jsonify({"success": False, "message": "PIN musí mať aspoň 4 číslice"}), 400
             
         settings = load_settings()
         
@@ -554,6 +861,8 @@ def api_settings_pin():
         save_settings(settings)
         
         return jsonify({"success": True, "message": "PIN kód bol úspešne aktualizovaný"})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         app.logger.error(f"Chyba pri aktualizácii PIN kódu: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -580,6 +889,8 @@ def api_settings_notifications():
         save_settings(settings)
         
         return jsonify({"success": True, "message": "Nastavenia notifikácií boli úspešne aktualizované"})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         app.logger.error(f"Chyba pri aktualizácii nastavení notifikácií: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
@@ -612,15 +923,48 @@ def api_settings_email():
         save_settings(settings)
         
         return jsonify({"success": True, "message": "E-mailové nastavenia boli úspešne aktualizované"})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         app.logger.error(f"Chyba pri aktualizácii e-mailových nastavení: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route('/api/settings/logging', methods=['GET', 'POST'])
+def api_settings_logging():
+    """API endpoint pre úrovne logovania - zmena sa uplatní bez reštartu."""
+    if request.method == 'GET':
+        return jsonify({
+            "logging": get_setting("logging", {}),
+            "levels": list(LOG_LEVELS),
+            "stats": get_logging_stats()
+        })
+    try:
+        data = request.get_json() or {}
+        settings = load_settings()
+        logging_settings = settings.setdefault("logging", {})
+        
+        if "level" in data:
+            logging_settings["level"] = str(data["level"]).upper()
+        if "levels" in data:
+            if not isinstance(data["levels"], dict):
+                return jsonify({"success": False, "message": "levels musí byť objekt {logger: úroveň}"}), 400
+            logging_settings["levels"] = {name: str(level).upper() for name, level in data["levels"].items() if name}
+        if "format" in data:
+            logging_settings["format"] = data["format"]
+        
+        save_settings(settings)
+        return jsonify({"success": True, "message": "Nastavenia logovania boli aktualizované"})
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Chyba pri aktualizácii nastavení logovania: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
 @app.route('/api/settings/email/test', methods=['POST'])
 def api_settings_email_test():
     """API endpoint pre odoslanie testovacieho e-mailu."""
     try:
-        settings = load_settings()
+        settings = get_settings()
         
         if not settings.get("email_settings") or not settings["email_settings"].get("enabled"):
             return jsonify({"success": False, "message": "E-mailové notifikácie nie sú povolené"}), 400
@@ -636,36 +980,16 @@ def api_settings_email_test():
         app.logger.error(f"Chyba pri odosielaní testovacieho e-mailu: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route('/api/notifications/stats', methods=['GET'])
+def api_notifications_stats():
+    """Poskytuje štatistiky fronty e-mailových notifikácií (hĺbka fronty, oneskorenie doručenia)."""
+    return jsonify(ns.get_email_dispatch_stats())
+
 @app.route('/api/latest_images', methods=['GET'])
 def api_latest_images():
     """Poskytuje posledné obrázky pre jednotlivé zariadenia."""
     try:
-        images_dir = os.path.join(os.path.dirname(__file__), '../data/images')
-        
-        if not os.path.exists(images_dir):
-            return jsonify({"images": {}}), 200
-        
-        device_images = {}
-        image_files = [f for f in os.listdir(images_dir) if f.endswith('.jpg')]
-        
-        for image_file in image_files:
-            parts = image_file.split('_')
-            if len(parts) < 2:
-                continue
-                
-            device_id = parts[0]
-            
-            image_path = os.path.join(images_dir, image_file)
-            timestamp = os.path.getmtime(image_path)
-            
-            if device_id not in device_images or timestamp > device_images[device_id]['timestamp']:
-                device_images[device_id] = {
-                    'path': image_path,
-                    'timestamp': timestamp,
-                    'filename': image_file
-                }
-        
-        return jsonify({"images": device_images})
+        return conditional_json((get_catalog_version(),), lambda: {"images": get_latest_images()})
     except Exception as e:
         app.logger.error(f"Chyba pri získavaní obrázkov: {e}")
         return jsonify({"error": str(e)}), 500
@@ -696,8 +1020,69 @@ def get_status_class(sensor_type, status):
     else:
         return 'success'
 
+def get_web_server_config():
+    """Vráti konfiguráciu webového servera zo settings.json doplnenú o predvolené hodnoty."""
+    try:
+        config = get_setting("web_server", {})
+    except Exception:
+        config = {}
+    config = {**DEFAULT_WEB_SERVER_CONFIG, **config}
+    # Premenná prostredia má prednosť pred settings.json
+    if os.environ.get("SECURITY_WEB_MODE"):
+        config["mode"] = os.environ["SECURITY_WEB_MODE"]
+    return config
+
+def serve(mode=None, host=None, port=None, threads=None):
+    """Spustí webový server v zvolenom režime.
+
+    Produkčný režim beží pod waitress v tom istom procese ako MQTT klient,
+    takže všetky vlákna zdieľajú jeden mqtt_client aj stav alarmu.
+    """
+    config = get_web_server_config()
+    mode = mode or config["mode"]
+    host = host or config["host"]
+    port = int(port or config["port"])
+    threads = int(threads or config["threads"])
+
+    if mode not in WEB_SERVER_MODES:
+        logging.warning(f"Neznámy režim webového servera '{mode}', používam 'development'")
+        mode = "development"
+
+    if mode == "production":
+        try:
+            from waitress import serve as waitress_serve
+        except ImportError:
+            logging.error("Knižnica waitress nie je nainštalovaná, spúšťam vývojový server")
+        else:
+            logging.info(f"Webové rozhranie beží v produkčnom režime (waitress, {threads} vlákien) na {host}:{port}")
+            waitress_serve(
+                app,
+                host=host,
+                port=port,
+                threads=threads,
+                connection_limit=int(config["connection_limit"]),
+                channel_timeout=int(config["channel_timeout"]),
+                # Každý zápis sa odošle hneď - potrebné pre SSE stream
+                send_bytes=1,
+                ident="security-system"
+            )
+            return
+
+    app.run(host=host, port=port, threaded=True, debug=False)
+
 def start_web_app():
-    app.run(host="0.0.0.0", port=5000, threaded=True, debug=False)
+    serve()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, threaded=True, debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Webové rozhranie bezpečnostného systému")
+    parser.add_argument("--mode", choices=WEB_SERVER_MODES, help="Režim servera (predvolene zo settings.json)")
+    parser.add_argument("--host", help="Adresa, na ktorej server počúva")
+    parser.add_argument("--port", type=int, help="Port servera")
+    parser.add_argument("--threads", type=int, help="Počet vlákien v produkčnom režime")
+    args = parser.parse_args()
+
+    setup_logging()
+    if (args.mode or get_web_server_config()["mode"]) == "development":
+        app.run(host=args.host or "0.0.0.0", port=args.port or 5000, threaded=True, debug=True)
+    else:
+        serve(args.mode, args.host, args.port, args.threads)
@@ -1,17 +1,28 @@
 #!/usr/bin/env python3
 # SEND.py - Program pre Raspberry Pi pre fyzické senzory
-import json
 import threading
 import time
 import os
 import socket
 import RPi.GPIO as GPIO
 import libcamera
-import subprocess
 from libcamera import controls
 import io
 import paho.mqtt.client as mqtt
+import logging
+import json_codec
+from structured_logging import setup_logging, configure_logging, set_log_level, log_event, stop_logging
+from camera_service import CameraService, Picamera2Source, FakeFrameSource
+from publish_queue import PublishQueue
+from scheduler import schedule
+import queue
 import base64
+import struct
+import hashlib
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger("send")
 
 # Nastavenia zariadenia
 DEVICE_ID = "rpi_send_1"
@@ -27,8 +38,22 @@ MQTT_TOPIC_SENSOR = f"home/security/sensors/{DEVICE_ID}"
 MQTT_TOPIC_STATUS = f"home/security/status/{DEVICE_ID}"
 MQTT_TOPIC_CONTROL = f"home/security/control/{DEVICE_ID}"
 MQTT_TOPIC_IMAGE = f"home/security/images/{DEVICE_ID}"
+MQTT_TOPIC_IMAGE_RAW = f"home/security/images_raw/{DEVICE_ID}"
 MQTT_QOS = 1
 
+# Formát odosielaných obrázkov: "v2" (binárny JPEG) alebo "legacy" (base64 v JSON)
+IMAGE_PROTOCOL = "v2"
+IMAGE_PROTOCOL_MAGIC = b"IMG2"
+
+# Veľké obrázky sa posielajú po častiach (0 = vždy celý obrázok v jednej správe)
+IMAGE_CHUNK_MAGIC = b"IMGC"
+IMAGE_CHUNK_SIZE = 64 * 1024
+# Posledné prenosy, ktorých časti si prijímač môže znova vyžiadať
+RECENT_TRANSFERS_MAX = 4
+RECENT_TRANSFER_TTL = 300
+recent_transfers = OrderedDict()
+recent_transfers_lock = threading.Lock()
+
 # Konfigurácia pre automatické zisťovanie MQTT brokera
 MQTT_DISCOVERY_PORT = 12345
 MQTT_DISCOVERY_TIMEOUT = 30  # sekundy
@@ -36,12 +61,25 @@ MQTT_DISCOVERY_TIMEOUT = 30  # sekundy
 # Premenné pre MQTT
 mqtt_client = None
 mqtt_connected = False
+reconnect_task = None
 mqtt_broker = DEFAULT_MQTT_BROKER
 
 # Časovač pre zachytenie fotografie
 last_photo_time = 0
 PHOTO_COOLDOWN = 2  # 2 sekundy cooldown medzi zachytením fotografií
 
+# Burst - snímky pred a po spúšťači odoslané pod jedným event_id
+burst_enabled = True
+burst_pre_frames = 3
+burst_post_frames = 5
+burst_post_fps = 5
+publish_queue_size = 32
+publish_queue = None
+burst_jobs = queue.Queue(maxsize=4)
+
+# Logovanie (sekcia "logging" v config.json) - predvolene JSON cez frontu
+log_config = {}
+
 # Nastavenia GPIO pinov
 MOTION_PIN = 17  # GPIO pre pohybový senzor
 DOOR_PIN = 18    # GPIO pre dverový kontakt
@@ -78,17 +116,24 @@ camera_resolution = (640, 480)
 camera_framerate = 24
 camera_rotation = 0
 camera_warmup_time = 2  # sekundy na inicializáciu kamery
+camera_source = "picamera2"  # picamera2 alebo fake (testovanie bez kamery)
+camera_buffer_seconds = 3    # dĺžka kruhového bufferu snímok
+camera_buffer_fps = 5        # počet snímok za sekundu ukladaných do bufferu
 
 def load_config():
     """Načíta konfiguráciu zo súboru config.json ak existuje."""
     global MQTT_BROKER, MQTT_PORT, MQTT_USERNAME, MQTT_PASSWORD, mqtt_broker
     global camera_resolution, camera_framerate, camera_rotation, camera_warmup_time
+    global camera_source, camera_buffer_seconds, camera_buffer_fps
+    global IMAGE_PROTOCOL, IMAGE_CHUNK_SIZE
+    global burst_enabled, burst_pre_frames, burst_post_frames, burst_post_fps, publish_queue_size
+    global log_config
     
     try:
         config_path = os.path.join(os.path.dirname(__file__), 'config.json')
         if os.path.exists(config_path):
-            with open(config_path, 'r') as file:
-                config = json.load(file)
+            with open(config_path, 'rb') as file:
+                config = json_codec.load(file)
                 
                 if 'mqtt' in config:
                     mqtt_config = config['mqtt']
@@ -105,16 +150,34 @@ def load_config():
                     camera_framerate = camera_config.get('framerate', camera_framerate)
                     camera_rotation = camera_config.get('rotation', camera_rotation)
                     camera_warmup_time = camera_config.get('warmup_time', camera_warmup_time)
+                    camera_source = camera_config.get('source', camera_source)
+                    camera_buffer_seconds = camera_config.get('buffer_seconds', camera_buffer_seconds)
+                    camera_buffer_fps = camera_config.get('buffer_fps', camera_buffer_fps)
+                
+                if 'burst' in config:
+                    burst_config = config['burst']
+                    burst_enabled = burst_config.get('enabled', burst_enabled)
+                    burst_pre_frames = burst_config.get('pre_frames', burst_pre_frames)
+                    burst_post_frames = burst_config.get('post_frames', burst_post_frames)
+                    burst_post_fps = burst_config.get('post_fps', burst_post_fps)
+                    publish_queue_size = burst_config.get('queue_size', publish_queue_size)
+                
+                if 'logging' in config:
+                    log_config = config['logging']
+                    configure_logging(log_config)
+                
+                IMAGE_PROTOCOL = config.get('image_protocol', IMAGE_PROTOCOL)
+                IMAGE_CHUNK_SIZE = config.get('image_chunk_size', IMAGE_CHUNK_SIZE)
                 
-                print("Konfigurácia načítaná z config.json")
+                logger.info("Konfigurácia načítaná z config.json")
     except Exception as e:
-        print(f"Chyba pri načítaní konfigurácie: {e}")
+        logger.error(f"Chyba pri načítaní konfigurácie: {e}")
 
 def find_mqtt_broker():
     """Automaticky vyhľadá MQTT broker na sieti pomocou broadcast protokolu."""
     global mqtt_broker, last_discovery_attempt, MQTT_PORT
     
-    print("Hľadám MQTT broker na sieti...")
+    logger.info("Hľadám MQTT broker na sieti...")
     last_discovery_attempt = time.time()
     
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -123,14 +186,14 @@ def find_mqtt_broker():
     sock.settimeout(MQTT_DISCOVERY_TIMEOUT)
     
     try:
-        discovery_message = json.dumps({
+        discovery_message = json_codec.dumpb({
             "type": "mqtt_discovery_request",
             "device_id": DEVICE_ID,
             "device_name": DEVICE_NAME
-        }).encode('utf-8')
+        })
         
         broadcast_address = "255.255.255.255"
-        print(f"Odosielam broadcast discovery požiadavku na {broadcast_address}:{MQTT_DISCOVERY_PORT}")
+        logger.info(f"Odosielam broadcast discovery požiadavku na {broadcast_address}:{MQTT_DISCOVERY_PORT}")
         sock.sendto(discovery_message, (broadcast_address, MQTT_DISCOVERY_PORT))
         
         start_time = time.time()
@@ -139,16 +202,16 @@ def find_mqtt_broker():
         while time.time() - start_time < discovery_timeout:
             try:
                 data, addr = sock.recvfrom(1024)
-                print(f"Prijatá odpoveď od {addr}")
+                logger.info(f"Prijatá odpoveď od {addr}")
                 
-                message = json.loads(data.decode("utf-8"))
+                message = json_codec.loads(data)
                 
                 if message.get("type") == "mqtt_discovery" or message.get("type") == "mqtt_discovery_response":
                     discovered_broker = message.get("broker_ip")
                     discovered_port = message.get("broker_port", MQTT_PORT)
                     
                     if discovered_broker:
-                        print(f"Nájdený MQTT broker: {discovered_broker}:{discovered_port}")
+                        logger.info(f"Nájdený MQTT broker: {discovered_broker}:{discovered_port}")
                         
                         mqtt_broker = discovered_broker
                         MQTT_PORT = discovered_port
@@ -162,23 +225,23 @@ def find_mqtt_broker():
                         return True
             except socket.timeout:
                 continue
-            except json.JSONDecodeError as e:
-                print(f"Prijatá neplatná JSON odpoveď: {e}")
+            except json_codec.JSONDecodeError as e:
+                logger.warning(f"Prijatá neplatná JSON odpoveď: {e}")
                 continue
             except Exception as e:
-                print(f"Chyba pri spracovaní odpovede: {e}")
+                logger.error(f"Chyba pri spracovaní odpovede: {e}")
                 continue
                 
             time.sleep(0.1)
             
     except socket.error as e:
-        print(f"Socket chyba pri vyhľadávaní MQTT brokera: {e}")
+        logger.error(f"Socket chyba pri vyhľadávaní MQTT brokera: {e}")
     except Exception as e:
-        print(f"Všeobecná chyba pri hľadaní MQTT brokera: {e}")
+        logger.error(f"Všeobecná chyba pri hľadaní MQTT brokera: {e}")
     finally:
         sock.close()
         
-    print(f"Použijem predvolenú adresu MQTT brokera: {DEFAULT_MQTT_BROKER}")
+    logger.info(f"Použijem predvolenú adresu MQTT brokera: {DEFAULT_MQTT_BROKER}")
     mqtt_broker = DEFAULT_MQTT_BROKER
     
     GPIO.output(LED_PIN, GPIO.HIGH)
@@ -204,29 +267,43 @@ def setup_gpio():
     GPIO.add_event_detect(WINDOW_PIN, GPIO.BOTH, callback=window_callback, bouncetime=200)
 
 def setup_camera():
-    """Inicializácia kamery."""
+    """Otvorí kameru a spustí nepretržité snímanie do kruhového bufferu."""
     global camera
     
     try:
-        subprocess.run(["libcamera-still", "--help"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
-        print(f"Kamera inicializovaná - rozlíšenie: {camera_resolution}, rotácia: {camera_rotation}°")
+        if camera_source == "fake":
+            source = FakeFrameSource(camera_resolution)
+        else:
+            source = Picamera2Source(camera_resolution, camera_framerate, camera_rotation)
         
-        print(f"Zahriatie kamery ({camera_warmup_time}s)...")
-        time.sleep(camera_warmup_time)
+        camera = CameraService(source, camera_buffer_seconds, camera_buffer_fps)
+        camera.start()
+        logger.info(f"Kamera inicializovaná ({camera_source}) - rozlíšenie: {camera_resolution}, rotácia: {camera_rotation}°")
         
-        camera = {"resolution": camera_resolution, "rotation": camera_rotation}
+        logger.info(f"Zahriatie kamery ({camera_warmup_time}s)...")
+        time.sleep(camera_warmup_time)
         
     except Exception as e:
-        print(f"Chyba pri inicializácii kamery: {e}")
+        logger.error(f"Chyba pri inicializácii kamery: {e}")
         camera = None
 
+def setup_publisher():
+    """Spustí vlákno odosielajúce snímky z ohraničenej fronty a vlákno pre bursty."""
+    global publish_queue
+    
+    publish_queue = PublishQueue(send_image, publish_queue_size)
+    publish_queue.start()
+    threading.Thread(target=burst_worker, daemon=True, name="BurstThread").start()
+
 def on_mqtt_connect(client, userdata, flags, rc):
     """Callback pri pripojení k MQTT brokeru."""
     global mqtt_connected
     
     if rc == 0:
         mqtt_connected = True
-        print(f"Pripojený k MQTT brokeru ({mqtt_broker}:{MQTT_PORT})")
+        if reconnect_task is not None:
+            reconnect_task.cancel()
+        logger.info(f"Pripojený k MQTT brokeru ({mqtt_broker}:{MQTT_PORT})")
         
         client.subscribe(MQTT_TOPIC_CONTROL, qos=MQTT_QOS)
         
@@ -239,7 +316,7 @@ def on_mqtt_connect(client, userdata, flags, rc):
             time.sleep(0.1)
     else:
         mqtt_connected = False
-        print(f"Nepodarilo sa pripojiť k MQTT brokeru, kód: {rc}")
+        logger.error(f"Nepodarilo sa pripojiť k MQTT brokeru, kód: {rc}")
 
 def on_mqtt_disconnect(client, userdata, rc):
     """Callback pri odpojení od MQTT brokera."""
@@ -247,23 +324,23 @@ def on_mqtt_disconnect(client, userdata, rc):
     mqtt_connected = False
     
     if rc != 0:
-        print(f"Neočakávané odpojenie od MQTT brokera, kód: {rc}")
+        logger.warning(f"Neočakávané odpojenie od MQTT brokera, kód: {rc}")
     else:
-        print("Odpojený od MQTT brokera")
+        logger.info("Odpojený od MQTT brokera")
 
 def on_mqtt_message(client, userdata, msg):
     """Spracovanie prijatých MQTT správ."""
     try:
         topic = msg.topic
-        payload = json.loads(msg.payload.decode('utf-8'))
-        print(f"MQTT správa prijatá: {topic} - {payload}")
+        payload = json_codec.loads(msg.payload)
+        log_event(logger, logging.INFO, "send.control", "MQTT správa prijatá: %s", topic, topic=topic, payload=payload)
         
         if topic == MQTT_TOPIC_CONTROL:
             handle_control_message(payload)
-    except json.JSONDecodeError:
-        print(f"Neplatný JSON formát: {msg.payload}")
+    except json_codec.JSONDecodeError:
+        log_event(logger, logging.WARNING, "send.control", "Neplatný JSON formát na téme %s", msg.topic, size=len(msg.payload))
     except Exception as e:
-        print(f"Chyba pri spracovaní MQTT správy: {e}")
+        log_event(logger, logging.ERROR, "send.control", "Chyba pri spracovaní MQTT správy: %s", e)
 
 def handle_control_message(payload):
     """Spracovanie riadiacich príkazov."""
@@ -275,17 +352,23 @@ def handle_control_message(payload):
         send_all_sensors_status()
     elif command == 'capture':
         threading.Thread(target=capture_and_send_image).start()
+    elif command == 'resend_chunks':
+        threading.Thread(target=resend_image_chunks, args=(payload.get('data', {}),)).start()
+    elif command == 'set_log_level':
+        data = payload.get('data', {})
+        set_log_level(data.get('level', 'INFO'), data.get('logger'))
+        logger.warning(f"Úroveň logovania {data.get('logger') or 'root'} zmenená na {data.get('level', 'INFO')}")
     elif command == 'restart':
-        print("Prijatý príkaz na reštart programu")
+        logger.info("Prijatý príkaz na reštart programu")
     elif command == 'identify':
-        print("Zariadenie identifikované")
+        logger.info("Zariadenie identifikované")
         for _ in range(10):
             GPIO.output(LED_PIN, GPIO.HIGH)
             time.sleep(0.2)
             GPIO.output(LED_PIN, GPIO.LOW)
             time.sleep(0.2)
     elif command == 'discover':
-        print("Prijatý príkaz na vyhľadanie MQTT brokera")
+        logger.info("Prijatý príkaz na vyhľadanie MQTT brokera")
         if find_mqtt_broker():
             if mqtt_client:
                 mqtt_client.disconnect()
@@ -300,7 +383,7 @@ def setup_mqtt():
     if MQTT_USERNAME and MQTT_PASSWORD:
         mqtt_client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
     
-    lwt_payload = json.dumps({
+    lwt_payload = json_codec.dumpb({
         "status": "OFFLINE",
         "device_id": DEVICE_ID,
         "device_name": DEVICE_NAME,
@@ -315,8 +398,20 @@ def setup_mqtt():
     
     mqtt_client.loop_start()
     
+    # Naplánovaný pokus by sa pripájal súčasne s týmto
+    if reconnect_task is not None:
+        reconnect_task.cancel()
     try_mqtt_connect()
 
+def schedule_reconnect():
+    """Naplánuje jeden ďalší pokus o pripojenie, predchádzajúci naplánovaný pokus sa zruší."""
+    global reconnect_task
+    if reconnect_task is not None:
+        reconnect_task.cancel()
+    # Pripájanie môže blokovať, preto beží mimo vlákna plánovača
+    reconnect_task = schedule(MQTT_RECONNECT_INTERVAL,
+                              lambda: threading.Thread(target=try_mqtt_connect, daemon=True).start())
+
 def try_mqtt_connect():
     """Pokus o pripojenie k MQTT brokeru."""
     global mqtt_broker
@@ -325,21 +420,25 @@ def try_mqtt_connect():
         return
         
     try:
-        print(f"Pripájam sa k MQTT brokeru {mqtt_broker}:{MQTT_PORT}...")
-        print("Tip: Skontrolujte, či je služba Mosquitto MQTT broker spustená.")
+        logger.info(f"Pripájam sa k MQTT brokeru {mqtt_broker}:{MQTT_PORT}...")
+        logger.info("Tip: Skontrolujte, či je služba Mosquitto MQTT broker spustená.")
         mqtt_client.connect(mqtt_broker, MQTT_PORT, keepalive=60)
     except ConnectionRefusedError as e:
-        print(f"Broker odmietol pripojenie: {e}")
-        print("Skontrolujte, či je Mosquitto broker spustený pomocou príkazu 'services.msc' (Windows) alebo 'sudo systemctl status mosquitto' (Linux)")
-        print(f"Ďalší pokus o pripojenie za {MQTT_RECONNECT_INTERVAL} sekúnd...")
-        threading.Timer(MQTT_RECONNECT_INTERVAL, try_mqtt_connect).start()
+        logger.error(f"Broker odmietol pripojenie: {e}")
+        logger.info("Skontrolujte, či je Mosquitto broker spustený pomocou príkazu 'services.msc' (Windows) alebo 'sudo systemctl status mosquitto' (Linux)")
+        logger.info(f"Ďalší pokus o pripojenie za {MQTT_RECONNECT_INTERVAL} sekúnd...")
+        schedule_reconnect()
     except Exception as e:
-        print(f"Chyba pri pripájaní k MQTT brokeru: {e}")
-        print(f"Ďalší pokus o pripojenie za {MQTT_RECONNECT_INTERVAL} sekúnd...")
-        threading.Timer(MQTT_RECONNECT_INTERVAL, try_mqtt_connect).start()
+        logger.error(f"Chyba pri pripájaní k MQTT brokeru: {e}")
+        logger.info(f"Ďalší pokus o pripojenie za {MQTT_RECONNECT_INTERVAL} sekúnd...")
+        schedule_reconnect()
 
 def mqtt_monitor():
-    """Monitoruje stav MQTT pripojenia a pokúša sa o opätovné pripojenie."""
+    """Monitoruje stav MQTT pripojenia a po DISCOVERY_RETRY_INTERVAL znova hľadá broker.
+
+    Samo sa nepripája - neúspešné pokusy plánuje schedule_reconnect a po výpadku
+    nadviazaného spojenia sa znova pripája sieťová slučka paho.
+    """
     global mqtt_connected, mqtt_broker, last_discovery_attempt
     
     while True:
@@ -347,22 +446,19 @@ def mqtt_monitor():
             current_time = time.time()
             
             if current_time - last_discovery_attempt > DISCOVERY_RETRY_INTERVAL:
-                print("Znova sa pokúšam nájsť MQTT broker...")
+                logger.info("Znova sa pokúšam nájsť MQTT broker...")
                 if find_mqtt_broker():
                     mqtt_client.disconnect()
                     setup_mqtt()
-                else:
-                    try_mqtt_connect()
             else:
-                print("MQTT pripojenie nie je aktívne, pokúšam sa znovu pripojiť...")
-                try_mqtt_connect()
+                logger.warning("MQTT pripojenie nie je aktívne, čakám na ďalší pokus o pripojenie...")
             
         time.sleep(MQTT_RECONNECT_INTERVAL)
 
 def publish_mqtt_status(status, message=None):
     """Publikuje status zariadenia cez MQTT."""
     if not mqtt_client or not mqtt_connected:
-        print(f"MQTT nie je pripojené, nemôžem publikovať status: {status}")
+        logger.warning(f"MQTT nie je pripojené, nemôžem publikovať status: {status}")
         return False
     
     try:
@@ -379,19 +475,19 @@ def publish_mqtt_status(status, message=None):
             
         result = mqtt_client.publish(
             MQTT_TOPIC_STATUS, 
-            json.dumps(payload), 
+            json_codec.dumpb(payload), 
             qos=MQTT_QOS,
             retain=True
         )
         
         if result.rc == mqtt.MQTT_ERR_SUCCESS:
-            print(f"Status publikovaný: {status}" + (f" - {message}" if message else ""))
+            log_event(logger, logging.INFO, "send.status", "Status publikovaný: %s", status, message=message)
             return True
         else:
-            print(f"Chyba pri publikovaní statusu: {result.rc}")
+            logger.error(f"Chyba pri publikovaní statusu: {result.rc}")
             return False
     except Exception as e:
-        print(f"Chyba pri publikovaní statusu: {e}")
+        logger.error(f"Chyba pri publikovaní statusu: {e}")
         return False
 
 def motion_callback(channel):
@@ -409,14 +505,15 @@ def motion_callback(channel):
             
             if current_state:
                 GPIO.output(LED_PIN, GPIO.HIGH)
-                threading.Timer(0.5, lambda: GPIO.output(LED_PIN, GPIO.LOW)).start()
+                schedule(0.5, GPIO.output, LED_PIN, GPIO.LOW)
                 
                 if current_time - last_photo_time > PHOTO_COOLDOWN:
                     last_photo_time = current_time
-                    print(f"Pohyb detegovaný - zachytávam snímku (cooldown: {PHOTO_COOLDOWN}s)...")
-                    threading.Thread(target=capture_and_send_image).start()
+                    log_event(logger, logging.INFO, "send.sensor", "Pohyb detegovaný - zachytávam snímku", cooldown=PHOTO_COOLDOWN)
+                    trigger_capture(current_time)
                 else:
-                    print(f"Pohyb detegovaný - ignorujem fotografovanie (cooldown ešte neuplynul, zostáva {PHOTO_COOLDOWN - (current_time - last_photo_time):.1f}s)")
+                    log_event(logger, logging.INFO, "send.sensor", "Pohyb detegovaný - ignorujem fotografovanie (cooldown ešte neuplynul)",
+                              remaining=round(PHOTO_COOLDOWN - (current_time - last_photo_time), 1))
 
 def door_callback(channel):
     """Callback pre dverový kontakt."""
@@ -466,18 +563,19 @@ def publish_sensor_status(sensor_type, state):
         
         result = mqtt_client.publish(
             MQTT_TOPIC_SENSOR,
-            json.dumps(payload),
+            json_codec.dumpb(payload),
             qos=MQTT_QOS
         )
         
         if result.rc == mqtt.MQTT_ERR_SUCCESS:
-            print(f"Sensor {SENSOR_LABELS.get(sensor_type, sensor_type)}: {state_value}")
+            log_event(logger, logging.INFO, "send.sensor", "Senzor %s: %s", SENSOR_LABELS.get(sensor_type, sensor_type), state_value,
+                      sensor=sensor_type, state=state_value)
             return True
         else:
-            print(f"Chyba pri publikovaní stavu senzora: {result.rc}")
+            log_event(logger, logging.ERROR, "send.sensor", "Chyba pri publikovaní stavu senzora: %s", result.rc)
             return False
     except Exception as e:
-        print(f"Chyba pri publikovaní stavu senzora: {e}")
+        log_event(logger, logging.ERROR, "send.sensor", "Chyba pri publikovaní stavu senzora: %s", e)
         return False
 
 def send_all_sensors_status():
@@ -490,76 +588,178 @@ def send_all_sensors_status():
     publish_sensor_status("door", door_state)
     publish_sensor_status("window", window_state)
 
-def capture_and_send_image():
-    """Zachytí snímok z kamery a odošle ho cez MQTT."""
+def trigger_capture(trigger_time):
+    """Naplánuje zachytenie snímok k spúšťaču bez blokovania GPIO callbacku."""
+    if not burst_enabled:
+        threading.Thread(target=capture_and_send_image, args=(trigger_time,)).start()
+        return
+    try:
+        burst_jobs.put_nowait(trigger_time)
+    except queue.Full:
+        log_event(logger, logging.WARNING, "send.image", "Burst ignorovaný - predchádzajúce bursty ešte nie sú spracované")
+
+def burst_worker():
+    """Spracúva naplánované bursty jeden po druhom."""
+    while True:
+        trigger_time = burst_jobs.get()
+        try:
+            capture_burst(trigger_time)
+        except Exception as e:
+            logger.error(f"Chyba pri zachytávaní burstu: {e}")
+
+def build_image_metadata(frame, trigger_time):
+    return {
+        "device_id": DEVICE_ID,
+        "device_name": DEVICE_NAME,
+        "room": DEVICE_NAME,
+        "timestamp": frame.timestamp,
+        "trigger_time": trigger_time,
+        "format": "jpeg",
+        "trigger": "motion"
+    }
+
+def capture_burst(trigger_time):
+    """Zaradí na odoslanie snímky pred spúšťačom, v čase spúšťača a po ňom.
+
+    Všetky snímky majú spoločné event_id, prijímač ich uloží k jednej udalosti.
+    """
     if camera is None:
-        print("Kamera nie je dostupná")
+        logger.warning("Kamera nie je dostupná")
         return
     
+    event_id = uuid.uuid4().hex[:12]
+    frame_count = burst_pre_frames + 1 + burst_post_frames
+    index = 0
+    GPIO.output(LED_PIN, GPIO.HIGH)
     try:
-        GPIO.output(LED_PIN, GPIO.HIGH)
-        
-        temp_image_path = os.path.join(os.path.dirname(__file__), "temp_capture.jpg")
-        
-        width, height = camera["resolution"]
-        rotation = camera["rotation"]
-        
-        cmd = [
-            "libcamera-still",
-            "--width", str(width),
-            "--height", str(height), 
-            "--rotation", str(rotation),
-            "--nopreview",
-            "--output", temp_image_path,
-            "--immediate"
-        ]
-        
-        print("Zachytávam snímku pomocou libcamera-still...")
-        subprocess.run(cmd, check=True)
-        
-        with open(temp_image_path, "rb") as f:
-            image_data = f.read()
-            
-        try:
-            os.remove(temp_image_path)
-        except:
-            pass
-        
-        base64_data = base64.b64encode(image_data).decode('utf-8')
-        
-        payload = {
-            "image_data": base64_data,
-            "metadata": {
-                "device_id": DEVICE_ID,
-                "device_name": DEVICE_NAME,
-                "room": DEVICE_NAME,
-                "timestamp": time.time(),
-                "format": "jpeg",
-                "trigger": "motion"
-            }
-        }
-        
-        if mqtt_connected:
-            print("Odosielam zachytený obrázok...")
-            result = mqtt_client.publish(
-                MQTT_TOPIC_IMAGE,
-                json.dumps(payload),
-                qos=MQTT_QOS
-            )
-            
-            if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                print(f"Obrázok úspešne odoslaný, veľkosť: {len(base64_data)} B")
-            else:
-                print(f"Chyba pri odosielaní obrázku: {result.rc}")
-        
-    except Exception as e:
-        print(f"Chyba pri zachytávaní alebo odosielaní obrázku: {e}")
+        for phase, frame in camera.iter_burst(trigger_time, burst_pre_frames, burst_post_frames, burst_post_fps):
+            metadata = build_image_metadata(frame, trigger_time)
+            metadata.update({
+                "event_id": event_id,
+                "frame_index": index,
+                "frame_count": frame_count,
+                "phase": phase,
+                "offset": round(frame.timestamp - trigger_time, 3)
+            })
+            if not publish_queue.put(metadata, frame.data):
+                log_event(logger, logging.WARNING, "send.image", "Fronta odosielania je plná - snímka %d udalosti %s zahodená",
+                          index, event_id)
+            index += 1
     finally:
         GPIO.output(LED_PIN, GPIO.LOW)
+    log_event(logger, logging.INFO, "send.image", "Burst %s: %d snímok zaradených na odoslanie", event_id, index,
+              event_id=event_id, frames=index)
+
+def capture_and_send_image(trigger_time=None):
+    """Odošle snímku z kamery zachytenú v čase spúšťača (alebo tesne pred ním)."""
+    if camera is None:
+        logger.warning("Kamera nie je dostupná")
+        return
+    
+    frame = camera.get_frame(trigger_time)
+    if frame is None:
+        logger.warning("Kamera neposkytla žiadnu snímku")
+        return
+    
+    if not publish_queue.put(build_image_metadata(frame, trigger_time), frame.data):
+        log_event(logger, logging.WARNING, "send.image", "Fronta odosielania je plná - snímka zahodená")
+
+def send_image(metadata, image_data):
+    """Zabalí a odošle jednu snímku (volá ho vlákno fronty odosielania)."""
+    if not mqtt_connected:
+        log_event(logger, logging.WARNING, "send.image", "MQTT nie je pripojené - snímka nebola odoslaná")
+        return
+    
+    if IMAGE_PROTOCOL == "legacy":
+        topic = MQTT_TOPIC_IMAGE
+        message = json_codec.dumpb({
+            "image_data": base64.b64encode(image_data).decode('utf-8'),
+            "metadata": metadata
+        })
+    elif IMAGE_CHUNK_SIZE and len(image_data) > IMAGE_CHUNK_SIZE:
+        publish_image_chunks(metadata, image_data)
+        return
+    else:
+        topic = MQTT_TOPIC_IMAGE_RAW
+        message = pack_image(metadata, image_data)
+    
+    result = mqtt_client.publish(topic, message, qos=MQTT_QOS)
+    
+    if result.rc == mqtt.MQTT_ERR_SUCCESS:
+        log_event(logger, logging.INFO, "send.image", "Obrázok odoslaný", bytes=len(message), protocol=IMAGE_PROTOCOL)
+    else:
+        log_event(logger, logging.ERROR, "send.image", "Chyba pri odosielaní obrázku: %s", result.rc)
+
+def pack_image(metadata, image_data, magic=IMAGE_PROTOCOL_MAGIC):
+    """Zabalí metadáta a JPEG do binárnej správy (image_protocol v2).
+
+    Formát: IMG2 (alebo IMGC pre časť obrázka) + dĺžka hlavičky (uint16, big-endian)
+    + JSON hlavička + JPEG.
+    """
+    header = json_codec.dumpb(metadata)
+    return b"".join((magic, struct.pack(">H", len(header)), header, image_data))
+
+def publish_image_chunks(metadata, image_data):
+    """Odošle obrázok po častiach a zapamätá si ho pre prípadné opätovné odoslanie."""
+    total = (len(image_data) + IMAGE_CHUNK_SIZE - 1) // IMAGE_CHUNK_SIZE
+    transfer = {
+        "id": uuid.uuid4().hex[:16],
+        "data": image_data,
+        "chunk_size": IMAGE_CHUNK_SIZE,
+        "total": total,
+        "sha256": hashlib.sha256(image_data).hexdigest(),
+        "metadata": metadata,
+        "created": time.time()
+    }
+    
+    with recent_transfers_lock:
+        recent_transfers[transfer["id"]] = transfer
+        while len(recent_transfers) > RECENT_TRANSFERS_MAX:
+            recent_transfers.popitem(last=False)
+    
+    for seq in range(total):
+        publish_image_chunk(transfer, seq)
+    
+    log_event(logger, logging.INFO, "send.image", "Obrázok odoslaný po častiach (prenos %s)", transfer['id'],
+              chunks=total, chunk_size=IMAGE_CHUNK_SIZE)
+    return transfer["id"]
+
+def publish_image_chunk(transfer, seq):
+    """Odošle jednu časť obrázka."""
+    start = seq * transfer["chunk_size"]
+    header = {
+        "id": transfer["id"],
+        "seq": seq,
+        "total": transfer["total"],
+        "chunk_size": transfer["chunk_size"],
+        "size": len(transfer["data"]),
+        "sha256": transfer["sha256"],
+        "metadata": transfer["metadata"]
+    }
+    chunk = memoryview(transfer["data"])[start:start + transfer["chunk_size"]]
+    return mqtt_client.publish(MQTT_TOPIC_IMAGE_RAW, pack_image(header, chunk, IMAGE_CHUNK_MAGIC), qos=MQTT_QOS)
+
+def resend_image_chunks(data):
+    """Znova odošle časti obrázka, ktoré si vyžiadal prijímač (príkaz resend_chunks)."""
+    transfer_id = data.get("transfer_id")
+    
+    with recent_transfers_lock:
+        transfer = recent_transfers.get(transfer_id)
+    
+    if transfer is None or time.time() - transfer["created"] > RECENT_TRANSFER_TTL:
+        logger.warning(f"Prenos {transfer_id} už nie je k dispozícii, časti nemožno znova odoslať")
+        return
+    
+    count = 0
+    for start, end in data.get("ranges", []):
+        for seq in range(max(0, start), min(end, transfer["total"] - 1) + 1):
+            publish_image_chunk(transfer, seq)
+            count += 1
+    logger.info(f"Znova odoslaných {count} častí prenosu {transfer_id}")
 
 def cleanup():
     """Vykoná čistiace operácie pred ukončením programu."""
-    print("Čistenie zdrojov...")
+    logger.info("Čistenie zdrojov...")
     
     if mqtt_connected and mqtt_client is not None:
         try:
@@ -569,6 +769,9 @@ def cleanup():
         except:
             pass
     
+    if publish_queue is not None:
+        publish_queue.stop()
+    
     try:
         GPIO.cleanup()
     except:
@@ -576,14 +779,14 @@ def cleanup():
     
     if camera is not None:
         try:
-            if camera.started:
-                camera.stop()
+            camera.stop()
         except:
             pass
 
 def main():
     """Hlavná funkcia programu."""
     print("=== PROGRAM PRE RASPBERRY PI - FYZICKÉ SENZORY A KAMERA ===")
+    setup_logging()
     
     try:
         load_config()
@@ -592,6 +795,8 @@ def main():
         
         setup_camera()
         
+        setup_publisher()
+        
         find_mqtt_broker()
         
         setup_mqtt()
@@ -611,9 +816,10 @@ def main():
     except KeyboardInterrupt:
         print("\nUkončujem program...")
     except Exception as e:
-        print(f"Kritická chyba: {e}")
+        logger.error(f"Kritická chyba: {e}")
     finally:
         cleanup()
+        stop_logging()
 
 if __name__ == "__main__":
     main()
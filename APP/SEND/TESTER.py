@@ -1,12 +1,21 @@
 #!/usr/bin/env python3
 # TESTER.py - Testovací program pre Raspberry Pi bez fyzických senzorov
-import json
 import threading
 import time
 import os
 import random
+import sys
 import paho.mqtt.client as mqtt
 import socket
+import struct
+import hashlib
+import uuid
+from collections import OrderedDict
+import json_codec
+from camera_service import CameraService, FakeFrameSource
+from publish_queue import PublishQueue
+from scheduler import schedule
+import base64
 
 # Nastavenia testovacieho zariadenia
 DEVICE_ID = "rpi_tester_1"
@@ -22,8 +31,22 @@ MQTT_TOPIC_SENSOR = f"home/security/sensors/{DEVICE_ID}"
 MQTT_TOPIC_STATUS = f"home/security/status/{DEVICE_ID}"
 MQTT_TOPIC_CONTROL = f"home/security/control/{DEVICE_ID}"
 MQTT_TOPIC_IMAGE = f"home/security/images/{DEVICE_ID}"
+MQTT_TOPIC_IMAGE_RAW = f"home/security/images_raw/{DEVICE_ID}"
 MQTT_QOS = 1
 
+# Formát odosielaných obrázkov: "v2" (binárny JPEG) alebo "legacy" (base64 v JSON)
+IMAGE_PROTOCOL = "v2"
+IMAGE_PROTOCOL_MAGIC = b"IMG2"
+
+# Veľké obrázky sa posielajú po častiach (0 = vždy celý obrázok v jednej správe)
+IMAGE_CHUNK_MAGIC = b"IMGC"
+IMAGE_CHUNK_SIZE = 64 * 1024
+# Posledné prenosy, ktorých časti si prijímač môže znova vyžiadať
+RECENT_TRANSFERS_MAX = 4
+RECENT_TRANSFER_TTL = 300
+recent_transfers = OrderedDict()
+recent_transfers_lock = threading.Lock()
+
 # Konfigurácia pre automatické zisťovanie MQTT brokera
 MQTT_DISCOVERY_PORT = 12345
 MQTT_DISCOVERY_TIMEOUT = 30  # sekundy
@@ -31,6 +54,7 @@ MQTT_DISCOVERY_TIMEOUT = 30  # sekundy
 # Premenné pre MQTT
 mqtt_client = None
 mqtt_connected = False
+reconnect_task = None
 mqtt_broker = DEFAULT_MQTT_BROKER
 last_discovery_attempt = 0
 DISCOVERY_RETRY_INTERVAL = 60  # sekúnd
@@ -45,19 +69,32 @@ SENSOR_LABELS = {
     "window": "Okno"
 }
 
+# Simulovaná kamera s kruhovým bufferom snímok
+camera = None
+
+# Burst - snímky pred a po spúšťači odoslané pod jedným event_id
+burst_enabled = True
+burst_pre_frames = 3
+burst_post_frames = 5
+burst_post_fps = 5
+publish_queue_size = 32
+publish_queue = None
+
 # Intervaly pre simuláciu (v sekundách)
 STATUS_INTERVAL = 5
 MQTT_RECONNECT_INTERVAL = 5
 
 def load_config():
     """Načíta konfiguráciu zo súboru config.json ak existuje."""
-    global DEFAULT_MQTT_BROKER, MQTT_PORT, MQTT_USERNAME, MQTT_PASSWORD, mqtt_broker
+    global DEFAULT_MQTT_BROKER, MQTT_PORT, MQTT_USERNAME, MQTT_PASSWORD, mqtt_broker, IMAGE_PROTOCOL
+    global IMAGE_CHUNK_SIZE
+    global burst_enabled, burst_pre_frames, burst_post_frames, burst_post_fps, publish_queue_size
     
     try:
         config_path = os.path.join(os.path.dirname(__file__), 'config.json')
         if os.path.exists(config_path):
-            with open(config_path, 'r') as file:
-                config = json.load(file)
+            with open(config_path, 'rb') as file:
+                config = json_codec.load(file)
                 
                 if 'mqtt' in config:
                     mqtt_config = config['mqtt']
@@ -65,6 +102,17 @@ def load_config():
                     MQTT_PORT = mqtt_config.get('port', MQTT_PORT)
                     MQTT_USERNAME = mqtt_config.get('username', MQTT_USERNAME)
                     MQTT_PASSWORD = mqtt_config.get('password', MQTT_PASSWORD)
+                
+                if 'burst' in config:
+                    burst_config = config['burst']
+                    burst_enabled = burst_config.get('enabled', burst_enabled)
+                    burst_pre_frames = burst_config.get('pre_frames', burst_pre_frames)
+                    burst_post_frames = burst_config.get('post_frames', burst_post_frames)
+                    burst_post_fps = burst_config.get('post_fps', burst_post_fps)
+                    publish_queue_size = burst_config.get('queue_size', publish_queue_size)
+                
+                IMAGE_PROTOCOL = config.get('image_protocol', IMAGE_PROTOCOL)
+                IMAGE_CHUNK_SIZE = config.get('image_chunk_size', IMAGE_CHUNK_SIZE)
                     
                 print("Konfigurácia načítaná z config.json")
     except Exception as e:
@@ -83,11 +131,11 @@ def find_mqtt_broker():
     sock.settimeout(MQTT_DISCOVERY_TIMEOUT)
     
     try:
-        discovery_message = json.dumps({
+        discovery_message = json_codec.dumpb({
             "type": "mqtt_discovery_request",
             "device_id": DEVICE_ID,
             "device_name": DEVICE_NAME
-        }).encode('utf-8')
+        })
         
         broadcast_address = "255.255.255.255"
         print(f"Odosielam broadcast discovery požiadavku na {broadcast_address}:{MQTT_DISCOVERY_PORT}")
@@ -99,7 +147,7 @@ def find_mqtt_broker():
         data, addr = sock.recvfrom(1024)
         print(f"Prijatá odpoveď od {addr}")
         
-        message = json.loads(data.decode("utf-8"))
+        message = json_codec.loads(data)
         
         if message.get("type") == "mqtt_discovery" or message.get("type") == "mqtt_discovery_response":
             discovered_broker = message.get("broker_ip")
@@ -129,6 +177,8 @@ def on_mqtt_connect(client, userdata, flags, rc):
     
     if rc == 0:
         mqtt_connected = True
+        if reconnect_task is not None:
+            reconnect_task.cancel()
         print(f"Pripojený k MQTT brokeru ({mqtt_broker}:{MQTT_PORT})")
         
         client.subscribe(MQTT_TOPIC_CONTROL, qos=MQTT_QOS)
@@ -153,12 +203,12 @@ def on_mqtt_message(client, userdata, msg):
     """Spracovanie prijatých MQTT správ."""
     try:
         topic = msg.topic
-        payload = json.loads(msg.payload.decode('utf-8'))
+        payload = json_codec.loads(msg.payload)
         print(f"MQTT správa prijatá: {topic} - {payload}")
         
         if topic == MQTT_TOPIC_CONTROL:
             handle_control_message(payload)
-    except json.JSONDecodeError:
+    except json_codec.JSONDecodeError:
         print(f"Neplatný JSON formát: {msg.payload}")
     except Exception as e:
         print(f"Chyba pri spracovaní MQTT správy: {e}")
@@ -173,6 +223,8 @@ def handle_control_message(payload):
         print("Prijatý príkaz na reštart programu")
     elif command == 'identify':
         print("Zariadenie identifikované")
+    elif command == 'resend_chunks':
+        threading.Thread(target=resend_image_chunks, args=(payload.get('data', {}),)).start()
 
 def setup_mqtt():
     """Nastavenie a spustenie MQTT klienta."""
@@ -183,7 +235,7 @@ def setup_mqtt():
     if MQTT_USERNAME and MQTT_PASSWORD:
         mqtt_client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
     
-    lwt_payload = json.dumps({
+    lwt_payload = json_codec.dumpb({
         "status": "OFFLINE",
         "device_id": DEVICE_ID,
         "device_name": DEVICE_NAME,
@@ -199,6 +251,15 @@ def setup_mqtt():
     
     try_mqtt_connect()
 
+def schedule_reconnect():
+    """Naplánuje jeden ďalší pokus o pripojenie, predchádzajúci naplánovaný pokus sa zruší."""
+    global reconnect_task
+    if reconnect_task is not None:
+        reconnect_task.cancel()
+    # Pripájanie môže blokovať, preto beží mimo vlákna plánovača
+    reconnect_task = schedule(MQTT_RECONNECT_INTERVAL,
+                              lambda: threading.Thread(target=try_mqtt_connect, daemon=True).start())
+
 def try_mqtt_connect():
     """Pokus o pripojenie k MQTT brokeru."""
     global mqtt_broker
@@ -214,11 +275,11 @@ def try_mqtt_connect():
         print(f"Broker odmietol pripojenie: {e}")
         print("Skontrolujte, či je Mosquitto broker spustený pomocou príkazu 'services.msc' (Windows) alebo 'sudo systemctl status mosquitto' (Linux)")
         print(f"Ďalší pokus o pripojenie za {MQTT_RECONNECT_INTERVAL} sekúnd...")
-        threading.Timer(MQTT_RECONNECT_INTERVAL, try_mqtt_connect).start()
+        schedule_reconnect()
     except Exception as e:
         print(f"Chyba pri pripájaní k MQTT brokeru: {e}")
         print(f"Ďalší pokus o pripojenie za {MQTT_RECONNECT_INTERVAL} sekúnd...")
-        threading.Timer(MQTT_RECONNECT_INTERVAL, try_mqtt_connect).start()
+        schedule_reconnect()
 
 def publish_mqtt_status(status, message=""):
     """Publikovanie stavu zariadenia cez MQTT."""
@@ -239,7 +300,7 @@ def publish_mqtt_status(status, message=""):
         payload["message"] = message
     
     try:
-        mqtt_client.publish(MQTT_TOPIC_STATUS, json.dumps(payload), qos=MQTT_QOS, retain=True)
+        mqtt_client.publish(MQTT_TOPIC_STATUS, json_codec.dumpb(payload), qos=MQTT_QOS, retain=True)
         return True
     except Exception as e:
         print(f"Chyba pri publikovaní MQTT stavu: {e}")
@@ -261,45 +322,123 @@ def publish_mqtt_sensor_data(sensor_type, status):
     }
     
     try:
-        mqtt_client.publish(MQTT_TOPIC_SENSOR, json.dumps(payload), qos=MQTT_QOS)
+        mqtt_client.publish(MQTT_TOPIC_SENSOR, json_codec.dumpb(payload), qos=MQTT_QOS)
         return True
     except Exception as e:
         print(f"Chyba pri publikovaní MQTT údajov zo senzora: {e}")
         return False
 
 def publish_mqtt_image(image_path, trigger_type="motion"):
-    """Publikovanie obrázka cez MQTT."""
+    """Publikovanie obrázka zo súboru cez MQTT."""
+    if not os.path.exists(image_path):
+        return False
+        
+    with open(image_path, "rb") as f:
+        image_data = f.read()
+    
+    return publish_mqtt_image_data(image_data, trigger_type, os.path.basename(image_path))
+
+def publish_mqtt_image_data(image_data, trigger_type="motion", filename=None, timestamp=None, extra=None):
+    """Publikovanie obrázka z pamäte cez MQTT (extra - doplnkové metadáta, napr. burst)."""
     global mqtt_connected
     
-    if not mqtt_connected or mqtt_client is None or not os.path.exists(image_path):
+    if not mqtt_connected or mqtt_client is None:
         return False
         
     try:
-        with open(image_path, "rb") as f:
-            image_data = f.read()
-            
-        import base64
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        payload = {
-            "image_data": image_base64,
-            "metadata": {
-                "device_id": DEVICE_ID,
-                "device_name": DEVICE_NAME,
-                "room": DEVICE_NAME,
-                "trigger": trigger_type,
-                "timestamp": time.time(),
-                "filename": os.path.basename(image_path)
-            }
+        metadata = {
+            "device_id": DEVICE_ID,
+            "device_name": DEVICE_NAME,
+            "room": DEVICE_NAME,
+            "trigger": trigger_type,
+            "timestamp": timestamp or time.time(),
+            "filename": filename
         }
+        if extra:
+            metadata.update(extra)
         
-        mqtt_client.publish(MQTT_TOPIC_IMAGE, json.dumps(payload), qos=MQTT_QOS)
+        if IMAGE_PROTOCOL == "legacy":
+            payload = {
+                "image_data": base64.b64encode(image_data).decode('utf-8'),
+                "metadata": metadata
+            }
+            mqtt_client.publish(MQTT_TOPIC_IMAGE, json_codec.dumpb(payload), qos=MQTT_QOS)
+        elif IMAGE_CHUNK_SIZE and len(image_data) > IMAGE_CHUNK_SIZE:
+            publish_image_chunks(metadata, image_data)
+        else:
+            mqtt_client.publish(MQTT_TOPIC_IMAGE_RAW, pack_image(metadata, image_data), qos=MQTT_QOS)
         print("Obrázok publikovaný cez MQTT")
         return True
     except Exception as e:
         print(f"Chyba pri publikovaní MQTT obrázka: {e}")
         return False
 
+def pack_image(metadata, image_data, magic=IMAGE_PROTOCOL_MAGIC):
+    """Zabalí metadáta a JPEG do binárnej správy (image_protocol v2).
+
+    Formát: IMG2 (alebo IMGC pre časť obrázka) + dĺžka hlavičky (uint16, big-endian)
+    + JSON hlavička + JPEG.
+    """
+    header = json_codec.dumpb(metadata)
+    return b"".join((magic, struct.pack(">H", len(header)), header, image_data))
+
+def publish_image_chunks(metadata, image_data):
+    """Odošle obrázok po častiach a zapamätá si ho pre prípadné opätovné odoslanie."""
+    total = (len(image_data) + IMAGE_CHUNK_SIZE - 1) // IMAGE_CHUNK_SIZE
+    transfer = {
+        "id": uuid.uuid4().hex[:16],
+        "data": image_data,
+        "chunk_size": IMAGE_CHUNK_SIZE,
+        "total": total,
+        "sha256": hashlib.sha256(image_data).hexdigest(),
+        "metadata": metadata,
+        "created": time.time()
+    }
+    
+    with recent_transfers_lock:
+        recent_transfers[transfer["id"]] = transfer
+        while len(recent_transfers) > RECENT_TRANSFERS_MAX:
+            recent_transfers.popitem(last=False)
+    
+    for seq in range(total):
+        publish_image_chunk(transfer, seq)
+    
+    print(f"Obrázok odoslaný po častiach: {total} x {IMAGE_CHUNK_SIZE} B (prenos {transfer['id']})")
+    return transfer["id"]
+
+def publish_image_chunk(transfer, seq):
+    """Odošle jednu časť obrázka."""
+    start = seq * transfer["chunk_size"]
+    header = {
+        "id": transfer["id"],
+        "seq": seq,
+        "total": transfer["total"],
+        "chunk_size": transfer["chunk_size"],
+        "size": len(transfer["data"]),
+        "sha256": transfer["sha256"],
+        "metadata": transfer["metadata"]
+    }
+    chunk = memoryview(transfer["data"])[start:start + transfer["chunk_size"]]
+    return mqtt_client.publish(MQTT_TOPIC_IMAGE_RAW, pack_image(header, chunk, IMAGE_CHUNK_MAGIC), qos=MQTT_QOS)
+
+def resend_image_chunks(data):
+    """Znova odošle časti obrázka, ktoré si vyžiadal prijímač (príkaz resend_chunks)."""
+    transfer_id = data.get("transfer_id")
+    
+    with recent_transfers_lock:
+        transfer = recent_transfers.get(transfer_id)
+    
+    if transfer is None or time.time() - transfer["created"] > RECENT_TRANSFER_TTL:
+        print(f"Prenos {transfer_id} už nie je k dispozícii, časti nemožno znova odoslať")
+        return
+    
+    count = 0
+    for start, end in data.get("ranges", []):
+        for seq in range(max(0, start), min(end, transfer["total"] - 1) + 1):
+            publish_image_chunk(transfer, seq)
+            count += 1
+    print(f"Znova odoslaných {count} častí prenosu {transfer_id}")
+
 def send_all_sensors_status():
     """Odošle stav všetkých senzorov."""
     status = {
@@ -314,7 +453,7 @@ def send_all_sensors_status():
     
     if mqtt_connected and mqtt_client is not None:
         try:
-            mqtt_client.publish(MQTT_TOPIC_SENSOR, json.dumps(status), qos=MQTT_QOS)
+            mqtt_client.publish(MQTT_TOPIC_SENSOR, json_codec.dumpb(status), qos=MQTT_QOS)
             print("Všetky stavy senzorov publikované cez MQTT")
         except Exception as e:
             print(f"Chyba pri publikovaní MQTT údajov zo všetkých senzorov: {e}")
@@ -332,21 +471,66 @@ def send_status(sensor_type, status):
         print(f"Nepodarilo sa odoslať stav {sensor_type} = {status}")
         return False
 
-def send_test_image():
+def send_test_image(trigger_time=None):
     """Simulácia odoslania obrázka po detekcii pohybu."""
-    image_path = os.path.join(os.path.dirname(__file__), "test_image.jpg")
-    
-    if not os.path.exists(image_path):
-        with open(image_path, "w") as f:
-            f.write("Toto je testovací súbor namiesto obrázka.")
-    
-    success = publish_mqtt_image(image_path)
+    if camera is None:
+        image_path = os.path.join(os.path.dirname(__file__), "test_image.jpg")
+        
+        if not os.path.exists(image_path):
+            with open(image_path, "w") as f:
+                f.write("Toto je testovací súbor namiesto obrázka.")
+        
+        success = publish_mqtt_image(image_path)
+    elif burst_enabled:
+        send_test_burst(trigger_time or time.time())
+        return
+    else:
+        frame = camera.get_frame(trigger_time)
+        success = frame is not None and publish_mqtt_image_data(
+            frame.data, filename=f"frame_{frame.seq}.jpg", timestamp=frame.timestamp)
     
     if success:
         print(f"Odoslaný testovací obrázok cez MQTT")
     else:
         print("Nepodarilo sa odoslať testovací obrázok")
 
+def send_test_burst(trigger_time):
+    """Zaradí na odoslanie snímky pred, počas a po simulovanom spúšťači."""
+    event_id = uuid.uuid4().hex[:12]
+    frame_count = burst_pre_frames + 1 + burst_post_frames
+    index = 0
+    for phase, frame in camera.iter_burst(trigger_time, burst_pre_frames, burst_post_frames, burst_post_fps):
+        extra = {
+            "event_id": event_id,
+            "frame_index": index,
+            "frame_count": frame_count,
+            "phase": phase,
+            "offset": round(frame.timestamp - trigger_time, 3),
+            "trigger_time": trigger_time
+        }
+        if not publish_queue.put(extra, frame):
+            print(f"Fronta odosielania je plná - snímka {index} udalosti {event_id} zahodená")
+        index += 1
+    print(f"Burst {event_id}: {index} snímok zaradených na odoslanie")
+
+def publish_queued_frame(extra, frame):
+    publish_mqtt_image_data(frame.data, filename=f"frame_{frame.seq}.jpg", timestamp=frame.timestamp, extra=extra)
+
+def setup_camera():
+    """Spustí simulovanú kameru (FakeFrameSource) s kruhovým bufferom."""
+    global camera, publish_queue
+    
+    publish_queue = PublishQueue(publish_queued_frame, publish_queue_size)
+    publish_queue.start()
+    
+    try:
+        camera = CameraService(FakeFrameSource(), buffer_seconds=3, fps=5)
+        camera.start()
+        print("Simulovaná kamera spustená")
+    except Exception as e:
+        print(f"Chyba pri spustení simulovanej kamery: {e}")
+        camera = None
+
 def simulate_sensors():
     """Simuluje zmeny stavu senzorov a náhodne generuje udalosti."""
     print("Spúšťam simuláciu senzorov...")
@@ -357,7 +541,7 @@ def simulate_sensors():
         if sensor_type == "motion":
             status = "DETECTED" if random.random() < 0.3 else "IDLE" 
             if status == "DETECTED":
-                threading.Thread(target=send_test_image).start()
+                threading.Thread(target=send_test_image, args=(time.time(),)).start()
         else:
             status = "OPEN" if random.random() < 0.2 else "CLOSED"
         
@@ -395,6 +579,12 @@ def cleanup():
             mqtt_client.loop_stop()
         except:
             pass
+    
+    if publish_queue is not None:
+        publish_queue.stop()
+    
+    if camera is not None:
+        camera.stop()
 
 def main():
     """Hlavná funkcia programu."""
@@ -402,6 +592,8 @@ def main():
     
     load_config()
     
+    setup_camera()
+    
     find_mqtt_broker()
     
     setup_mqtt()
@@ -415,4 +607,9 @@ def main():
         cleanup()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if "--benchmark" in sys.argv[1:]:
+        # Záťažový test s mnohými virtuálnymi zariadeniami, parametre pozri benchmark.py --help
+        import benchmark
+        benchmark.main([arg for arg in sys.argv[1:] if arg != "--benchmark"])
+    else:
+        main()
\ No newline at end of file
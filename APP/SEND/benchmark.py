@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# benchmark.py - Záťažový test prijímača so stovkami virtuálnych zariadení
+#
+# Spustenie: python3 benchmark.py --devices 200 --rate 0.5 --duration 60 --seed 1
+#      alebo: python3 TESTER.py --benchmark --devices 200 --rate 0.5 --duration 60
+#
+# Virtuálne zariadenia publikujú zmeny senzorov (a voliteľne obrázky) cez
+# niekoľko zdieľaných MQTT spojení. Latencia sa meria od publikovania po
+# udalosť v SSE streame prijímača (/api/stream):
+#   device_status - udalosť "sensor" (stav zariadenia zapísaný)
+#   alert         - udalosť "alert" (upozornenie zapísané do logu)
+#   countdown     - udalosť "state" s alarm_countdown_active (začiatok odpočtu)
+#   image         - udalosť "image" (obrázok uložený)
+# Upozornenia a odpočet vznikajú iba pri zabezpečenom systéme (--arm PIN).
+# Výsledok je JSON report s p50/p95/p99, priepustnosťou a stratami.
+# Rovnaký --seed vygeneruje rovnakú postupnosť udalostí.
+import argparse
+import base64
+import hashlib
+import heapq
+import math
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from collections import defaultdict, deque
+import paho.mqtt.client as mqtt
+import json_codec
+from TESTER import pack_image, IMAGE_PROTOCOL_MAGIC, IMAGE_CHUNK_MAGIC
+
+TOPIC_SENSOR = "home/security/sensors/{}"
+TOPIC_STATUS = "home/security/status/{}"
+TOPIC_IMAGE = "home/security/images/{}"
+TOPIC_IMAGE_RAW = "home/security/images_raw/{}"
+
+# Pokojový a poplachový stav jednotlivých senzorov
+SENSOR_STATES = {
+    "motion": ("IDLE", "DETECTED"),
+    "door": ("CLOSED", "OPEN"),
+    "window": ("CLOSED", "OPEN")
+}
+TRIGGER_STATES = ("DETECTED", "OPEN")
+
+# Správy upozornení obsahujú "(názov zariadenia)"
+ALERT_DEVICE_PATTERN = re.compile(r"\((bench_\d+)\)")
+
+def percentile(sorted_values, p):
+    """Percentil metódou najbližšieho poradia."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(latencies):
+    """Súhrn latencií v milisekundách."""
+    values = sorted(latency * 1000 for latency in latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 2),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(values[-1], 2)
+    }
+
+class VirtualDevice:
+    """Simulované zariadenie so stavom senzorov a vlastnou frekvenciou udalostí."""
+
+    def __init__(self, index, rate, client):
+        self.device_id = f"bench_{index:04d}"
+        self.rate = rate
+        self.client = client
+        self.state = {sensor: states[0] for sensor, states in SENSOR_STATES.items()}
+
+    def next_change(self, rng, trigger_prob):
+        """Zmení stav jedného senzora a vráti (senzor, nový stav)."""
+        sensor = rng.choice(list(SENSOR_STATES))
+        idle, active = SENSOR_STATES[sensor]
+        self.state[sensor] = active if rng.random() < trigger_prob else idle
+        return sensor, self.state[sensor]
+
+class LatencyTracker:
+    """Páruje publikované správy s udalosťami zo SSE streamu prijímača."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sensor_pending = defaultdict(deque)    # device_id -> (čas, {senzor: stav})
+        self.trigger_pending = defaultdict(deque)   # device_id -> čas poplachovej zmeny
+        self.image_pending = defaultdict(deque)     # device_id -> čas odoslania obrázka
+        self.latencies = defaultdict(list)
+        self.dropped = defaultdict(int)
+        self.countdown_candidate = None
+        self.countdown_active = False
+        self.countdown_started = threading.Event()
+
+    def published_sensor(self, device_id, statuses, sent_at):
+        with self._lock:
+            self.sensor_pending[device_id].append((sent_at, statuses))
+            if any(status in TRIGGER_STATES for status in statuses.values()):
+                self.trigger_pending[device_id].append(sent_at)
+                if not self.countdown_active and self.countdown_candidate is None:
+                    self.countdown_candidate = sent_at
+
+    def published_image(self, device_id, sent_at):
+        with self._lock:
+            self.image_pending[device_id].append(sent_at)
+
+    def on_event(self, event_type, data, received_at):
+        with self._lock:
+            if event_type == "sensor":
+                self._match_sensor(data, received_at)
+            elif event_type == "alert":
+                match = ALERT_DEVICE_PATTERN.search(data.get("message", ""))
+                pending = self.trigger_pending.get(match.group(1)) if match else None
+                if pending:
+                    self.latencies["alert"].append(received_at - pending.popleft())
+            elif event_type == "image":
+                pending = self.image_pending.get(data.get("device_id"))
+                if pending:
+                    self.latencies["image"].append(received_at - pending.popleft())
+            elif event_type == "state" and "alarm_countdown_active" in data:
+                if data["alarm_countdown_active"] and not self.countdown_active:
+                    if self.countdown_candidate is not None:
+                        self.latencies["countdown"].append(received_at - self.countdown_candidate)
+                    self.countdown_candidate = None
+                    self.countdown_started.set()
+                self.countdown_active = bool(data["alarm_countdown_active"])
+
+    def _match_sensor(self, data, received_at):
+        pending = self.sensor_pending.get(data.get("device_id"))
+        if not pending:
+            return
+        reported = {sensor["sensor_type"]: sensor.get("raw_status") for sensor in data.get("sensors", [])}
+        # Prijímač spracúva správy jedného zariadenia v poradí - preskočené správy sa stratili
+        while pending:
+            sent_at, statuses = pending.popleft()
+            if all(reported.get(sensor) == status for sensor, status in statuses.items()):
+                self.latencies["device_status"].append(received_at - sent_at)
+                return
+            self.dropped["device_status"] += 1
+
+    def reset_countdown(self):
+        with self._lock:
+            self.countdown_active = False
+            self.countdown_candidate = None
+            self.countdown_started.clear()
+
+    def pending_sensor_count(self):
+        with self._lock:
+            return sum(len(pending) for pending in self.sensor_pending.values())
+
+    def pending_image_count(self):
+        with self._lock:
+            return sum(len(pending) for pending in self.image_pending.values())
+
+class SSEListener(threading.Thread):
+    """Číta /api/stream prijímača a odovzdáva udalosti trackeru."""
+
+    def __init__(self, url, tracker):
+        super().__init__(daemon=True, name="BenchmarkSSEThread")
+        self.url = url
+        self.tracker = tracker
+        self.ready = threading.Event()
+        self.error = None
+        self.events = 0
+        self.resets = 0
+        self._response = None
+        self._stopped = False
+
+    def run(self):
+        try:
+            self._response = urllib.request.urlopen(self.url, timeout=60)
+            event_type, data_lines = None, []
+            for raw_line in self._response:
+                if self._stopped:
+                    return
+                line = raw_line.decode("utf-8").rstrip("\r\n")
+                if line.startswith("event:"):
+                    event_type = line[6:].strip()
+                elif line.startswith("data:"):
+                    data_lines.append(line[5:].strip())
+                elif not line and event_type:
+                    self._dispatch(event_type, "\n".join(data_lines), time.time())
+                    event_type, data_lines = None, []
+        except Exception as e:
+            if not self._stopped:
+                self.error = str(e)
+        finally:
+            self.ready.set()
+
+    def _dispatch(self, event_type, payload, received_at):
+        if event_type == "snapshot":
+            # Opakovaný snapshot znamená, že prijímač zahodil udalosti pre pomalého klienta
+            if self.ready.is_set():
+                self.resets += 1
+            self.ready.set()
+            return
+        self.events += 1
+        try:
+            self.tracker.on_event(event_type, json_codec.loads(payload), received_at)
+        except ValueError:
+            pass
+
+    def stop(self):
+        self._stopped = True
+        if self._response is not None:
+            try:
+                self._response.close()
+            except Exception:
+                pass
+
+class Benchmark:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.tracker = LatencyTracker()
+        self.clients = []
+        self.devices = []
+        self.stats = {"published": 0, "publish_errors": 0, "bytes": 0, "images": 0, "bursts": 0}
+        self._connected = threading.Semaphore(0)
+
+    def _web(self, path, payload=None):
+        url = self.args.web.rstrip("/") + path
+        data = json_codec.dumpb(payload) if payload is not None else None
+        request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json_codec.loads(response.read())
+
+    def connect(self):
+        """Otvorí zdieľané MQTT spojenia a rozdelí medzi ne virtuálne zariadenia."""
+        run_id = uuid.uuid4().hex[:6]
+        for index in range(max(1, min(self.args.connections, self.args.devices))):
+            client = mqtt.Client(client_id=f"benchmark_{run_id}_{index}", clean_session=True)
+            if self.args.username:
+                client.username_pw_set(self.args.username, self.args.password)
+            client.on_connect = lambda c, u, f, rc: self._connected.release() if rc == 0 else None
+            client.max_queued_messages_set(0)
+            client.connect(self.args.broker, self.args.port, keepalive=60)
+            client.loop_start()
+            self.clients.append(client)
+        for _ in self.clients:
+            if not self._connected.acquire(timeout=10):
+                raise RuntimeError("Nepodarilo sa pripojiť k MQTT brokeru")
+
+        for index in range(self.args.devices):
+            spread = 1 + self.args.rate_spread * (2 * self.rng.random() - 1)
+            device = VirtualDevice(index, max(0.001, self.args.rate * spread), self.clients[index % len(self.clients)])
+            self.devices.append(device)
+            self._publish(device, TOPIC_STATUS.format(device.device_id), json_codec.dumpb({
+                "status": "ONLINE",
+                "device_id": device.device_id,
+                "device_name": device.device_id,
+                "room": device.device_id,
+                "timestamp": time.time()
+            }))
+
+    def _publish(self, device, topic, payload):
+        info = device.client.publish(topic, payload, qos=self.args.qos)
+        if info.rc == mqtt.MQTT_ERR_SUCCESS:
+            self.stats["published"] += 1
+            self.stats["bytes"] += len(payload)
+        else:
+            self.stats["publish_errors"] += 1
+
+    def send_event(self, device):
+        sensor, status = device.next_change(self.rng, self.args.trigger_prob)
+        statuses = dict(device.state) if self.args.payload == "full" else {sensor: status}
+        payload = {
+            **statuses,
+            "device_id": device.device_id,
+            "device_name": device.device_id,
+            "room": device.device_id,
+            "timestamp": time.time()
+        }
+        sent_at = time.time()
+        self.tracker.published_sensor(device.device_id, statuses, sent_at)
+        self._publish(device, TOPIC_SENSOR.format(device.device_id), json_codec.dumpb(payload))
+
+        if status == "DETECTED" and self.args.image_size > 0 and self.rng.random() < self.args.image_prob:
+            self.send_image(device, sent_at)
+
+    def send_image(self, device, trigger_time):
+        size = max(16, self.args.image_size)
+        image_data = b"\xff\xd8" + self.rng.randbytes(size - 4) + b"\xff\xd9"
+        metadata = {
+            "device_id": device.device_id,
+            "device_name": device.device_id,
+            "room": device.device_id,
+            "trigger": "motion",
+            "timestamp": trigger_time,
+            "filename": f"bench_{self.stats['images']}.jpg"
+        }
+        self.tracker.published_image(device.device_id, time.time())
+        self.stats["images"] += 1
+        if self.args.image_format == "legacy":
+            payload = json_codec.dumpb({"image_data": base64.b64encode(image_data).decode("utf-8"), "metadata": metadata})
+            self._publish(device, TOPIC_IMAGE.format(device.device_id), payload)
+        elif self.args.image_format == "chunked" and len(image_data) > self.args.chunk_size:
+            chunk_size = self.args.chunk_size
+            header = {
+                "id": uuid.UUID(int=self.rng.getrandbits(128)).hex[:16],
+                "total": (len(image_data) + chunk_size - 1) // chunk_size,
+                "chunk_size": chunk_size,
+                "size": len(image_data),
+                "sha256": hashlib.sha256(image_data).hexdigest(),
+                "metadata": metadata
+            }
+            for seq in range(header["total"]):
+                chunk = image_data[seq * chunk_size:(seq + 1) * chunk_size]
+                self._publish(device, TOPIC_IMAGE_RAW.format(device.device_id),
+                              pack_image({**header, "seq": seq}, chunk, IMAGE_CHUNK_MAGIC))
+        else:
+            self._publish(device, TOPIC_IMAGE_RAW.format(device.device_id),
+                          pack_image(metadata, image_data, IMAGE_PROTOCOL_MAGIC))
+
+    def generate(self):
+        """Publikuje udalosti všetkých zariadení podľa ich frekvencie (Poissonov proces).
+
+        Položky haldy sú (termín, zariadenie, zostávajúce správy burstu), takže burst
+        jedného zariadenia nebrzdí ostatné.
+        """
+        start = time.time()
+        end = start + self.args.duration
+        heap = [(start + self.rng.expovariate(device.rate), index, 0) for index, device in enumerate(self.devices)]
+        heapq.heapify(heap)
+        burst_gap = self.args.burst_gap / 1000.0
+
+        while heap:
+            due, index, burst_left = heapq.heappop(heap)
+            if due >= end:
+                break
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            device = self.devices[index]
+            self.send_event(device)
+            if burst_left:
+                if burst_left > 1:
+                    heapq.heappush(heap, (due + burst_gap, index, burst_left - 1))
+                continue
+            if self.args.burst_size > 1 and self.rng.random() < self.args.burst_prob:
+                # Burst - séria zmien jedného zariadenia tesne po sebe
+                self.stats["bursts"] += 1
+                heapq.heappush(heap, (due + burst_gap, index, self.args.burst_size - 1))
+            heapq.heappush(heap, (due + self.rng.expovariate(device.rate), index, 0))
+        return time.time() - start
+
+    def _rearm_loop(self, stop_event):
+        """Po každom začiatku odpočtu systém deaktivuje a znova zabezpečí, aby vznikali ďalšie merania."""
+        while not stop_event.is_set():
+            if not self.tracker.countdown_started.wait(0.2):
+                continue
+            try:
+                self._web("/api/system/disarm", {"pin": self.args.arm})
+                self.tracker.reset_countdown()
+                self._web("/api/system/arm", {"pin": self.args.arm, "mode": self.args.arm_mode})
+            except Exception as e:
+                print(f"Chyba pri opätovnom zabezpečení systému: {e}")
+                return
+
+    def run(self):
+        listener = SSEListener(self.args.web.rstrip("/") + "/api/stream", self.tracker)
+        listener.start()
+        if not listener.ready.wait(10) or listener.error:
+            raise RuntimeError(f"Nepodarilo sa pripojiť k SSE streamu prijímača: {listener.error}")
+
+        self.connect()
+        stop_rearm = threading.Event()
+        if self.args.arm:
+            self._web("/api/system/arm", {"pin": self.args.arm, "mode": self.args.arm_mode})
+            threading.Thread(target=self._rearm_loop, args=(stop_rearm,), daemon=True).start()
+        # Prijímač si najprv zaregistruje nové zariadenia
+        time.sleep(self.args.warmup)
+
+        print(f"Benchmark: {len(self.devices)} zariadení, {len(self.clients)} spojení, {self.args.duration} s...")
+        elapsed = self.generate()
+
+        # Čakanie na spracovanie zostávajúcich správ
+        deadline = time.time() + self.args.drain_timeout
+        while time.time() < deadline and (self.tracker.pending_sensor_count() or self.tracker.pending_image_count()):
+            time.sleep(0.1)
+
+        stop_rearm.set()
+        if self.args.arm:
+            try:
+                self._web("/api/system/disarm", {"pin": self.args.arm})
+            except Exception as e:
+                print(f"Chyba pri deaktivácii systému po benchmarku: {e}")
+        listener.stop()
+        for client in self.clients:
+            client.loop_stop()
+            client.disconnect()
+        return self.report(elapsed, listener)
+
+    def report(self, elapsed, listener):
+        tracker = self.tracker
+        dropped = dict(tracker.dropped)
+        dropped["device_status"] = dropped.get("device_status", 0) + tracker.pending_sensor_count()
+        dropped["image"] = tracker.pending_image_count()
+        receiver = None
+        try:
+            receiver = self._web("/api/mqtt/status")
+        except Exception:
+            pass
+        return {
+            "config": {
+                key: value for key, value in vars(self.args).items()
+                if key not in ("password", "arm", "output")
+            },
+            "armed": bool(self.args.arm),
+            "elapsed": round(elapsed, 3),
+            "published": self.stats["published"],
+            "publish_errors": self.stats["publish_errors"],
+            "bytes": self.stats["bytes"],
+            "images": self.stats["images"],
+            "bursts": self.stats["bursts"],
+            "throughput_msgs_per_s": round(self.stats["published"] / elapsed, 2) if elapsed else None,
+            "sse_events": listener.events,
+            "sse_resets": listener.resets,
+            "dropped": dropped,
+            "latency_ms": {metric: summarize(values) for metric, values in sorted(tracker.latencies.items())},
+            "receiver": receiver
+        }
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Záťažový test prijímača s virtuálnymi zariadeniami")
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username", default="")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--web", default="http://localhost:5000", help="adresa webového rozhrania prijímača")
+    parser.add_argument("--devices", type=int, default=100, help="počet virtuálnych zariadení")
+    parser.add_argument("--connections", type=int, default=8, help="počet MQTT spojení zdieľaných zariadeniami")
+    parser.add_argument("--rate", type=float, default=0.2, help="priemerný počet udalostí za sekundu na zariadenie")
+    parser.add_argument("--rate-spread", type=float, default=0.5, help="rozptyl frekvencie medzi zariadeniami (0-1)")
+    parser.add_argument("--trigger-prob", type=float, default=0.3, help="pravdepodobnosť poplachového stavu senzora")
+    parser.add_argument("--burst-prob", type=float, default=0.0, help="pravdepodobnosť, že udalosť začne burst")
+    parser.add_argument("--burst-size", type=int, default=5, help="počet správ v burste")
+    parser.add_argument("--burst-gap", type=float, default=10, help="rozostup správ v burste (ms)")
+    parser.add_argument("--payload", choices=("single", "full"), default="single",
+                        help="single = iba zmenený senzor, full = všetky senzory v správe")
+    parser.add_argument("--image-prob", type=float, default=0.0, help="pravdepodobnosť obrázka pri detekcii pohybu")
+    parser.add_argument("--image-size", type=int, default=50 * 1024, help="veľkosť obrázka v bajtoch")
+    parser.add_argument("--image-format", choices=("v2", "legacy", "chunked"), default="v2")
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024)
+    parser.add_argument("--qos", type=int, choices=(0, 1), default=1)
+    parser.add_argument("--duration", type=float, default=30, help="dĺžka generovania záťaže (s)")
+    parser.add_argument("--warmup", type=float, default=2, help="čakanie po registrácii zariadení (s)")
+    parser.add_argument("--drain-timeout", type=float, default=10, help="čakanie na spracovanie po skončení (s)")
+    parser.add_argument("--arm", metavar="PIN", help="zabezpečí systém, aby sa merali upozornenia a odpočet "
+                                                     "(spúšťa skutočné upozornenia a alarm)")
+    parser.add_argument("--arm-mode", choices=("armed_home", "armed_away"), default="armed_away")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="súbor pre JSON report (predvolene štandardný výstup)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = Benchmark(args).run()
+    text = json_codec.dumps(report, pretty=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Report uložený do {args.output}")
+    else:
+        print(text)
+    return report
+
+if __name__ == "__main__":
+    main()
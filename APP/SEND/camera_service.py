@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# camera_service.py - Trvalo otvorená kamera s kruhovým bufferom snímok
+import io
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("send")
+
+class Frame:
+    """Jedna snímka z kamery zakódovaná do JPEG."""
+
+    __slots__ = ("timestamp", "seq", "data")
+
+    def __init__(self, timestamp, seq, data):
+        self.timestamp = timestamp
+        self.seq = seq
+        self.data = data
+
+class Picamera2Source:
+    """Zdroj snímok z Raspberry Pi kamery cez knižnicu picamera2.
+
+    Kamera sa otvorí raz a beží nepretržite, snímky sa kódujú do JPEG
+    priamo do pamäte bez dočasných súborov.
+    """
+
+    def __init__(self, resolution=(640, 480), framerate=24, rotation=0):
+        self.resolution = tuple(resolution)
+        self.framerate = framerate
+        self.rotation = rotation
+        self.camera = None
+
+    def open(self):
+        from picamera2 import Picamera2
+        from libcamera import Transform
+
+        self.camera = Picamera2()
+        transform = Transform(hflip=True, vflip=True) if self.rotation == 180 else Transform()
+        config = self.camera.create_video_configuration(
+            main={"size": self.resolution},
+            transform=transform,
+            controls={"FrameRate": self.framerate}
+        )
+        self.camera.configure(config)
+        self.camera.start()
+
+    def capture(self):
+        buffer = io.BytesIO()
+        self.camera.capture_file(buffer, format="jpeg")
+        return buffer.getvalue()
+
+    def close(self):
+        if self.camera is not None:
+            try:
+                self.camera.stop()
+                self.camera.close()
+            except Exception:
+                pass
+            self.camera = None
+
+class FakeFrameSource:
+    """Náhradný zdroj snímok pre testovanie bez kamery.
+
+    Ak je dostupný Pillow, generuje JPEG s časom snímky, inak vracia obsah
+    zadaného súboru (napr. test_image.jpg).
+    """
+
+    def __init__(self, resolution=(640, 480), image_path=None):
+        self.resolution = tuple(resolution)
+        self.image_path = image_path or os.path.join(os.path.dirname(__file__), "test_image.jpg")
+        self._static = None
+        self._counter = 0
+
+    def open(self):
+        try:
+            from PIL import Image  # noqa: F401
+            self._static = None
+        except ImportError:
+            try:
+                with open(self.image_path, "rb") as f:
+                    self._static = f.read()
+            except OSError:
+                self._static = b"\xff\xd8FAKE-FRAME\xff\xd9"
+
+    def capture(self):
+        self._counter += 1
+        if self._static is not None:
+            return self._static
+
+        from PIL import Image, ImageDraw
+        image = Image.new("RGB", self.resolution, (40, 40, 40))
+        draw = ImageDraw.Draw(image)
+        draw.text((10, 10), f"{self._counter} {time.strftime('%H:%M:%S')}.{int(time.time() * 1000) % 1000:03d}",
+                  fill=(255, 255, 255))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=70)
+        return buffer.getvalue()
+
+    def close(self):
+        pass
+
+class CameraService:
+    """Nepretržité snímanie do kruhového bufferu v pamäti.
+
+    Pri udalosti sa nevolá kamera, ale vráti sa snímka zachytená v čase
+    spúšťača alebo tesne pred ním.
+    """
+
+    def __init__(self, source, buffer_seconds=3, fps=5):
+        self.source = source
+        self.fps = max(0.5, float(fps))
+        self.frames = deque(maxlen=max(1, int(buffer_seconds * self.fps)))
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._seq = 0
+        self.errors = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.source.open()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True, name="CameraServiceThread")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+        self.source.close()
+
+    def _capture_loop(self):
+        interval = 1.0 / self.fps
+        next_capture = time.time()
+        while not self._stop_event.is_set():
+            try:
+                timestamp = time.time()
+                data = self.source.capture()
+                with self._condition:
+                    self._seq += 1
+                    self.frames.append(Frame(timestamp, self._seq, data))
+                    self._condition.notify_all()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Chyba pri snímaní z kamery: {e}")
+                self._stop_event.wait(1)
+
+            next_capture += interval
+            delay = next_capture - time.time()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                next_capture = time.time()
+
+    def get_frame(self, at=None, timeout=2.0):
+        """Vráti snímku zachytenú v čase at alebo tesne pred ním.
+
+        Bez at vráti najnovšiu snímku. Ak v bufferi nie je žiadna staršia snímka,
+        počká najviac timeout sekúnd na ďalšiu.
+        """
+        deadline = time.time() + timeout
+        with self._condition:
+            while True:
+                if self.frames:
+                    if at is None:
+                        return self.frames[-1]
+                    for frame in reversed(self.frames):
+                        if frame.timestamp <= at:
+                            return frame
+                    if self.frames[0].timestamp > at:
+                        return self.frames[0]
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def get_frames_between(self, start, end):
+        """Vráti snímky z bufferu so start <= timestamp <= end."""
+        with self._condition:
+            return [frame for frame in self.frames if start <= frame.timestamp <= end]
+
+    def wait_for_frame_after(self, seq, timeout=2.0):
+        """Počká na snímku s poradovým číslom väčším ako seq."""
+        deadline = time.time() + timeout
+        with self._condition:
+            while not self.frames or self.frames[-1].seq <= seq:
+                remaining = deadline - time.time()
+                if remaining <= 0 or self._stop_event.is_set():
+                    return None
+                self._condition.wait(remaining)
+            for frame in self.frames:
+                if frame.seq > seq:
+                    return frame
+            return self.frames[-1]
+
+    def iter_burst(self, trigger_time, pre_frames=3, post_frames=5, post_fps=5.0, timeout=2.0):
+        """Postupne vracia (phase, frame) snímok burstu okolo času spúšťača.
+
+        phase je "pre", "trigger" alebo "post". Snímky pred spúšťačom sa vezmú
+        z bufferu, snímky po ňom sa čakajú s rozostupom 1/post_fps sekúnd.
+        """
+        interval = 1.0 / max(0.1, float(post_fps))
+        with self._condition:
+            earlier = [frame for frame in self.frames if frame.timestamp <= trigger_time]
+        if earlier:
+            trigger = earlier[-1]
+            earlier = earlier[-(pre_frames + 1):-1] if pre_frames > 0 else []
+        else:
+            trigger = self.get_frame(trigger_time, timeout)
+            if trigger is None:
+                return
+        for frame in earlier:
+            yield "pre", frame
+        yield "trigger", trigger
+
+        last = trigger
+        for index in range(1, post_frames + 1):
+            target = trigger_time + index * interval
+            frame = last
+            while frame is not None and (frame is last or frame.timestamp < target):
+                frame = self.wait_for_frame_after(frame.seq, timeout)
+            if frame is None:
+                return
+            last = frame
+            yield "post", frame
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# publish_queue.py - Ohraničená fronta snímok čakajúcich na odoslanie cez MQTT
+import logging
+import queue
+import threading
+
+logger = logging.getLogger("send")
+
+class PublishQueue:
+    """Snímky sa zaradia bez čakania a odosiela ich samostatné vlákno.
+
+    GPIO callbacky tak nikdy neblokuje balenie ani publikovanie. Pri plnej
+    fronte sa nová snímka zahodí a započíta do dropped.
+    """
+
+    def __init__(self, publish, maxsize=32):
+        self.publish = publish
+        self._queue = queue.Queue(maxsize=max(1, int(maxsize)))
+        self._thread = None
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True, name="PublishQueueThread")
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def put(self, metadata, image_data):
+        """Zaradí snímku na odoslanie, vráti False ak je fronta plná."""
+        try:
+            self._queue.put_nowait((metadata, image_data))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self.publish(*item)
+                self.sent += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Chyba pri odosielaní snímky z fronty: {e}")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# scheduler.py - Spoločný plánovač časovačov s jedným vláknom
+#
+# Úlohy sa ukladajú do haldy podľa termínu a vlákno spí presne do
+# najbližšieho z nich, takže úlohy sa spúšťajú s presnosťou na milisekundy
+# namiesto dotazovania každú sekundu. Zrušená úloha sa z haldy vyhodí až pri
+# vybratí. Callbacky bežia vo vlákne plánovača a majú byť krátke - dlhšiu
+# prácu treba odovzdať inému vláknu alebo fronte.
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger("send")
+
+class ScheduledTask:
+    """Naplánovaná úloha vrátená z schedule(), dá sa zrušiť cez cancel()."""
+
+    __slots__ = ("deadline", "callback", "args", "interval", "name", "cancelled", "_scheduler")
+
+    def __init__(self, scheduler, deadline, callback, args, interval=None, name=None):
+        self._scheduler = scheduler
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.interval = interval
+        self.name = name or getattr(callback, "__name__", "task")
+        self.cancelled = False
+
+    def cancel(self):
+        """Zruší úlohu (aj opakovanú). Vráti False, ak už bola zrušená."""
+        if self.cancelled:
+            return False
+        self.cancelled = True
+        # Jednorazová úloha, ktorá už bola vybratá z haldy, sa nepočíta
+        if self._scheduler is not None:
+            self._scheduler._on_cancel()
+        return True
+
+    def remaining(self):
+        """Sekundy do spustenia úlohy."""
+        return max(0.0, self.deadline - time.monotonic())
+
+class Scheduler:
+    """Halda termínov spracovávaná jedným vláknom."""
+
+    def __init__(self, name="SchedulerThread"):
+        self.name = name
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._cancelled = 0
+        self.stats = {"scheduled": 0, "fired": 0, "cancelled": 0, "errors": 0, "max_lateness_ms": 0.0}
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+
+    def schedule(self, delay, callback, *args, name=None):
+        """Spustí callback(*args) o delay sekúnd."""
+        return self._push(time.monotonic() + max(0.0, delay), callback, args, None, name)
+
+    def schedule_at(self, timestamp, callback, *args, name=None):
+        """Spustí callback(*args) v čase timestamp (time.time())."""
+        return self.schedule(timestamp - time.time(), callback, *args, name=name)
+
+    def schedule_interval(self, interval, callback, *args, delay=None, name=None):
+        """Spúšťa callback(*args) každých interval sekúnd, kým sa úloha nezruší.
+
+        Termíny sa počítajú od pôvodného termínu, takže sa oneskorenie nehromadí.
+        """
+        if interval <= 0:
+            raise ValueError("Interval musí byť kladný")
+        first = interval if delay is None else max(0.0, delay)
+        return self._push(time.monotonic() + first, callback, args, interval, name)
+
+    def _push(self, deadline, callback, args, interval, name):
+        task = ScheduledTask(self, deadline, callback, args, interval, name)
+        with self._condition:
+            heapq.heappush(self._heap, (deadline, next(self._counter), task))
+            self.stats["scheduled"] += 1
+            # Zobudiť vlákno iba ak nová úloha predbehla doterajšiu najbližšiu
+            if self._heap[0][2] is task:
+                self._condition.notify()
+        self.start()
+        return task
+
+    def _on_cancel(self):
+        with self._condition:
+            self._cancelled += 1
+            self.stats["cancelled"] += 1
+            # Ak prevládajú zrušené úlohy, halda sa prebuduje
+            if self._cancelled > 64 and self._cancelled > len(self._heap) // 2:
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+
+    def _next_due(self):
+        """Počká na najbližšiu úlohu a vráti ju, pri zastavení vráti None."""
+        with self._condition:
+            while self._running:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                    self._cancelled = max(0, self._cancelled - 1)
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                deadline, _, task = self._heap[0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                lateness = -delay * 1000
+                if lateness > self.stats["max_lateness_ms"]:
+                    self.stats["max_lateness_ms"] = lateness
+                if task.interval is not None:
+                    task.deadline = deadline + task.interval
+                    if task.deadline < time.monotonic():
+                        task.deadline = time.monotonic() + task.interval
+                    heapq.heappush(self._heap, (task.deadline, next(self._counter), task))
+                else:
+                    task._scheduler = None
+                return task
+        return None
+
+    def _run(self):
+        while True:
+            task = self._next_due()
+            if task is None:
+                return
+            if task.cancelled:
+                continue
+            try:
+                task.callback(*task.args)
+                self.stats["fired"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Chyba v naplánovanej úlohe {task.name}: {e}")
+
+    def pending(self):
+        with self._condition:
+            return sum(1 for entry in self._heap if not entry[2].cancelled)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["pending"] = self.pending()
+        return stats
+
+_scheduler = Scheduler()
+
+def schedule(delay, callback, *args, name=None):
+    """Naplánuje callback(*args) o delay sekúnd na spoločnom plánovači."""
+    return _scheduler.schedule(delay, callback, *args, name=name)
+
+def schedule_at(timestamp, callback, *args, name=None):
+    return _scheduler.schedule_at(timestamp, callback, *args, name=name)
+
+def schedule_interval(interval, callback, *args, delay=None, name=None):
+    return _scheduler.schedule_interval(interval, callback, *args, delay=delay, name=name)
+
+def get_scheduler_stats():
+    return _scheduler.get_stats()